@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+NutriApp360 - Benchmark de importação do núcleo de cálculos
+Mede o tempo de importação de core.formulas em processos novos e falha
+(código de saída 1) se ultrapassar o limite ou se puxar dependências pesadas.
+
+Uso: python benchmarks/bench_core_import.py [--limite-ms 15] [--repeticoes 10]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos que o núcleo não pode carregar na importação
+FORBIDDEN_MODULES = ['streamlit', 'pandas', 'plotly', 'numpy']
+
+MEASURE_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import core.formulas
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    'elapsed_ms': elapsed * 1000,
+    'loaded': [name for name in %r if name in sys.modules]
+}))
+"""
+
+def measure_import(module_list):
+    """Importa core.formulas em um processo novo e retorna tempo e módulos carregados"""
+    output = subprocess.check_output(
+        [sys.executable, "-c", MEASURE_SCRIPT % (module_list,)],
+        cwd=ROOT_DIR
+    )
+    return json.loads(output)
+
+def main():
+    """Executa o benchmark e verifica os limites"""
+    parser = argparse.ArgumentParser(description="Benchmark de importação de core.formulas")
+    parser.add_argument("--limite-ms", type=float, default=15.0, help="Tempo máximo de importação (mediana)")
+    parser.add_argument("--repeticoes", type=int, default=10, help="Número de processos medidos")
+    args = parser.parse_args()
+    
+    results = [measure_import(FORBIDDEN_MODULES) for _ in range(args.repeticoes)]
+    timings = sorted(result['elapsed_ms'] for result in results)
+    median = timings[len(timings) // 2]
+    loaded = sorted({name for result in results for name in result['loaded']})
+    
+    print(f"core.formulas: mediana {median:.2f} ms | mínimo {timings[0]:.2f} ms | máximo {timings[-1]:.2f} ms")
+    
+    failed = False
+    if loaded:
+        print(f"ERRO: a importação carregou dependências pesadas: {', '.join(loaded)}")
+        failed = True
+    
+    if median > args.limite_ms:
+        print(f"ERRO: importação acima do limite de {args.limite_ms:.1f} ms")
+        failed = True
+    
+    if not failed:
+        print("OK: importação dentro do limite")
+    
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
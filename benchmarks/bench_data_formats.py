@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+NutriApp360 - Benchmark dos formatos dos arquivos de dados
+Compara JSON (indentado, como gravado hoje) e o binário compacto NTB1
+(core/formats.py) em pacientes, planos alimentares e diários sintéticos:
+tempo de gravação (save_data), tempo de leitura (load_data) e tamanho do
+arquivo. Confere também que a leitura devolve os mesmos dados nos dois
+formatos, inclusive o tipo dos números (inteiros e floats misturados na
+mesma coluna). Falha (código de saída 1) se o binário não for menor e mais
+rápido de ler que o JSON.
+
+Registros: pacientes = cadastros; planos = planos com 6 refeições e até 2
+alimentos por refeição; diários = entradas do diário (20 por paciente, 2 por
+dia).
+
+Uso: python benchmarks/bench_data_formats.py [--registros 10000 100000] [--repeticoes 3]
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from core.formats import FORMATS, load_data, save_data
+
+NUTRIENT_KEYS = ['calorias', 'carboidratos', 'proteinas', 'gorduras', 'fibras', 'carboidratos_disponiveis', 'carga_glicemica']
+MEALS = ["Café da manhã", "Lanche da manhã", "Almoço", "Lanche da tarde", "Jantar", "Ceia"]
+FOODS = ['arroz_branco', 'feijao_carioca', 'frango_grelhado', 'banana_prata', 'aveia', 'ovo_cozido', 'iogurte_natural', 'pao_integral', 'maca', 'brocolis']
+OBJECTIVES = ['Perda de peso', 'Ganho de peso', 'Manutenção', 'Ganho de massa muscular', 'Saúde geral']
+
+DIARY_ENTRIES_PER_PATIENT = 20
+
+def _moment(rng, start=datetime(2023, 1, 1)):
+    return (start + timedelta(seconds=rng.randrange(2 * 365 * 86400), microseconds=rng.randrange(10 ** 6))).isoformat()
+
+def _food(rng):
+    key = rng.choice(FOODS)
+    return {
+        'name': key.replace('_', ' ').title(),
+        'key': key,
+        'quantity': rng.randrange(10, 300, 10) if rng.random() < 0.9 else round(rng.uniform(10, 300), 1),  # inteiros e floats misturados
+        'nutrition': {name: round(rng.uniform(0, 100), 1) for name in NUTRIENT_KEYS}
+    }
+
+def make_patients(count, rng):
+    """Cadastros como os gravados pelo formulário de pacientes"""
+    patients = {}
+    for i in range(1, count + 1):
+        patient_id = f"PAC_{i:04d}"
+        weight, height = round(rng.uniform(45, 130), 1), rng.randint(145, 200)
+        patients[patient_id] = {
+            'nome': f"Paciente {i} {rng.choice(['Silva', 'Souza', 'Oliveira', 'Santos', 'Pereira'])}",
+            'email': f"paciente{i}@exemplo.com",
+            'telefone': f"(11) 9{rng.randrange(10 ** 8):08d}",
+            'cpf': f"{rng.randrange(10 ** 11):011d}",
+            'data_nascimento': date(rng.randint(1940, 2015), rng.randint(1, 12), rng.randint(1, 28)).isoformat(),
+            'sexo': rng.choice(['Masculino', 'Feminino']),
+            'profissao': rng.choice(['Professor', 'Engenheira', 'Estudante', 'Médico', '']),
+            'objetivo': rng.choice(OBJECTIVES),
+            'peso': weight,
+            'altura': height,
+            'imc': round(weight / (height / 100) ** 2, 1),
+            'gordura_corporal': rng.choice([None, round(rng.uniform(10, 40), 1)]),
+            'condicoes_medicas': rng.choice(['', 'Hipertensão', 'Diabetes tipo 2']),
+            'medicamentos': '',
+            'alergias_alimentares': rng.choice(['', 'Lactose', 'Glúten']),
+            'observacoes': '',
+            'status': rng.choice(['ativo'] * 4 + ['inativo']),
+            'id': patient_id,
+            'created_at': _moment(rng),
+            'updated_at': _moment(rng)
+        }
+    return patients
+
+def make_plans(count, rng):
+    """Planos alimentares como os gravados pelo formulário de planos"""
+    plans = {}
+    for i in range(1, count + 1):
+        plan_id = f"PLAN_{i:04d}"
+        meals = {}
+        for meal in MEALS:
+            foods = [_food(rng) for _ in range(rng.randint(0, 2))]
+            meals[meal] = {'foods': foods, 'nutrition': {name: round(rng.uniform(0, 500), 1) for name in NUTRIENT_KEYS} if foods else {}}
+        plans[plan_id] = {
+            'name': f"Plano {i}",
+            'patient_id': f"PAC_{rng.randint(1, count):04d}",
+            'target_calories': rng.randrange(1200, 3500, 50),
+            'duration': rng.choice(['1 semana', '2 semanas', '1 mês', '3 meses']),
+            'type': rng.choice(['Emagrecimento', 'Hipertrofia', 'Manutenção']),
+            'observations': '',
+            'meals': meals,
+            'total_nutrition': {name: round(rng.uniform(0, 3000), 1) for name in NUTRIENT_KEYS},
+            'status': 'ativo',
+            'id': plan_id,
+            'created_at': _moment(rng)
+        }
+    return plans
+
+def make_diaries(count, rng):
+    """Diário alimentar ({paciente: {dia: {refeição: [entradas]}}}) com `count` entradas"""
+    diaries = {}
+    for entry in range(count):
+        patient_id = f"PAC_{entry // DIARY_ENTRIES_PER_PATIENT + 1:04d}"
+        day = (date(2024, 1, 1) + timedelta(days=entry % DIARY_ENTRIES_PER_PATIENT // 2)).isoformat()
+        meal = MEALS[entry % 2 * 2]
+        diaries.setdefault(patient_id, {}).setdefault(day, {}).setdefault(meal, []).append({
+            **_food(rng),
+            'observacoes': '',
+            'timestamp': _moment(rng)
+        })
+    return diaries
+
+DATASETS = {
+    'pacientes': make_patients,
+    'planos': make_plans,
+    'diarios': make_diaries
+}
+
+def best_time(function, repetitions):
+    """Menor tempo (s) entre as repetições e o último resultado"""
+    best, result = float('inf'), None
+    for _ in range(repetitions):
+        result = None
+        gc.collect()
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def measure(data, path, fmt, repetitions):
+    """(gravação em s, leitura em s, tamanho em bytes, dados lidos)"""
+    save_time, _ = best_time(lambda: save_data(path, data, fmt), repetitions)
+    load_time, loaded = best_time(lambda: load_data(path), repetitions)
+    return save_time, load_time, os.path.getsize(path), loaded
+
+def main():
+    """Executa o benchmark e verifica que o binário é menor e mais rápido de ler"""
+    parser = argparse.ArgumentParser(description="Benchmark dos formatos dos arquivos de dados")
+    parser.add_argument("--registros", type=int, nargs='+', default=[10000, 100000], help="Quantidades de registros por conjunto")
+    parser.add_argument("--repeticoes", type=int, default=3, help="Repetições de cada medida (vale a menor)")
+    args = parser.parse_args()
+    
+    rng = random.Random(42)
+    failed = False
+    print(f"{'conjunto':<10} {'registros':>9} {'formato':<8} {'gravação':>10} {'leitura':>10} {'tamanho':>10}")
+    
+    with tempfile.TemporaryDirectory() as directory:
+        for count in args.registros:
+            for name, make in DATASETS.items():
+                data = make(count, rng)
+                results = {}
+                for fmt in FORMATS:
+                    path = os.path.join(directory, f"{name}_{fmt}.dat")
+                    save_time, load_time, size, loaded = measure(data, path, fmt, args.repeticoes)
+                    results[fmt] = (load_time, size)
+                    print(f"{name:<10} {count:>9} {fmt:<8} {save_time * 1000:>8.0f}ms {load_time * 1000:>8.0f}ms {size / 2 ** 20:>8.1f}MB")
+                    
+                    # Comparação pelo JSON: 1 == 1.0 no Python, mas inteiros devem voltar inteiros
+                    if json.dumps(loaded, ensure_ascii=False) != json.dumps(data, ensure_ascii=False):
+                        print(f"ERRO: {name} ({fmt}) lido diferente do gravado")
+                        failed = True
+                    del loaded
+                    os.remove(path)
+                
+                (json_load, json_size), (binary_load, binary_size) = results['json'], results['binario']
+                print(f"{'':<10} {'':>9} binário: leitura {json_load / binary_load:.1f}x mais rápida, arquivo {json_size / binary_size:.1f}x menor")
+                if binary_size >= json_size or binary_load >= json_load:
+                    print(f"ERRO: o binário não foi menor e mais rápido de ler que o JSON em {name} ({count} registros)")
+                    failed = True
+                del data
+    
+    if not failed:
+        print("OK: binário menor e mais rápido de ler em todos os conjuntos")
+    
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+NutriApp360 - Verificação de regressão do simulador de peso
+Simula o caso de referência (homem, 90 kg, 175 cm, 40 anos, sedentário,
+GET - 500 kcal por 52 semanas) e falha (código de saída 1) se a perda de
+peso ou a fração de massa magra perdida saírem das faixas esperadas pelo
+modelo de Hall (≈15,5 kg, ≈34% de massa magra).
+
+Uso: python benchmarks/check_weight_dynamics.py
+"""
+
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from core.formulas import ACTIVITY_FACTORS, calculate_bmr_batch
+from core.weight_dynamics import simulate_weight
+
+# Caso de referência e faixas aceitas (mínimo, máximo)
+REFERENCE_CASE = {'weight': 90, 'height': 175, 'age': 40, 'sex': "Masculino", 'activity_level': "Sedentário"}
+DEFICIT = 500
+WEEKS = 52
+EXPECTED_WEIGHT_LOSS = (14.5, 16.5)
+EXPECTED_LEAN_FRACTION = (0.30, 0.38)
+
+def run_reference_case():
+    """Retorna (peso perdido em kg, fração de massa magra no peso perdido)"""
+    case = REFERENCE_CASE
+    tdee = float(calculate_bmr_batch(case['weight'], case['height'], case['age'], case['sex'])) * ACTIVITY_FACTORS[case['activity_level']]
+    result = simulate_weight(intakes=[tdee - DEFICIT], weeks=WEEKS, **case)
+    
+    weight_lost = case['weight'] - result['peso'][0, -1]
+    lean_lost = result['massa_magra'][0, 0] - result['massa_magra'][0, -1]
+    return float(weight_lost), float(lean_lost / weight_lost)
+
+def main():
+    """Executa o caso de referência e verifica as faixas"""
+    weight_lost, lean_fraction = run_reference_case()
+    print(f"Peso perdido: {weight_lost:.2f} kg | fração de massa magra: {lean_fraction:.1%}")
+    
+    failed = False
+    if not EXPECTED_WEIGHT_LOSS[0] <= weight_lost <= EXPECTED_WEIGHT_LOSS[1]:
+        print(f"ERRO: perda de peso fora da faixa {EXPECTED_WEIGHT_LOSS} kg")
+        failed = True
+    
+    if not EXPECTED_LEAN_FRACTION[0] <= lean_fraction <= EXPECTED_LEAN_FRACTION[1]:
+        print(f"ERRO: fração de massa magra fora da faixa {EXPECTED_LEAN_FRACTION}")
+        failed = True
+    
+    if not failed:
+        print("OK: simulação dentro das faixas esperadas")
+    
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+"""
+NutriApp360 - Núcleo de cálculos
+Pacote sem dependência do Streamlit: usa apenas a biblioteca padrão e,
+opcionalmente, NumPy (importado sob demanda nas funções em lote).
+"""
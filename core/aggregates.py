@@ -0,0 +1,412 @@
+# core/aggregates.py
+"""Agregados materializados do dashboard do nutricionista
+
+Os números do dashboard (pacientes ativos, novos no mês, consultas de hoje
+e da semana, adesão ao diário, perda de peso média) ficam em um arquivo
+pequeno (data/dashboard_aggregates.json) atualizado a cada escrita pelos
+gerenciadores: cadastro de paciente, plano alimentar, diário, medida ou
+consulta. O dashboard lê apenas esses contadores, sem percorrer os dados.
+
+O arquivo contém:
+- contadores: totais atuais (pacientes, ativos, com plano ativo)
+- mensal: uma linha por mês (AAAA-MM) com novos pacientes, planos criados,
+  dias com diário, consultas e variação de peso
+- consultas_por_dia: número de consultas por data
+- pacientes: um resumo por paciente (status, planos ativos, datas do
+  diário, peso inicial/atual) usado nos alertas
+- atividades: as últimas ações registradas
+
+Se o arquivo não existir, ele é reconstruído uma vez a partir dos dados.
+"""
+import calendar
+import json
+import os
+import threading
+from datetime import date, datetime, timedelta
+
+from core.timeseries import to_seconds, decode_series
+from core.storage import write_json
+from core.formats import load_data
+
+AGGREGATES_FILE = 'data/dashboard_aggregates.json'
+
+# Arquivos lidos na reconstrução completa
+SOURCE_FILES = {
+    'pacientes': 'data/patients.json',
+    'planos': 'data/meal_plans.json',
+    'diario': 'data/food_diary.json',
+    'consultas': 'data/appointments.json'
+}
+
+# Atividades recentes mantidas e dias de diário guardados por paciente
+MAX_ACTIVITIES = 20
+DIARY_DAYS_KEPT = 62
+
+# Limites dos alertas
+DIARY_ALERT_DAYS = 2
+NEAR_GOAL_KG = 2.0
+UPCOMING_DAYS = 7
+
+# Status de consulta que não ocupam a agenda
+CANCELLED_STATUSES = ('cancelada',)
+
+def _empty_state():
+    return {
+        'contadores': {'pacientes': 0, 'ativos': 0, 'com_plano': 0},
+        'mensal': {},
+        'consultas_por_dia': {},
+        'pacientes': {},
+        'atividades': [],
+        'atualizado_em': None
+    }
+
+def _timestamp(value):
+    """Data/hora em ISO (segundos), comparável como texto"""
+    return (datetime(1970, 1, 1) + timedelta(seconds=to_seconds(value))).isoformat(timespec='seconds')
+
+def _month(value):
+    return str(value)[:7]
+
+def _day(value):
+    return str(value)[:10]
+
+def _month_row(state, month):
+    return state['mensal'].setdefault(month, {
+        'novos_pacientes': 0,
+        'planos_criados': 0,
+        'dias_diario': 0,
+        'pacientes_com_plano': 0,
+        'consultas': 0,
+        'variacao_peso': 0.0,
+        'pacientes_pesados': 0
+    })
+
+def _patient_row(state, patient_id):
+    return state['pacientes'].setdefault(patient_id, {
+        'nome': patient_id,
+        'status': None,  # definido quando o cadastro é salvo
+        'planos_ativos': 0,
+        'dias_diario': [],
+        'peso_inicial': None,
+        'peso_atual': None,
+        'ultima_pesagem': None,
+        'variacao_recente': None,
+        'meses_pesados': [],
+        'peso_meta': None
+    })
+
+class DashboardAggregates:
+    """Agregados do dashboard mantidos de forma incremental"""
+    
+    def __init__(self, path=AGGREGATES_FILE, sources=None, store=None, archive=None):
+        self.path = path
+        self.sources = sources or SOURCE_FILES
+        self.store = store
+        self.archive = archive
+        self._lock = threading.RLock()
+        self._cached = None
+    
+    # Leitura e escrita
+    
+    def load(self):
+        """Estado atual (reconstruído a partir dos dados se o arquivo não existir)"""
+        with self._lock:
+            try:
+                version = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError:
+                return self.rebuild()
+            
+            if self._cached and self._cached[0] == version:
+                return self._cached[1]
+            
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self._cached = (version, state)
+            return state
+    
+    def _save(self, state):
+        state['atualizado_em'] = datetime.now().isoformat()
+        write_json(self.path, state)
+        self._cached = (os.stat(self.path).st_mtime_ns, state)
+    
+    def _update(self, change):
+        with self._lock:
+            state = self.load()
+            change(state)
+            self._save(state)
+    
+    def _log(self, state, patient_id, action, icon, when=None):
+        name = state['pacientes'].get(patient_id, {}).get('nome', patient_id)
+        state['atividades'].insert(0, {'quando': (when or datetime.now()).isoformat(), 'paciente': name, 'acao': action, 'icone': icon})
+        del state['atividades'][MAX_ACTIVITIES:]
+    
+    # Eventos de escrita
+    
+    def patient_saved(self, patient_id, patient, previous=None):
+        """Cadastro criado ou atualizado (inclui inativação)"""
+        self._update(lambda state: self._apply_patient(state, patient_id, patient, previous))
+    
+    def _apply_patient(self, state, patient_id, patient, previous=None, log=True):
+        counters = state['contadores']
+        row = _patient_row(state, patient_id)
+        was_active = previous is not None and previous.get('status', 'ativo') == 'ativo'
+        is_active = patient.get('status', 'ativo') == 'ativo'
+        
+        if previous is None:
+            counters['pacientes'] += 1
+            _month_row(state, _month(patient.get('created_at') or date.today()))['novos_pacientes'] += 1
+        
+        counters['ativos'] += int(is_active) - int(was_active)
+        if row['planos_ativos'] > 0 and was_active != is_active and previous is not None:
+            counters['com_plano'] += 1 if is_active else -1
+        
+        row.update(nome=patient.get('nome', patient_id), status=patient.get('status', 'ativo'), peso_meta=patient.get('peso_meta'))
+        
+        if log:
+            if previous is None:
+                self._log(state, patient_id, "Paciente cadastrado", "👤")
+            elif was_active and not is_active:
+                self._log(state, patient_id, "Paciente inativado", "🗃️")
+            else:
+                self._log(state, patient_id, "Cadastro atualizado", "📝")
+    
+    def plan_saved(self, plan):
+        """Novo plano alimentar"""
+        self._update(lambda state: self._apply_plan(state, plan))
+    
+    def _apply_plan(self, state, plan, log=True):
+        month = _month_row(state, _month(plan.get('created_at') or date.today()))
+        month['planos_criados'] += 1
+        
+        patient_id = plan.get('patient_id')
+        if not patient_id or plan.get('status', 'ativo') != 'ativo':
+            return
+        
+        row = _patient_row(state, patient_id)
+        row['planos_ativos'] += 1
+        if row['planos_ativos'] == 1 and row['status'] == 'ativo':
+            state['contadores']['com_plano'] += 1
+        month['pacientes_com_plano'] = max(month['pacientes_com_plano'], state['contadores']['com_plano'])
+        
+        if log:
+            self._log(state, patient_id, "Plano alimentar criado", "🍽️")
+    
+    def diary_entry(self, patient_id, day):
+        """Registro no diário alimentar; conta um dia por paciente"""
+        self._update(lambda state: self._apply_diary(state, patient_id, _day(day)))
+    
+    def _apply_diary(self, state, patient_id, day, log=True):
+        row = _patient_row(state, patient_id)
+        if day in row['dias_diario']:
+            return
+        
+        row['dias_diario'] = sorted(row['dias_diario'] + [day])[-DIARY_DAYS_KEPT:]
+        month = _month_row(state, _month(day))
+        month['dias_diario'] += 1
+        month['pacientes_com_plano'] = max(month['pacientes_com_plano'], state['contadores']['com_plano'])
+        
+        if log:
+            self._log(state, patient_id, "Diário alimentar registrado", "🍎")
+    
+    def measurement(self, patient_id, timestamp, values):
+        """Nova medida; o peso alimenta a variação mensal e os alertas"""
+        if values.get('peso'):
+            self._update(lambda state: self._apply_weight(state, patient_id, _timestamp(timestamp), float(values['peso'])))
+    
+    def _apply_weight(self, state, patient_id, timestamp, weight, log=True):
+        row = _patient_row(state, patient_id)
+        month_key = _month(timestamp)
+        
+        # Medidas retroativas só entram como peso inicial
+        if row['ultima_pesagem'] and timestamp < row['ultima_pesagem']:
+            if row['peso_inicial'] is None or timestamp < row.get('primeira_pesagem', timestamp):
+                row['peso_inicial'], row['primeira_pesagem'] = weight, timestamp
+            return
+        
+        month = _month_row(state, month_key)
+        if row['peso_atual'] is not None:
+            row['variacao_recente'] = weight - row['peso_atual']
+            month['variacao_peso'] += row['variacao_recente']
+            if month_key not in row['meses_pesados']:
+                row['meses_pesados'] = (row['meses_pesados'] + [month_key])[-24:]
+                month['pacientes_pesados'] += 1
+        else:
+            row['peso_inicial'], row['primeira_pesagem'] = weight, timestamp
+        
+        row['peso_atual'], row['ultima_pesagem'] = weight, timestamp
+        
+        if log:
+            self._log(state, patient_id, "Medida registrada", "⚖️")
+    
+    def appointment_saved(self, appointment, previous=None):
+        """Consulta agendada, alterada ou cancelada"""
+        self._update(lambda state: self._apply_appointment(state, appointment, previous))
+    
+    def _apply_appointment(self, state, appointment, previous=None, log=True):
+        def shift(record, amount):
+            if record and record.get('status') not in CANCELLED_STATUSES:
+                day = _day(record['inicio'])
+                by_day = state['consultas_por_dia']
+                by_day[day] = by_day.get(day, 0) + amount
+                if not by_day[day]:
+                    del by_day[day]
+                _month_row(state, _month(day))['consultas'] += amount
+        
+        shift(previous, -1)
+        shift(appointment, 1)
+        
+        if log:
+            cancelled = appointment.get('status') in CANCELLED_STATUSES
+            self._log(state, appointment.get('patient_id'), "Consulta cancelada" if cancelled else "Consulta agendada", "❌" if cancelled else "📅")
+    
+    # Reconstrução completa
+    
+    def _read_source(self, name):
+        path = self.sources.get(name)
+        if not path or not os.path.exists(path):
+            return {}
+        return load_data(path) or {}
+    
+    def rebuild(self):
+        """Recalcula todos os agregados a partir dos arquivos de dados"""
+        with self._lock:
+            state = _empty_state()
+            patients, plans, diaries = (self._read_source(name) for name in ('pacientes', 'planos', 'diario'))
+            
+            # Pacientes arquivados (core/archive.py) continuam contando
+            archived_series = {}
+            if self.archive is not None:
+                for patient_id, bundle in self.archive.bundles():
+                    patients.setdefault(patient_id, bundle['paciente'])
+                    for plan_id, plan in bundle['planos'].items():
+                        plans.setdefault(plan_id, plan)
+                    diaries.setdefault(patient_id, bundle['diario'])
+                    archived_series[patient_id] = bundle['medidas']
+            
+            for patient_id, patient in patients.items():
+                self._apply_patient(state, patient_id, {**patient, 'status': 'ativo'}, log=False)
+                if patient.get('status', 'ativo') != 'ativo':
+                    self._apply_patient(state, patient_id, patient, previous={'status': 'ativo'}, log=False)
+            
+            for plan in sorted(plans.values(), key=lambda plan: str(plan.get('created_at', ''))):
+                self._apply_plan(state, plan, log=False)
+            
+            for patient_id, days in diaries.items():
+                for day in days:
+                    self._apply_diary(state, patient_id, _day(day), log=False)
+            
+            for appointment in self._read_source('consultas').values():
+                if isinstance(appointment, dict) and appointment.get('inicio'):
+                    self._apply_appointment(state, appointment, log=False)
+            
+            if self.store is not None:
+                for patient_id in state['pacientes']:
+                    if self.store.version(patient_id) is None and archived_series.get(patient_id):
+                        series = decode_series(archived_series[patient_id])
+                    else:
+                        series = self.store.load(patient_id)
+                    for timestamp, weight in zip(series['timestamp'], series['peso']):
+                        if weight == weight:  # ignora NaN
+                            self._apply_weight(state, patient_id, _timestamp(str(timestamp)), float(weight), log=False)
+            
+            self._save(state)
+            return state
+    
+    # Consultas do dashboard
+    
+    def summary(self, today=None):
+        """Métricas principais: pacientes, novos no mês, consultas e adesão"""
+        today = today or date.today()
+        state = self.load()
+        counters = state['contadores']
+        by_day = state['consultas_por_dia']
+        month = state['mensal'].get(_month(today), {})
+        
+        return {
+            'total_patients': counters['pacientes'],
+            'active_patients': counters['ativos'],
+            'patients_with_plan': counters['com_plano'],
+            'new_this_month': month.get('novos_pacientes', 0),
+            'appointments_today': by_day.get(today.isoformat(), 0),
+            'upcoming_appointments': sum(by_day.get((today + timedelta(days=offset)).isoformat(), 0) for offset in range(UPCOMING_DAYS)),
+            'adherence': self._adherence(month, today.year, today.month, today),
+            'adherence_previous': self._previous_month_adherence(state, today)
+        }
+    
+    def _adherence(self, month, year, month_number, today=None):
+        """Dias com diário / (pacientes com plano × dias do mês decorridos), em %"""
+        days = calendar.monthrange(year, month_number)[1]
+        if today and (today.year, today.month) == (year, month_number):
+            days = today.day
+        expected = month.get('pacientes_com_plano', 0) * days
+        return round(min(100.0, month.get('dias_diario', 0) / expected * 100), 1) if expected else None
+    
+    def _previous_month_adherence(self, state, today):
+        previous = today.replace(day=1) - timedelta(days=1)
+        return self._adherence(state['mensal'].get(_month(previous), {}), previous.year, previous.month)
+    
+    def monthly_evolution(self, months=12, today=None):
+        """Linhas mensais: mês, perda de peso média (kg), adesão (%), novos pacientes"""
+        today = today or date.today()
+        state = self.load()
+        rows = []
+        year, month_number = today.year, today.month
+        
+        for _ in range(months):
+            key = f"{year:04d}-{month_number:02d}"
+            month = state['mensal'].get(key, {})
+            weighed = month.get('pacientes_pesados', 0)
+            rows.append({
+                'date': key,
+                'weight_loss': round(-month.get('variacao_peso', 0.0) / weighed, 2) if weighed else None,
+                'adherence': self._adherence(month, year, month_number, today),
+                'new_patients': month.get('novos_pacientes', 0),
+                'plans_created': month.get('planos_criados', 0),
+                'appointments': month.get('consultas', 0)
+            })
+            year, month_number = (year, month_number - 1) if month_number > 1 else (year - 1, 12)
+        
+        return rows[::-1]
+    
+    def recent_activities(self, limit=5):
+        """Últimas ações registradas"""
+        return self.load()['atividades'][:limit]
+    
+    def alerts(self, today=None):
+        """Contagens para os alertas a partir dos resumos por paciente"""
+        today = today or date.today()
+        diary_limit = (today - timedelta(days=DIARY_ALERT_DAYS)).isoformat()
+        week_ago = (today - timedelta(days=7)).isoformat()
+        counts = {'sem_diario': 0, 'perto_da_meta': 0, 'perderam_peso_semana': 0, 'sem_plano': 0}
+        
+        for row in self.load()['pacientes'].values():
+            if row['status'] != 'ativo':
+                continue
+            if row['planos_ativos'] == 0:
+                counts['sem_plano'] += 1
+            elif not row['dias_diario'] or row['dias_diario'][-1] < diary_limit:
+                counts['sem_diario'] += 1
+            if row['peso_meta'] and row['peso_atual'] is not None and abs(row['peso_atual'] - row['peso_meta']) <= NEAR_GOAL_KG:
+                counts['perto_da_meta'] += 1
+            if (row['variacao_recente'] or 0) < 0 and (row['ultima_pesagem'] or '') >= week_ago:
+                counts['perderam_peso_semana'] += 1
+        
+        return counts
+
+_DEFAULT_AGGREGATES = None
+
+def get_aggregates():
+    """Agregados padrão (data/dashboard_aggregates.json), compartilhados pelo processo"""
+    global _DEFAULT_AGGREGATES
+    if _DEFAULT_AGGREGATES is None:
+        from core.timeseries import get_store
+        from core.archive import get_archive
+        
+        _DEFAULT_AGGREGATES = DashboardAggregates(store=get_store(), archive=get_archive())
+    return _DEFAULT_AGGREGATES
+
+def rebuild_job(params, progress):
+    """Tarefa em segundo plano: recalcula os agregados padrão"""
+    progress(0.1, "Recalculando agregados", force=True)
+    state = get_aggregates().rebuild()
+    return {'pacientes': len(state['pacientes']), 'atualizado_em': state.get('atualizado_em')}
@@ -0,0 +1,308 @@
+# core/appointments.py
+"""Agenda de consultas com detecção de conflitos por árvore de intervalos
+
+As consultas ficam em data/appointments.json ({id: consulta}), com início e
+fim em ISO ('inicio', 'fim'), paciente ('patient_id', 'paciente'),
+nutricionista (usuário), tipo, local e status. Em memória, a agenda de cada
+nutricionista e de cada paciente é uma árvore de intervalos (core.intervals):
+verificar conflito ao agendar custa O(log n), e as listagens "hoje" e
+"próximos dias" percorrem apenas as consultas da janela pedida.
+
+Consultas canceladas continuam no arquivo (histórico), mas não ocupam a agenda.
+Cada alteração atualiza os agregados do dashboard e o lembrete por e-mail
+da consulta (core.notifications).
+"""
+import heapq
+import json
+import os
+import threading
+from datetime import date, datetime, timedelta
+
+from core.aggregates import CANCELLED_STATUSES, get_aggregates
+from core.intervals import IntervalTree
+from core.notifications import get_notifier
+from core.storage import write_json
+from core.timeseries import to_seconds
+
+APPOINTMENTS_FILE = 'data/appointments.json'
+
+# Duração padrão de uma consulta (minutos)
+APPOINTMENT_DURATION = 45
+
+APPOINTMENT_TYPES = ("Primeira consulta", "Retorno", "Reavaliação", "Acompanhamento")
+
+APPOINTMENT_STATUSES = {
+    'agendada': "Agendada",
+    'confirmada': "Confirmada",
+    'realizada': "Realizada",
+    'faltou': "Faltou",
+    'cancelada': "Cancelada"
+}
+
+class ScheduleConflict(ValueError):
+    """Horário ocupado; conflicts traz as consultas que se sobrepõem"""
+    
+    def __init__(self, message, conflicts):
+        super().__init__(message)
+        self.conflicts = conflicts
+
+def _datetime(value):
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    if isinstance(value, date) and not isinstance(value, datetime):
+        return datetime.combine(value, datetime.min.time())
+    return value
+
+def _from_seconds(seconds):
+    return datetime(1970, 1, 1) + timedelta(seconds=seconds)
+
+def _occupies(appointment):
+    return appointment.get('status') not in CANCELLED_STATUSES
+
+class AppointmentBook:
+    """Consultas de todos os nutricionistas, indexadas por árvores de intervalos"""
+    
+    def __init__(self, path=APPOINTMENTS_FILE, aggregates=None, reminders=None):
+        self.path = path
+        self.aggregates = aggregates
+        self.reminders = reminders
+        self._lock = threading.RLock()
+        self._version = None
+        self._appointments = {}
+        self._by_nutritionist = {}
+        self._by_patient = {}
+    
+    # Leitura, índices e escrita
+    
+    def _refresh(self):
+        """Relê o arquivo se ele mudou desde a última leitura"""
+        try:
+            version = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            version = None
+        
+        if version == self._version:
+            return
+        
+        appointments = {}
+        if version is not None:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                appointments = json.load(f) or {}
+        
+        self._appointments = {key: value for key, value in appointments.items() if isinstance(value, dict) and value.get('inicio')}
+        self._by_nutritionist, self._by_patient = {}, {}
+        for appointment in self._appointments.values():
+            self._index(appointment)
+        self._version = version
+    
+    def _index(self, appointment):
+        if not _occupies(appointment):
+            return
+        start, end = to_seconds(appointment['inicio']), to_seconds(appointment['fim'])
+        for trees, owner in ((self._by_nutritionist, appointment.get('nutricionista')), (self._by_patient, appointment.get('patient_id'))):
+            if owner:
+                trees.setdefault(owner, IntervalTree()).insert(start, end, appointment['id'], appointment)
+    
+    def _unindex(self, appointment):
+        for trees, owner in ((self._by_nutritionist, appointment.get('nutricionista')), (self._by_patient, appointment.get('patient_id'))):
+            if owner in trees:
+                trees[owner].remove(appointment['id'])
+    
+    def _save(self):
+        write_json(self.path, self._appointments, indent=2)
+        self._version = os.stat(self.path).st_mtime_ns
+    
+    def _next_id(self):
+        numbers = [int(key.split('_')[-1]) for key in self._appointments if key.split('_')[-1].isdigit()]
+        return f"CON_{max(numbers, default=0) + 1:04d}"
+    
+    def _notify(self, appointment, previous=None):
+        if self.aggregates is not None:
+            self.aggregates.appointment_saved(appointment, previous)
+        if self.reminders is not None:
+            self.reminders.appointment_saved(appointment, previous)
+    
+    # Consultas
+    
+    def get(self, appointment_id):
+        """Consulta pelo identificador (None se não existir)"""
+        with self._lock:
+            self._refresh()
+            return self._appointments.get(appointment_id)
+    
+    def conflicts(self, nutritionist, start, end, patient_id=None, ignore=None):
+        """Consultas que ocupam [start, end) na agenda do nutricionista ou do paciente"""
+        with self._lock:
+            self._refresh()
+            start, end = to_seconds(start), to_seconds(end)
+            found = {}
+            for trees, owner in ((self._by_nutritionist, nutritionist), (self._by_patient, patient_id)):
+                tree = trees.get(owner)
+                if tree is None:
+                    continue
+                # Com a agenda sem conflitos, a primeira sobreposição basta em O(log n)
+                if tree.first_overlap(start, end) is None:
+                    continue
+                for _, _, key, appointment in tree.overlapping(start, end):
+                    if key != ignore:
+                        found[key] = appointment
+            return sorted(found.values(), key=lambda appointment: appointment['inicio'])
+    
+    def is_free(self, nutritionist, start, end, patient_id=None):
+        """True se o nutricionista (e o paciente, se informado) estiver livre em [start, end)"""
+        return not self.conflicts(nutritionist, start, end, patient_id)
+    
+    def book(self, patient_id, nutritionist, start, duration=APPOINTMENT_DURATION, **details):
+        """Agenda uma consulta; levanta ScheduleConflict se o horário estiver ocupado
+        
+        details: paciente (nome), tipo, local, observacoes, status.
+        """
+        start = _datetime(start).replace(second=0, microsecond=0)
+        end = start + timedelta(minutes=duration)
+        
+        with self._lock:
+            self._refresh()
+            conflicts = self.conflicts(nutritionist, start, end, patient_id)
+            if conflicts:
+                raise ScheduleConflict("Horário indisponível", conflicts)
+            
+            appointment = {
+                'id': self._next_id(),
+                'patient_id': patient_id,
+                'paciente': details.get('paciente', patient_id),
+                'nutricionista': nutritionist,
+                'inicio': start.isoformat(),
+                'fim': end.isoformat(),
+                'tipo': details.get('tipo', APPOINTMENT_TYPES[1]),
+                'local': details.get('local', ""),
+                'observacoes': details.get('observacoes', ""),
+                'status': details.get('status', 'agendada'),
+                'created_at': datetime.now().isoformat()
+            }
+            self._appointments[appointment['id']] = appointment
+            self._index(appointment)
+            self._save()
+        
+        self._notify(appointment)
+        return appointment
+    
+    def reschedule(self, appointment_id, start, duration=None):
+        """Muda o horário de uma consulta; levanta ScheduleConflict se o novo horário estiver ocupado"""
+        with self._lock:
+            self._refresh()
+            previous = self._appointments[appointment_id]
+            if duration is None:
+                duration = (_datetime(previous['fim']) - _datetime(previous['inicio'])).total_seconds() / 60
+            
+            start = _datetime(start).replace(second=0, microsecond=0)
+            end = start + timedelta(minutes=duration)
+            conflicts = self.conflicts(previous['nutricionista'], start, end, previous.get('patient_id'), ignore=appointment_id)
+            if conflicts:
+                raise ScheduleConflict("Horário indisponível", conflicts)
+            
+            appointment = {**previous, 'inicio': start.isoformat(), 'fim': end.isoformat(), 'updated_at': datetime.now().isoformat()}
+            self._replace(previous, appointment)
+        
+        self._notify(appointment, previous)
+        return appointment
+    
+    def set_status(self, appointment_id, status):
+        """Altera o status (confirmada, realizada, faltou, cancelada...)"""
+        if status not in APPOINTMENT_STATUSES:
+            raise ValueError(f"Status inválido: {status}")
+        
+        with self._lock:
+            self._refresh()
+            previous = self._appointments[appointment_id]
+            appointment = {**previous, 'status': status, 'updated_at': datetime.now().isoformat()}
+            if _occupies(appointment) and not _occupies(previous):
+                conflicts = self.conflicts(previous['nutricionista'], previous['inicio'], previous['fim'], previous.get('patient_id'))
+                if conflicts:
+                    raise ScheduleConflict("Horário ocupado por outra consulta", conflicts)
+            self._replace(previous, appointment)
+        
+        self._notify(appointment, previous)
+        return appointment
+    
+    def cancel(self, appointment_id):
+        """Cancela uma consulta (mantida no histórico)"""
+        return self.set_status(appointment_id, 'cancelada')
+    
+    def _replace(self, previous, appointment):
+        self._unindex(previous)
+        self._appointments[appointment['id']] = appointment
+        self._index(appointment)
+        self._save()
+    
+    # Listagens por período
+    
+    def between(self, start, end, nutritionist=None, patient_id=None):
+        """Consultas ativas que tocam [start, end), em ordem de início
+        
+        Sem nutricionista nem paciente, junta as agendas de todos os
+        nutricionistas (heapq.merge das listas já ordenadas de cada árvore).
+        """
+        with self._lock:
+            self._refresh()
+            start, end = to_seconds(start), to_seconds(end)
+            
+            if patient_id is not None:
+                trees = [self._by_patient.get(patient_id)]
+            elif nutritionist is not None:
+                trees = [self._by_nutritionist.get(nutritionist)]
+            else:
+                trees = list(self._by_nutritionist.values())
+            
+            found = [tree.overlapping(start, end) for tree in trees if tree is not None]
+            appointments = [item[3] for item in heapq.merge(*found, key=lambda item: (item[0], item[2]))]
+        
+        if patient_id is not None and nutritionist is not None:
+            appointments = [appointment for appointment in appointments if appointment.get('nutricionista') == nutritionist]
+        return appointments
+    
+    def on_day(self, day=None, nutritionist=None, patient_id=None):
+        """Consultas de um dia (hoje por padrão)"""
+        day = _datetime(day or date.today()).replace(hour=0, minute=0, second=0, microsecond=0)
+        return self.between(day, day + timedelta(days=1), nutritionist, patient_id)
+    
+    def upcoming(self, nutritionist=None, patient_id=None, days=7, limit=None, now=None):
+        """Próximas consultas (a partir de agora, nos próximos dias)"""
+        now = _datetime(now) if now else datetime.now()
+        appointments = self.between(now, now + timedelta(days=days), nutritionist, patient_id)
+        appointments = [appointment for appointment in appointments if _datetime(appointment['inicio']) >= now]
+        return appointments[:limit] if limit else appointments
+    
+    def next_for_patient(self, patient_id, now=None, horizon_days=365):
+        """Próxima consulta de um paciente (None se não houver)"""
+        upcoming = self.upcoming(patient_id=patient_id, days=horizon_days, limit=1, now=now)
+        return upcoming[0] if upcoming else None
+    
+    def free_intervals(self, nutritionist, start, end):
+        """Trechos livres da agenda de um nutricionista em [start, end), como (início, fim) datetime"""
+        with self._lock:
+            self._refresh()
+            start, end = to_seconds(start), to_seconds(end)
+            tree = self._by_nutritionist.get(nutritionist)
+            gaps = tree.gaps(start, end) if tree is not None else [(start, end)]
+        return [(_from_seconds(gap_start), _from_seconds(gap_end)) for gap_start, gap_end in gaps]
+    
+    def nutritionists(self):
+        """Nutricionistas com consultas ativas"""
+        with self._lock:
+            self._refresh()
+            return sorted(owner for owner, tree in self._by_nutritionist.items() if len(tree))
+    
+    def all(self):
+        """Todas as consultas (inclusive canceladas), mais recentes primeiro"""
+        with self._lock:
+            self._refresh()
+            return sorted(self._appointments.values(), key=lambda appointment: appointment['inicio'], reverse=True)
+
+_DEFAULT_BOOK = None
+
+def get_appointment_book():
+    """Agenda padrão (data/appointments.json), compartilhada pelo processo"""
+    global _DEFAULT_BOOK
+    if _DEFAULT_BOOK is None:
+        _DEFAULT_BOOK = AppointmentBook(aggregates=get_aggregates(), reminders=get_notifier())
+    return _DEFAULT_BOOK
@@ -0,0 +1,383 @@
+# core/archive.py
+"""Arquivo (armazenamento frio) dos pacientes inativos
+
+Pacientes inativados há mais de `dias_inativo` dias saem dos arquivos
+usados no dia a dia (patients.json, food_diary.json, meal_plans.json e a
+série em data/timeseries/) e vão para um pacote por paciente em
+data/archive/<id>.json.xz: um JSON comprimido com lzma contendo o cadastro,
+o diário, os planos e o conteúdo binário da série de medidas. O índice
+data/archive/index.json guarda só o cadastro e os ids dos planos de cada
+paciente arquivado, o suficiente para listá-los sem abrir os pacotes.
+
+Ao acessar um paciente arquivado (get_patient, diário, evolução) o pacote é
+devolvido aos arquivos quentes (rehydrate) e removido do arquivo. A ordem
+das gravações permite retomar depois de uma interrupção: ao arquivar, o
+pacote e o índice são gravados antes de os dados saírem dos arquivos
+quentes; ao reidratar, os dados voltam antes de o índice ser alterado. Os
+dados que estiverem nos dois lugares são mesclados sem duplicar entradas.
+"""
+import base64
+import json
+import lzma
+import os
+import re
+import threading
+from datetime import date, datetime, timedelta
+
+from core.jobs import get_job_queue
+from core.storage import BARRIER, updating, write_bytes
+from core.formats import data_format, dumps, load_data
+from core.timeseries import get_store, _decode_header
+
+ARCHIVE_DIR = 'data/archive'
+PATIENTS_FILE = 'data/patients.json'
+DIARY_FILE = 'data/food_diary.json'
+PLANS_FILE = 'data/meal_plans.json'
+CONFIG_FILE = 'data/system_config.json'
+
+ARCHIVE_VERSION = 1
+
+ARCHIVE_DEFAULTS = {
+    'ativo': True,
+    'dias_inativo': 180
+}
+
+_PATIENT_ID = re.compile(r'^[A-Za-z0-9_-]+$')
+
+def load_archive_settings(path=CONFIG_FILE):
+    """Configurações do arquivamento (chave "arquivamento" das configurações do sistema)"""
+    config = {}
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    return {**ARCHIVE_DEFAULTS, **config.get('arquivamento', {})}
+
+def _read_data(path):
+    if not os.path.exists(path):
+        return {}
+    return load_data(path) or {}
+
+def _parse(moment):
+    try:
+        return datetime.fromisoformat(str(moment)).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+def inactive_since(patient):
+    """Início da inatividade: inativação (ou última atualização) ou a última volta do arquivo"""
+    moments = [_parse(patient.get('inativado_em') or patient.get('updated_at')), _parse(patient.get('desarquivado_em'))]
+    moments = [moment for moment in moments if moment]
+    return max(moments) if moments else None
+
+def merge_diary(diary, other):
+    """Diário com as entradas dos dois lados (entradas iguais não se repetem)"""
+    merged = {day: {meal: list(entries) for meal, entries in meals.items()} for day, meals in diary.items()}
+    for day, meals in other.items():
+        for meal, entries in meals.items():
+            target = merged.setdefault(day, {}).setdefault(meal, [])
+            target.extend(entry for entry in entries if entry not in target)
+    return merged
+
+def merge_series(data, other):
+    """Conteúdo de dois arquivos da mesma série (sem repetir os registros de um que o outro já contém)"""
+    if not data or not other:
+        return data or other
+    columns, offset = _decode_header(data)
+    other_columns, other_offset = _decode_header(other)
+    if columns != other_columns:
+        raise ValueError("Séries com colunas diferentes")
+    body, other_body = data[offset:], other[other_offset:]
+    if other_body.startswith(body):
+        return other
+    if body.startswith(other_body):
+        return data
+    return data + other_body
+
+class PatientArchive:
+    """Pacotes comprimidos dos pacientes inativos, com índice para listagem"""
+    
+    def __init__(self, path=ARCHIVE_DIR, patients_file=PATIENTS_FILE, diary_file=DIARY_FILE, plans_file=PLANS_FILE, store=None):
+        self.path = path
+        self.index_file = os.path.join(path, 'index.json')
+        self.patients_file = patients_file
+        self.diary_file = diary_file
+        self.plans_file = plans_file
+        self.store = store or get_store()
+        self._lock = threading.RLock()
+        self._cached = None
+    
+    def bundle_path(self, patient_id):
+        if not _PATIENT_ID.match(str(patient_id)):
+            raise ValueError(f"Identificador de paciente inválido: {patient_id}")
+        return os.path.join(self.path, f"{patient_id}.json.xz")
+    
+    def index(self):
+        """{id: {'paciente', 'planos', 'arquivado_em', 'tamanho'}} (mantido em memória enquanto o arquivo não mudar)"""
+        try:
+            version = os.stat(self.index_file).st_mtime_ns
+        except FileNotFoundError:
+            return {}
+        cached = self._cached
+        if cached and cached[0] == version:
+            return cached[1]
+        index = _read_data(self.index_file)
+        self._cached = (version, index)
+        return index
+    
+    def __contains__(self, patient_id):
+        return patient_id in self.index()
+    
+    def __len__(self):
+        return len(self.index())
+    
+    def reserved_ids(self):
+        """Ids de pacientes e de planos arquivados (não podem ser reutilizados)"""
+        ids = set()
+        for patient_id, entry in self.index().items():
+            ids.add(patient_id)
+            ids.update(entry.get('planos', []))
+        return ids
+    
+    def size(self):
+        """Bytes ocupados pelos pacotes"""
+        return sum(entry.get('tamanho', 0) for entry in self.index().values())
+    
+    def load_bundle(self, patient_id):
+        """Pacote do paciente: {'paciente', 'diario', 'planos', 'medidas' (bytes ou None), ...}"""
+        with open(self.bundle_path(patient_id), 'rb') as f:
+            bundle = json.loads(lzma.decompress(f.read()).decode('utf-8'))
+        bundle['medidas'] = base64.b64decode(bundle['medidas']) if bundle.get('medidas') else None
+        return bundle
+    
+    def bundles(self):
+        """(id, pacote) de cada paciente arquivado"""
+        for patient_id in list(self.index()):
+            try:
+                yield patient_id, self.load_bundle(patient_id)
+            except FileNotFoundError:
+                continue
+    
+    def candidates(self, days, now=None, patients=None):
+        """Ids dos pacientes inativos há mais de `days` dias"""
+        limit = (now or datetime.now()) - timedelta(days=days)
+        patients = _read_data(self.patients_file) if patients is None else patients
+        return [
+            patient_id for patient_id, patient in patients.items()
+            if patient.get('status', 'ativo') == 'inativo' and (inactive_since(patient) or limit) < limit
+        ]
+    
+    def _series(self, patient_id):
+        try:
+            with open(self.store.path(patient_id), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+    
+    def _hot_paths(self, patient_ids):
+        return [self.patients_file, self.diary_file, self.plans_file, self.index_file] + [self.store.path(patient_id) for patient_id in patient_ids]
+    
+    def _series_size(self, patient_id):
+        try:
+            return os.path.getsize(self.store.path(patient_id))
+        except FileNotFoundError:
+            return 0
+    
+    def _swap(self, payloads, removed=()):
+        """Grava os arquivos já serializados e apaga os removidos, numa única escrita para o snapshot"""
+        with BARRIER.writing(*[path for path, _ in payloads], *removed):
+            for path, payload in payloads:
+                write_bytes(path, payload)
+            for path in removed:
+                if os.path.exists(path):
+                    os.remove(path)
+        self._cached = None
+    
+    def archive(self, patient_ids, progress=None):
+        """Move os pacientes indicados para o arquivo; retorna o resumo
+        
+        Os pacotes são montados e comprimidos a partir de uma leitura dos
+        arquivos quentes, sem travar ninguém. Só a remoção trava os arquivos
+        contra as gravações dos gerenciadores (updating): eles são relidos e
+        perdem apenas os pacientes arquivados; quem mudou nesse meio-tempo
+        fica para a próxima vez. A barreira de escrita cobre só as trocas.
+        """
+        now = datetime.now().isoformat()
+        summary = {'pacientes': 0, 'planos': 0, 'dias_diario': 0, 'medidas_bytes': 0, 'bytes_arquivo': 0}
+        
+        with self._lock:
+            patients = _read_data(self.patients_file)
+            patient_ids = [patient_id for patient_id in patient_ids if patient_id in patients]
+            if not patient_ids:
+                return summary
+            diaries = _read_data(self.diary_file)
+            plans_by_patient = _plans_by_patient(_read_data(self.plans_file))
+            previous_index = self.index()
+            
+            os.makedirs(self.path, exist_ok=True)
+            built = {}
+            for i, patient_id in enumerate(patient_ids):
+                if progress:
+                    progress(i / len(patient_ids) * 0.9, f"Arquivando {i}/{len(patient_ids)} pacientes")
+                
+                # Paciente que voltou aos arquivos quentes sem sair do arquivo: mescla com o pacote anterior
+                previous = self.load_bundle(patient_id) if patient_id in previous_index and os.path.exists(self.bundle_path(patient_id)) else {}
+                hot_series = self._series(patient_id)
+                patient_plans = {**previous.get('planos', {}), **plans_by_patient.get(patient_id, {})}
+                diary = merge_diary(previous.get('diario', {}), diaries.get(patient_id, {}))
+                series = merge_series(previous.get('medidas'), hot_series)
+                
+                bundle = {
+                    'versao': ARCHIVE_VERSION,
+                    'arquivado_em': now,
+                    'paciente': patients[patient_id],
+                    'diario': diary,
+                    'planos': patient_plans,
+                    'medidas': base64.b64encode(series).decode('ascii') if series else None
+                }
+                data = lzma.compress(json.dumps(bundle, ensure_ascii=False, default=str).encode('utf-8'))
+                # Pacote novo ou mesclado (contém tudo o que o anterior tinha): seguro gravar antes da troca
+                write_bytes(self.bundle_path(patient_id), data)
+                
+                built[patient_id] = {
+                    'lido': (patients[patient_id], diaries.get(patient_id, {}), plans_by_patient.get(patient_id, {}), len(hot_series or b'')),
+                    'indice': {'paciente': patients[patient_id], 'planos': sorted(patient_plans), 'arquivado_em': now, 'tamanho': len(data)},
+                    'resumo': (len(patient_plans), len(diary), len(series or b''), len(data))
+                }
+            
+            if progress:
+                progress(0.9, "Removendo dos arquivos em uso", force=True)
+            
+            with updating(*self._hot_paths(patient_ids)):
+                patients = _read_data(self.patients_file)
+                diaries = _read_data(self.diary_file)
+                plans = _read_data(self.plans_file)
+                plans_by_patient = _plans_by_patient(plans)
+                
+                moved = [
+                    patient_id for patient_id, entry in built.items()
+                    if entry['lido'] == (patients.get(patient_id), diaries.get(patient_id, {}), plans_by_patient.get(patient_id, {}), self._series_size(patient_id))
+                ]
+                for patient_id in set(built) - set(moved):
+                    if patient_id not in previous_index:
+                        os.remove(self.bundle_path(patient_id))
+                if not moved:
+                    return summary
+                
+                index = dict(self.index())
+                index.update({patient_id: built[patient_id]['indice'] for patient_id in moved})
+                fmt = data_format()
+                
+                # Os dados já estão no arquivo: o índice e o cadastro saem primeiro, assim uma interrupção deixa o paciente arquivado
+                payloads = [
+                    (self.index_file, dumps(index, 'json')),
+                    (self.patients_file, dumps({patient_id: patient for patient_id, patient in patients.items() if patient_id not in moved}, fmt))
+                ]
+                if any(patient_id in diaries for patient_id in moved):
+                    payloads.append((self.diary_file, dumps({patient_id: diary for patient_id, diary in diaries.items() if patient_id not in moved}, fmt)))
+                archived_plans = {plan_id for patient_id in moved for plan_id in plans_by_patient.get(patient_id, {})}
+                if archived_plans:
+                    payloads.append((self.plans_file, dumps({plan_id: plan for plan_id, plan in plans.items() if plan_id not in archived_plans}, fmt)))
+                
+                self._swap(payloads, [self.store.path(patient_id) for patient_id in moved])
+        
+        for patient_id in moved:
+            plan_count, diary_days, series_bytes, archive_bytes = built[patient_id]['resumo']
+            summary['pacientes'] += 1
+            summary['planos'] += plan_count
+            summary['dias_diario'] += diary_days
+            summary['medidas_bytes'] += series_bytes
+            summary['bytes_arquivo'] += archive_bytes
+        summary['alterados_durante'] = len(built) - len(moved)
+        return summary
+    
+    def rehydrate(self, patient_id):
+        """Devolve um paciente arquivado aos arquivos quentes; False se não estiver arquivado
+        
+        O pacote é lido e descomprimido antes de travar os arquivos quentes.
+        """
+        if patient_id not in self.index():
+            return False
+        
+        with self._lock:
+            if patient_id not in self.index():
+                return False
+            bundle = self.load_bundle(patient_id)
+            
+            with updating(*self._hot_paths([patient_id])):
+                index = dict(self.index())
+                patients = _read_data(self.patients_file)
+                fmt = data_format()
+                payloads = []
+                
+                if patient_id not in patients:
+                    if bundle['diario']:
+                        diaries = _read_data(self.diary_file)
+                        diaries[patient_id] = merge_diary(bundle['diario'], diaries.get(patient_id, {}))
+                        payloads.append((self.diary_file, dumps(diaries, fmt)))
+                    if bundle['planos']:
+                        plans = _read_data(self.plans_file)
+                        for plan_id, plan in bundle['planos'].items():
+                            plans.setdefault(plan_id, plan)
+                        payloads.append((self.plans_file, dumps(plans, fmt)))
+                    if bundle['medidas']:
+                        payloads.append((self.store.path(patient_id), merge_series(bundle['medidas'], self._series(patient_id))))
+                    
+                    # O cadastro volta por último: presente nos arquivos quentes = reidratação completa
+                    patients[patient_id] = {**bundle['paciente'], 'desarquivado_em': datetime.now().isoformat()}
+                    payloads.append((self.patients_file, dumps(patients, fmt)))
+                
+                del index[patient_id]
+                payloads.append((self.index_file, dumps(index, 'json')))
+                self._swap(payloads, [self.bundle_path(patient_id)])
+        return True
+
+def _plans_by_patient(plans):
+    by_patient = {}
+    for plan_id, plan in plans.items():
+        by_patient.setdefault(plan.get('patient_id'), {})[plan_id] = plan
+    return by_patient
+
+def next_id(prefix, *used):
+    """Próximo id sequencial (PAC_0001, PLAN_0001, ...) depois do maior já usado"""
+    numbers = [0]
+    for ids in used:
+        for used_id in ids:
+            number = str(used_id)[len(prefix) + 1:]
+            if str(used_id).startswith(f"{prefix}_") and number.isdigit():
+                numbers.append(int(number))
+    return f"{prefix}_{max(numbers) + 1:04d}"
+
+def archive_job(params, progress):
+    """Tarefa em segundo plano: arquiva os pacientes inativos há mais dias que o configurado"""
+    settings = load_archive_settings()
+    days = params.get('dias_inativo', settings['dias_inativo'])
+    archive = get_archive()
+    candidates = archive.candidates(days)
+    progress(0.0, f"{len(candidates)} pacientes a arquivar", force=True)
+    summary = archive.archive(candidates, progress)
+    summary['arquivados_total'] = len(archive)
+    return summary
+
+def schedule_archiving(today=None):
+    """Enfileira o arquivamento do dia (uma tarefa por dia, se ativado); retorna o id da tarefa"""
+    global _LAST_SCHEDULED
+    today = (today or date.today()).isoformat()
+    if _LAST_SCHEDULED == today:
+        return None
+    settings = load_archive_settings()
+    _LAST_SCHEDULED = today
+    if not settings['ativo']:
+        return None
+    return get_job_queue().submit('arquivar_inativos', {'dia': today}, priority='baixa', unique=True)
+
+_LAST_SCHEDULED = None
+_DEFAULT_ARCHIVE = None
+_ARCHIVE_LOCK = threading.Lock()
+
+def get_archive():
+    """Arquivo padrão (data/archive), compartilhado pelo processo"""
+    global _DEFAULT_ARCHIVE
+    with _ARCHIVE_LOCK:
+        if _DEFAULT_ARCHIVE is None:
+            _DEFAULT_ARCHIVE = PatientArchive()
+        return _DEFAULT_ARCHIVE
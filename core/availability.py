@@ -0,0 +1,157 @@
+# core/availability.py
+"""Horários de atendimento e busca de horários livres entre vários nutricionistas
+
+Cada nutricionista tem um modelo semanal de atendimento (data/working_hours.json,
+{usuário: {dia da semana: [["08:00", "12:00"], ...]}}; sem modelo, vale
+WORKING_HOURS). Para cada profissional, um gerador percorre os dias em
+ordem, cruza o modelo com as janelas preferidas do paciente, desconta as
+consultas marcadas (trechos livres da árvore de intervalos) e corta os
+horários de consulta. Os geradores de todos os profissionais são
+intercalados por um heap (heapq.merge), de modo que os k primeiros
+horários saem sem gerar a agenda inteira de ninguém.
+"""
+import heapq
+import json
+import os
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+from core.appointments import APPOINTMENT_DURATION
+from core.storage import write_json
+
+WORKING_HOURS_FILE = 'data/working_hours.json'
+
+WEEKDAYS = ("Segunda", "Terça", "Quarta", "Quinta", "Sexta", "Sábado", "Domingo")
+
+# Modelo padrão: segunda a sexta 08-12 e 13-18, sábado 08-12
+WORKING_HOURS = {
+    **{weekday: [("08:00", "12:00"), ("13:00", "18:00")] for weekday in range(5)},
+    5: [("08:00", "12:00")]
+}
+
+# Janelas preferidas do paciente: rótulo, início, fim
+PREFERRED_PERIODS = {
+    'manha': ("Manhã", "07:00", "12:00"),
+    'tarde': ("Tarde", "12:00", "18:00"),
+    'noite': ("Noite", "18:00", "22:00")
+}
+
+# Horários de início alinhados a múltiplos deste intervalo (minutos)
+SLOT_STEP = 15
+
+# Dias percorridos no máximo por busca
+SEARCH_HORIZON_DAYS = 120
+
+def _time(value):
+    return value if isinstance(value, time) else time.fromisoformat(value)
+
+def parse_windows(text):
+    """Converte "08:00-12:00, 13:00-18:00" em [("08:00", "12:00"), ...]"""
+    windows = []
+    for part in text.replace(';', ',').split(','):
+        if not part.strip():
+            continue
+        try:
+            start, end = (_time(value.strip()) for value in part.split('-'))
+        except ValueError:
+            raise ValueError(f"Janela inválida: {part.strip()} (use o formato 08:00-12:00)") from None
+        if not start < end:
+            raise ValueError(f"Janela inválida: {part.strip()}")
+        windows.append((start.strftime('%H:%M'), end.strftime('%H:%M')))
+    return sorted(windows)
+
+def format_windows(windows):
+    """Converte [("08:00", "12:00"), ...] em "08:00-12:00, ..." """
+    return ", ".join(f"{start}-{end}" for start, end in windows)
+
+def load_working_hours(path=WORKING_HOURS_FILE):
+    """Modelos semanais por nutricionista: {usuário: {dia (0=segunda): [(início, fim)]}}"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        stored = json.load(f)
+    return {
+        username: {int(weekday): [tuple(window) for window in windows] for weekday, windows in template.items()}
+        for username, template in stored.items()
+    }
+
+def save_working_hours(username, template, path=WORKING_HOURS_FILE):
+    """Salva o modelo semanal de um nutricionista"""
+    stored = load_working_hours(path)
+    stored[username] = {weekday: list(windows) for weekday, windows in template.items() if windows}
+    write_json(path, stored, indent=2)
+
+def _intersect(windows, preferred):
+    """Interseção de duas listas ordenadas de janelas (time, time)"""
+    result, i, j = [], 0, 0
+    while i < len(windows) and j < len(preferred):
+        start, end = max(windows[i][0], preferred[j][0]), min(windows[i][1], preferred[j][1])
+        if start < end:
+            result.append((start, end))
+        if windows[i][1] < preferred[j][1]:
+            i += 1
+        else:
+            j += 1
+    return result
+
+def day_windows(template, day, periods=None, weekdays=None):
+    """Janelas de atendimento de um dia (datetime), restritas às preferências do paciente"""
+    if weekdays is not None and day.weekday() not in weekdays:
+        return []
+    windows = sorted((_time(start), _time(end)) for start, end in template.get(day.weekday(), ()))
+    if periods:
+        preferred = sorted((_time(PREFERRED_PERIODS[period][1]), _time(PREFERRED_PERIODS[period][2])) for period in periods)
+        windows = _intersect(windows, preferred)
+    return [(datetime.combine(day, start), datetime.combine(day, end)) for start, end in windows]
+
+def _align(moment, step):
+    """Arredonda para cima até o próximo múltiplo de step minutos"""
+    midnight = datetime.combine(moment.date(), time())
+    minutes = -(-(moment - midnight) // timedelta(minutes=step))
+    return midnight + timedelta(minutes=minutes * step)
+
+def professional_slots(book, nutritionist, template, start, duration=APPOINTMENT_DURATION,
+                       periods=None, weekdays=None, horizon_days=SEARCH_HORIZON_DAYS, step=SLOT_STEP):
+    """Gera (início, nutricionista) dos horários livres de um profissional, em ordem
+    
+    Dentro de cada intervalo livre os inícios avançam de step em step
+    minutos (não pela duração da consulta), então os horários oferecidos
+    podem se sobrepor; quem agenda escolhe um deles.
+    """
+    length = timedelta(minutes=duration)
+    increment = timedelta(minutes=step)
+    
+    for offset in range(horizon_days):
+        day = start.date() + timedelta(days=offset)
+        for window_start, window_end in day_windows(template, day, periods, weekdays):
+            window_start = max(window_start, start)
+            if window_end - window_start < length:
+                continue
+            for gap_start, gap_end in book.free_intervals(nutritionist, window_start, window_end):
+                slot = _align(gap_start, step)
+                while slot + length <= gap_end:
+                    yield slot, nutritionist
+                    slot += increment
+
+def find_slots(book, nutritionists, start=None, k=10, duration=APPOINTMENT_DURATION, patient_id=None,
+               periods=None, weekdays=None, horizon_days=SEARCH_HORIZON_DAYS, working_hours=None):
+    """Os k primeiros horários livres entre vários nutricionistas
+    
+    Retorna [(início, fim, nutricionista)] em ordem de início (empates por
+    nutricionista). Horários em que o paciente já tem consulta são pulados.
+    """
+    start = _align(max(start or datetime.now(), datetime.now()), SLOT_STEP)
+    working_hours = load_working_hours() if working_hours is None else working_hours
+    length = timedelta(minutes=duration)
+    
+    sweeps = [
+        professional_slots(book, nutritionist, working_hours.get(nutritionist, WORKING_HOURS), start,
+                           duration, periods, weekdays, horizon_days)
+        for nutritionist in nutritionists
+    ]
+    candidates = heapq.merge(*sweeps)
+    if patient_id is not None:
+        candidates = (slot for slot in candidates if not book.conflicts(None, slot[0], slot[0] + length, patient_id))
+    
+    return [(slot, slot + length, nutritionist) for slot, nutritionist in islice(candidates, k)]
+
@@ -0,0 +1,683 @@
+# core/backup.py
+"""Backups incrementais com deduplicação por conteúdo
+
+Os arquivos dos conjuntos de dados escolhidos são cortados em blocos
+definidos pelo conteúdo: nos arquivos de texto os cortes caem em fins de
+linha cujo CRC32 tem os bits de MASK zerados (respeitando CHUNK_MIN e
+CHUNK_MAX). Como os arquivos JSON são gravados com uma chave por linha,
+inserir ou alterar um registro muda só os blocos vizinhos; os demais
+continuam com o mesmo conteúdo. Arquivos binários (com bytes NUL: séries
+em data/timeseries/, dados no formato NTB1, pacotes do arquivo) quase não
+têm quebras de linha e são cortados por um hash deslizante sobre os
+últimos ROLLING_WINDOW bytes, então um trecho inserido ou removido também
+só desloca os blocos seguintes, sem mudar o seu conteúdo.
+
+Cada bloco é guardado uma única vez em backups/chunks/<2 primeiros>/<sha256>,
+comprimido (lzma ou zlib) com um byte de prefixo indicando o formato. Um
+backup é só um manifesto em backups/manifests/<nome>.json com a lista de
+blocos de cada arquivo, então um backup diário de dados quase inalterados
+grava apenas os bytes que mudaram. Arquivos com o mesmo tamanho e data de
+modificação do backup anterior nem são relidos. Os blocos são lidos de um
+snapshot (core/storage.py) tirado no início, então o backup corresponde a um
+único instante mesmo com as escritas continuando durante a cópia.
+
+A restauração lê os blocos um a um (memória limitada ao tamanho de um
+bloco), confere o sha256 de cada bloco e de cada arquivo e monta os
+arquivos numa pasta temporária dentro de data/. Só depois de tudo
+verificado os arquivos dos conjuntos escolhidos são trocados por os.replace;
+se uma troca falhar, as já feitas são desfeitas. Uma simulação (dry_run)
+informa o que seria criado, substituído ou removido sem alterar nada.
+"""
+import hashlib
+import json
+import lzma
+import os
+import shutil
+import zlib
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+
+from core.formulas import _numpy
+from core.jobs import get_job_queue
+from core.storage import BARRIER, snapshot
+
+BACKUP_DIR = 'backups'
+
+# Conjunto de dados -> arquivos e pastas (relativos à raiz do app)
+DATASETS = {
+    "Usuários": ['data/users.json'],
+    "Pacientes": ['data/patients.json', 'data/timeseries', 'data/food_diary.json', 'data/patient_progress.json', 'data/archive'],
+    "Planos Alimentares": ['data/meal_plans.json', 'data/recipes.json'],
+    "Consultas": ['data/appointments.json', 'data/working_hours.json'],
+    "Configurações": ['data/system_config.json'],
+    "Logs": ['data/system_logs.json']
+}
+
+# Limites dos blocos (bytes) e máscara do CRC32 que define um corte (~1 em 512 linhas)
+CHUNK_MIN = 4 * 1024
+CHUNK_MAX = 64 * 1024
+MASK = 0x1FF
+
+# Arquivos binários: janela do hash deslizante (bytes) e máscara de corte (~1 a cada 16 KB)
+ROLLING_WINDOW = 48
+BYTE_MASK = 0x3FFF
+ROLLING_SEGMENT = 1024 * 1024
+
+# Snapshots dos backups em andamento (hardlinks, no mesmo disco dos dados)
+SNAPSHOT_DIR = 'data/.snapshots'
+
+# Pasta temporária da restauração (dentro de data/, no mesmo disco dos arquivos trocados)
+STAGING_DIR = 'data/.restauracao'
+
+RESTORE_ACTIONS = {
+    'criar': "Criar",
+    'substituir': "Substituir",
+    'remover': "Remover",
+    'igual': "Sem alteração"
+}
+
+# Dicionário do LZMA do tamanho do maior bloco: a descompressão usa pouca memória
+LZMA_FILTERS = [{'id': lzma.FILTER_LZMA2, 'preset': 6, 'dict_size': CHUNK_MAX}]
+
+# Retenção: sempre mantém o backup mais recente; blocos sem referência mais novos que isto ficam
+KEEP_LATEST = 1
+CHUNK_GRACE_SECONDS = 3600
+
+# Formatos de compressão: rótulo e prefixo gravado em cada bloco
+COMPRESSIONS = {
+    'lzma': ("LZMA (menor)", b'L'),
+    'zlib': ("zlib (mais rápido)", b'Z'),
+    'nenhuma': ("Sem compressão", b'N')
+}
+
+def dataset_files(datasets, root='.'):
+    """Arquivos existentes dos conjuntos escolhidos, em ordem e sem repetição"""
+    files = {}
+    for dataset in datasets:
+        for entry in DATASETS[dataset]:
+            path = os.path.join(root, entry)
+            if os.path.isdir(path):
+                for folder, _, names in sorted(os.walk(path)):
+                    for name in sorted(names):
+                        files.setdefault(os.path.relpath(os.path.join(folder, name), root).replace(os.sep, '/'), None)
+            elif os.path.isfile(path):
+                files.setdefault(entry, None)
+    return list(files)
+
+def in_datasets(relative, datasets):
+    """Indica se um arquivo (relativo à raiz) pertence a algum dos conjuntos"""
+    return any(relative == entry or relative.startswith(entry + '/') for dataset in datasets for entry in DATASETS[dataset])
+
+def file_sha256(path, block_size=CHUNK_MAX):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class BackupCorrupted(ValueError):
+    """Bloco ausente ou com conteúdo diferente do registrado no manifesto"""
+
+def iter_chunks(f, minimum=CHUNK_MIN, maximum=CHUNK_MAX, mask=MASK, limit=None):
+    """Corta um arquivo binário aberto em blocos definidos pelo conteúdo (lendo no máximo limit bytes)"""
+    buffer, size, remaining = [], 0, float('inf') if limit is None else limit
+    for line in iter(lambda: f.readline(min(maximum - size, remaining)) if remaining else b'', b''):
+        buffer.append(line)
+        size += len(line)
+        remaining -= len(line)
+        if size >= maximum or (size >= minimum and line.endswith(b'\n') and not zlib.crc32(line) & mask):
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+def is_binary(head):
+    """Indica se o início de um arquivo é binário (contém bytes NUL)"""
+    return b'\0' in head
+
+_ROLLING_TABLE = None
+
+def _rolling_table():
+    """Valor pseudoaleatório (fixo entre execuções) de cada byte para o hash deslizante"""
+    global _ROLLING_TABLE
+    if _ROLLING_TABLE is None:
+        np = _numpy()
+        table = b''.join(hashlib.sha256(bytes([value])).digest()[:4] for value in range(256))
+        _ROLLING_TABLE = np.frombuffer(table, dtype='<u4').astype(np.uint64)
+    return _ROLLING_TABLE
+
+def iter_binary_chunks(f, minimum=CHUNK_MIN, maximum=CHUNK_MAX, mask=BYTE_MASK, limit=None, window=ROLLING_WINDOW):
+    """Corta um arquivo binário em blocos pelo hash deslizante dos bytes (lendo no máximo limit bytes)
+    
+    O hash de cada posição é a soma dos valores da tabela dos últimos
+    `window` bytes (diferença de somas acumuladas, calculada por segmento
+    com NumPy); há corte depois de uma posição cujo hash tem os bits de
+    mask zerados, respeitando minimum e maximum.
+    """
+    np = _numpy()
+    table = _rolling_table()
+    pending, remaining = b'', float('inf') if limit is None else limit
+    while True:
+        segment = f.read(min(ROLLING_SEGMENT, remaining)) if remaining else b''
+        remaining -= len(segment)
+        data = pending + segment
+        if not segment:
+            break
+        
+        sums = np.concatenate((np.zeros(1, dtype=np.uint64), np.cumsum(table[np.frombuffer(data, dtype=np.uint8)])))
+        hashes = sums[window:] - sums[:-window]  # hashes[i]: bytes [i, i + window)
+        cuts = np.flatnonzero((hashes & mask) == 0) + window  # cortes depois do fim de cada janela
+        
+        start = 0
+        while True:
+            first = np.searchsorted(cuts, start + minimum)
+            if first < len(cuts) and cuts[first] <= start + maximum:
+                cut = int(cuts[first])
+            elif len(data) - start >= maximum:
+                cut = start + maximum
+            else:
+                break
+            yield data[start:cut]
+            start = cut
+        pending = data[start:]
+    if data:
+        yield data
+
+def compress_chunk(data, compression):
+    if compression == 'lzma':
+        return b'L' + lzma.compress(data, filters=LZMA_FILTERS)
+    if compression == 'zlib':
+        return b'Z' + zlib.compress(data, 6)
+    return b'N' + data
+
+def decompress_chunk(stored):
+    codec, payload = stored[:1], stored[1:]
+    if codec == b'L':
+        return lzma.decompress(payload)
+    if codec == b'Z':
+        return zlib.decompress(payload)
+    if codec == b'N':
+        return payload
+    raise ValueError(f"Formato de bloco desconhecido: {codec!r}")
+
+# Serializa a gravação de manifestos e a limpeza de blocos no processo
+_CHUNKS_LOCK = threading.Lock()
+
+class BackupRepository:
+    """Blocos deduplicados e manifestos de backup em backups/"""
+    
+    def __init__(self, path=BACKUP_DIR):
+        self.path = path
+        self.chunks_dir = os.path.join(path, 'chunks')
+        self.manifests_dir = os.path.join(path, 'manifests')
+    
+    # Blocos
+    
+    def chunk_path(self, digest):
+        return os.path.join(self.chunks_dir, digest[:2], digest)
+    
+    def has_chunk(self, digest):
+        return os.path.exists(self.chunk_path(digest))
+    
+    def touch_chunk(self, digest):
+        """Renova a data de um bloco existente (False se ele não existir)"""
+        try:
+            os.utime(self.chunk_path(digest))
+        except FileNotFoundError:
+            return False
+        return True
+    
+    def put_chunk(self, data, compression='lzma'):
+        """Guarda um bloco (se ainda não existir); retorna (sha256, bytes gravados)"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.chunk_path(digest)
+        if os.path.exists(path):
+            # Renova a data do bloco: a limpeza não apaga blocos recentes de um backup em andamento
+            os.utime(path)
+            return digest, 0
+        
+        stored = compress_chunk(data, compression)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(stored)
+        os.replace(path + '.tmp', path)
+        return digest, len(stored)
+    
+    def get_chunk(self, digest):
+        """Conteúdo original de um bloco"""
+        with open(self.chunk_path(digest), 'rb') as f:
+            return decompress_chunk(f.read())
+    
+    # Manifestos
+    
+    def manifest_path(self, name):
+        return os.path.join(self.manifests_dir, f"{name}.json")
+    
+    def manifests(self):
+        """Resumo dos backups, do mais recente para o mais antigo"""
+        if not os.path.isdir(self.manifests_dir):
+            return []
+        summaries = []
+        for filename in os.listdir(self.manifests_dir):
+            if filename.endswith('.json'):
+                manifest = self.load_manifest(filename[:-5])
+                summaries.append({key: value for key, value in manifest.items() if key != 'arquivos'})
+        return sorted(summaries, key=lambda manifest: manifest['criado_em'], reverse=True)
+    
+    def load_manifest(self, name):
+        with open(self.manifest_path(name), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def _save_manifest(self, manifest):
+        os.makedirs(self.manifests_dir, exist_ok=True)
+        path = self.manifest_path(manifest['nome'])
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        os.replace(path + '.tmp', path)
+    
+    def _known_files(self):
+        """Entradas de arquivo do backup mais recente (para pular arquivos inalterados)"""
+        latest = self.manifests()[:1]
+        return self.load_manifest(latest[0]['nome'])['arquivos'] if latest else {}
+    
+    # Backup
+    
+    def last_backup(self):
+        """Data (ISO) do backup mais recente (None se não houver)"""
+        latest = self.manifests()[:1]
+        return latest[0]['criado_em'] if latest else None
+    
+    def create_backup(self, name, datasets, compression='lzma', root='.', progress=None, automatic=False):
+        """Grava os blocos novos dos conjuntos escolhidos e o manifesto do backup"""
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Compressão desconhecida: {compression}")
+        if not name or os.sep in name or '/' in name:
+            raise ValueError(f"Nome de backup inválido: {name}")
+        if os.path.exists(self.manifest_path(name)):
+            raise ValueError(f"Já existe um backup chamado {name}")
+        
+        # Cópia consistente dos arquivos (hardlinks) com uma pausa curta nas escritas
+        staging = os.path.join(root, SNAPSHOT_DIR, name)
+        sizes, pause = snapshot(dataset_files(datasets, root), staging, root, accept=lambda relative: in_datasets(relative, datasets))
+        try:
+            entries, totals = self._store_files(staging, sizes, compression, progress)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        totals['pausa_ms'] = round(pause * 1000, 3)
+        
+        manifest = {
+            'nome': name,
+            'criado_em': datetime.now().isoformat(timespec='seconds'),
+            'conjuntos': list(datasets),
+            'compressao': compression,
+            'automatico': automatic,
+            'totais': totals,
+            'arquivos': entries
+        }
+        with _CHUNKS_LOCK:
+            self._save_manifest(manifest)
+        return {key: value for key, value in manifest.items() if key != 'arquivos'}
+    
+    def _store_files(self, staging, sizes, compression, progress=None):
+        """Guarda os blocos dos arquivos do snapshot; retorna (entradas do manifesto, totais)"""
+        known = self._known_files()
+        total = sum(sizes.values()) or 1
+        totals = {'bytes': 0, 'blocos': 0, 'blocos_novos': 0, 'bytes_gravados': 0, 'arquivos_reaproveitados': 0}
+        entries, done = {}, 0
+        
+        for relative in sorted(sizes):
+            path = os.path.join(staging, relative)
+            size, modified = sizes[relative], os.stat(path).st_mtime_ns
+            previous = known.get(relative)
+            
+            reuse = previous and previous['tamanho'] == size and previous['modificado'] == modified
+            if reuse:
+                # Sob a trava da limpeza e renovando a data: os blocos reaproveitados não podem ser apagados
+                # antes de o manifesto deste backup passar a referenciá-los
+                with _CHUNKS_LOCK:
+                    reuse = all([self.touch_chunk(digest) for digest, _ in previous['blocos']])
+            
+            if reuse:
+                entry = previous
+                totals['arquivos_reaproveitados'] += 1
+            else:
+                file_hash, chunks = hashlib.sha256(), []
+                with open(path, 'rb') as f:
+                    chunker = iter_binary_chunks if is_binary(f.read(CHUNK_MIN)) else iter_chunks
+                    f.seek(0)
+                    for data in chunker(f, limit=size):
+                        digest, written = self.put_chunk(data, compression)
+                        file_hash.update(data)
+                        chunks.append((digest, len(data)))
+                        totals['blocos_novos'] += bool(written)
+                        totals['bytes_gravados'] += written
+                        if progress:
+                            progress((done + sum(length for _, length in chunks)) / total, f"Copiando {relative}")
+                entry = {'tamanho': size, 'modificado': modified, 'sha256': file_hash.hexdigest(), 'blocos': chunks}
+            
+            entries[relative] = entry
+            totals['bytes'] += entry['tamanho']
+            totals['blocos'] += len(entry['blocos'])
+            done += size
+        
+        return entries, totals
+    
+    # Restauração
+    
+    def plan_restore(self, name, datasets, root='.'):
+        """O que a restauração mudaria: [{arquivo, acao, tamanho_atual, tamanho_backup}]"""
+        manifest = self.load_manifest(name)
+        missing = set(datasets) - set(manifest['conjuntos'])
+        if missing:
+            raise ValueError(f"O backup {name} não contém: {', '.join(sorted(missing))}")
+        
+        entries = {relative: entry for relative, entry in manifest['arquivos'].items() if in_datasets(relative, datasets)}
+        changes = []
+        for relative, entry in entries.items():
+            path = os.path.join(root, relative)
+            if not os.path.isfile(path):
+                action, current = 'criar', None
+            else:
+                current = os.path.getsize(path)
+                unchanged = current == entry['tamanho'] and file_sha256(path) == entry['sha256']
+                action = 'igual' if unchanged else 'substituir'
+            changes.append({'arquivo': relative, 'acao': action, 'tamanho_atual': current, 'tamanho_backup': entry['tamanho']})
+        
+        for relative in dataset_files(datasets, root):
+            if relative not in entries:
+                changes.append({'arquivo': relative, 'acao': 'remover', 'tamanho_atual': os.path.getsize(os.path.join(root, relative)), 'tamanho_backup': None})
+        
+        return changes
+    
+    def restore(self, name, datasets, root='.', dry_run=False, progress=None):
+        """Restaura os conjuntos escolhidos de um backup (ou só simula, com dry_run)"""
+        changes = self.plan_restore(name, datasets, root)
+        pending = [change for change in changes if change['acao'] != 'igual']
+        summary = {
+            'backup': name,
+            'conjuntos': list(datasets),
+            'simulacao': dry_run,
+            **{action: sum(change['acao'] == action for change in changes) for action in RESTORE_ACTIONS},
+            'alteracoes': changes
+        }
+        if dry_run or not pending:
+            return summary
+        
+        entries = self.load_manifest(name)['arquivos']
+        staging = os.path.join(root, STAGING_DIR, datetime.now().strftime('%Y%m%d_%H%M%S_%f'))
+        total = sum(entries[change['arquivo']]['tamanho'] for change in pending if change['acao'] != 'remover') or 1
+        done = 0
+        try:
+            for change in pending:
+                if change['acao'] != 'remover':
+                    entry = entries[change['arquivo']]
+                    if progress:
+                        progress(done / total, f"Verificando {change['arquivo']}")
+                    self._extract(entry, os.path.join(staging, 'novos', change['arquivo']))
+                    done += entry['tamanho']
+            
+            if progress:
+                progress(1.0, "Trocando arquivos", force=True)
+            self._swap(pending, staging, root)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        
+        return summary
+    
+    def _extract(self, entry, target):
+        """Remonta um arquivo a partir dos blocos, conferindo cada sha256"""
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        file_hash = hashlib.sha256()
+        with open(target, 'wb') as f:
+            for digest, size in entry['blocos']:
+                try:
+                    data = self.get_chunk(digest)
+                except (OSError, ValueError, lzma.LZMAError, zlib.error) as error:
+                    raise BackupCorrupted(f"Bloco {digest[:12]} ilegível: {error}") from None
+                if len(data) != size or hashlib.sha256(data).hexdigest() != digest:
+                    raise BackupCorrupted(f"Bloco {digest[:12]} corrompido")
+                file_hash.update(data)
+                f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if file_hash.hexdigest() != entry['sha256']:
+            raise BackupCorrupted(f"Arquivo remontado difere do original ({os.path.basename(target)})")
+    
+    def _swap(self, pending, staging, root):
+        """Troca os arquivos por os.replace; desfaz as trocas já feitas se alguma falhar
+        
+        Roda como uma única escrita na barreira: um snapshot vê todos os
+        arquivos antigos ou todos os restaurados.
+        """
+        moved, placed = [], []
+        with BARRIER.writing(*(os.path.join(root, change['arquivo']) for change in pending)):
+            try:
+                for change in pending:
+                    target = os.path.join(root, change['arquivo'])
+                    if os.path.exists(target):
+                        previous = os.path.join(staging, 'anteriores', change['arquivo'])
+                        os.makedirs(os.path.dirname(previous), exist_ok=True)
+                        os.replace(target, previous)
+                        moved.append((target, previous))
+                    if change['acao'] != 'remover':
+                        os.makedirs(os.path.dirname(target), exist_ok=True)
+                        os.replace(os.path.join(staging, 'novos', change['arquivo']), target)
+                        placed.append(target)
+            except OSError:
+                for target in placed:
+                    os.remove(target)
+                for target, previous in reversed(moved):
+                    os.replace(previous, target)
+                raise
+    
+    # Retenção
+    
+    def prune(self, retention_days, now=None, keep_latest=KEEP_LATEST):
+        """Apaga os backups mais antigos que retention_days e os blocos que ficaram sem referência
+        
+        Cada bloco é contado uma vez por manifesto que o usa; blocos
+        compartilhados com backups mantidos continuam com contagem positiva.
+        Blocos sem manifesto mais novos que CHUNK_GRACE_SECONDS também ficam
+        (podem ser de um backup ainda em andamento).
+        """
+        now = now or datetime.now()
+        limit = now - timedelta(days=retention_days)
+        
+        with _CHUNKS_LOCK:
+            manifests = self.manifests()
+            expired = [manifest['nome'] for manifest in manifests[keep_latest:] if datetime.fromisoformat(manifest['criado_em']) < limit]
+            
+            references = Counter()
+            for manifest in manifests:
+                references.update({digest for entry in self.load_manifest(manifest['nome'])['arquivos'].values() for digest, _ in entry['blocos']})
+            for name in expired:
+                references.subtract({digest for entry in self.load_manifest(name)['arquivos'].values() for digest, _ in entry['blocos']})
+                os.remove(self.manifest_path(name))
+            
+            removed, freed = 0, 0
+            grace = now.timestamp() - CHUNK_GRACE_SECONDS
+            for folder, _, names in os.walk(self.chunks_dir):
+                for filename in names:
+                    path = os.path.join(folder, filename)
+                    if references[filename.removesuffix('.tmp')] <= 0 and os.path.getmtime(path) < grace:
+                        freed += os.path.getsize(path)
+                        os.remove(path)
+                        removed += 1
+        
+        return {'backups_removidos': expired, 'blocos_removidos': removed, 'bytes_liberados': freed}
+    
+    def storage_size(self):
+        """Bytes ocupados pelos blocos guardados"""
+        size = 0
+        for folder, _, names in os.walk(self.chunks_dir):
+            size += sum(os.path.getsize(os.path.join(folder, name)) for name in names)
+        return size
+
+def backup_job(params, progress):
+    """Tarefa em segundo plano: backup dos conjuntos de dados escolhidos"""
+    return BackupRepository().create_backup(params['nome'], params['conjuntos'], params.get('compressao', 'lzma'), progress=progress)
+
+def restore_job(params, progress):
+    """Tarefa em segundo plano: restaura conjuntos de dados de um backup"""
+    summary = BackupRepository().restore(params['nome'], params['conjuntos'], progress=progress)
+    return {key: value for key, value in summary.items() if key != 'alteracoes'}
+
+# Backups automáticos
+
+CONFIG_FILE = 'data/system_config.json'
+USERS_FILE = 'data/users.json'
+
+BACKUP_FREQUENCIES = {
+    'hourly': "A cada hora",
+    'daily': "Diário",
+    'weekly': "Semanal",
+    'monthly': "Mensal"
+}
+
+# Backup semanal no domingo; mensal no dia 1
+BACKUP_WEEKDAY = 6
+
+BACKUP_DEFAULTS = {
+    'automatico': True,
+    'horario': "03:00",
+    'retencao_dias': 30,
+    'compressao': 'lzma',
+    'conjuntos': list(DATASETS),
+    'notificar_email': True
+}
+
+# Intervalo entre verificações do agendador (segundos)
+SCHEDULER_INTERVAL = 60
+
+def load_backup_settings(path=CONFIG_FILE):
+    """(frequência, configurações do backup automático) a partir das configurações do sistema"""
+    config = {}
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    return config.get('backup_frequency', 'daily'), {**BACKUP_DEFAULTS, **config.get('backup', {})}
+
+def latest_slot(frequency, at, now):
+    """Horário agendado mais recente até now ("03:00" todo dia, toda hora no minuto 00, ...)"""
+    hour, minute = (int(part) for part in at.split(':'))
+    if frequency == 'hourly':
+        slot = now.replace(minute=minute, second=0, microsecond=0)
+        return slot if slot <= now else slot - timedelta(hours=1)
+    
+    slot = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if frequency == 'weekly':
+        slot -= timedelta(days=(slot.weekday() - BACKUP_WEEKDAY) % 7)
+        return slot if slot <= now else slot - timedelta(days=7)
+    if frequency == 'monthly':
+        slot = slot.replace(day=1)
+        if slot > now:
+            slot = (slot - timedelta(days=1)).replace(day=1)
+        return slot
+    return slot if slot <= now else slot - timedelta(days=1)
+
+def next_slot(frequency, at, now):
+    """Próximo horário agendado depois de now"""
+    slot = latest_slot(frequency, at, now)
+    if frequency == 'monthly':
+        return (slot + timedelta(days=32)).replace(day=1)
+    return slot + {'hourly': timedelta(hours=1), 'weekly': timedelta(days=7)}.get(frequency, timedelta(days=1))
+
+def slot_name(slot):
+    return f"auto_{slot.strftime('%Y%m%d_%H%M')}"
+
+class BackupScheduler(threading.Thread):
+    """Enfileira o backup automático de cada horário agendado (uma vez; atrasados rodam ao iniciar)"""
+    
+    def __init__(self, repository, settings_loader=load_backup_settings, interval=SCHEDULER_INTERVAL):
+        super().__init__(name="backup-agendado", daemon=True)
+        self.repository = repository
+        self.settings_loader = settings_loader
+        self.interval = interval
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+    
+    def due(self, now=None):
+        """Nome do backup a criar agora (None se desativado ou já feito)"""
+        frequency, settings = self.settings_loader()
+        if not settings['automatico']:
+            return None
+        name = slot_name(latest_slot(frequency, settings['horario'], now or datetime.now()))
+        return None if os.path.exists(self.repository.manifest_path(name)) else name
+    
+    def next_run(self, now=None):
+        """Próximo backup automático (None se desativado)"""
+        frequency, settings = self.settings_loader()
+        if not settings['automatico']:
+            return None
+        now = now or datetime.now()
+        if self.due(now):
+            return now
+        return next_slot(frequency, settings['horario'], now)
+    
+    def check(self, now=None):
+        """Enfileira o backup devido (tarefa única por horário); retorna o id da tarefa"""
+        name = self.due(now)
+        if name is None:
+            return None
+        _, settings = self.settings_loader()
+        params = {'nome': name, **{key: settings[key] for key in ('conjuntos', 'compressao', 'retencao_dias', 'notificar_email')}}
+        return get_job_queue().submit('backup_automatico', params, priority='baixa', unique=True)
+    
+    def wake(self):
+        self._wake.set()
+    
+    def stop(self):
+        self._stopping.set()
+        self._wake.set()
+    
+    def run(self):
+        while not self._stopping.is_set():
+            try:
+                self.check()
+            except (OSError, ValueError) as error:
+                print(f"Agendador de backup: {error}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+def admin_emails(path=USERS_FILE):
+    """E-mails dos administradores"""
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        users = json.load(f)
+    return [user['profile']['email'] for user in users.values() if user.get('user_type') == 'admin' and user.get('profile', {}).get('email')]
+
+def scheduled_backup_job(params, progress):
+    """Tarefa em segundo plano: backup agendado seguido da limpeza pela retenção"""
+    repository = BackupRepository()
+    if os.path.exists(repository.manifest_path(params['nome'])):
+        summary = {key: value for key, value in repository.load_manifest(params['nome']).items() if key != 'arquivos'}
+    else:
+        summary = repository.create_backup(params['nome'], params['conjuntos'], params['compressao'], progress=progress, automatic=True)
+    summary['limpeza'] = repository.prune(params['retencao_dias'])
+    
+    if params.get('notificar_email'):
+        from core.notifications import get_notifier
+        
+        totals, cleanup = summary['totais'], summary['limpeza']
+        body = (
+            f"Backup {summary['nome']} concluído em {summary['criado_em'].replace('T', ' ')}.\n"
+            f"Dados: {totals['bytes']} bytes em {totals['blocos']} blocos ({totals['blocos_novos']} novos, {totals['bytes_gravados']} bytes gravados).\n"
+            f"Retenção: {len(cleanup['backups_removidos'])} backups antigos removidos, {cleanup['bytes_liberados']} bytes liberados."
+        )
+        for email in admin_emails():
+            get_notifier().send(email, f"Backup automático {summary['nome']}", body, kind='backup', key=f"backup:{summary['nome']}:{email}")
+    return summary
+
+_DEFAULT_SCHEDULER = None
+_SCHEDULER_LOCK = threading.Lock()
+
+def get_backup_scheduler():
+    """Agendador padrão (backups/); inicia a thread na primeira chamada do processo"""
+    global _DEFAULT_SCHEDULER
+    with _SCHEDULER_LOCK:
+        if _DEFAULT_SCHEDULER is None:
+            _DEFAULT_SCHEDULER = BackupScheduler(BackupRepository())
+            _DEFAULT_SCHEDULER.start()
+        return _DEFAULT_SCHEDULER
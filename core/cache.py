@@ -0,0 +1,176 @@
+# core/cache.py
+"""Cache LRU com contadores de acertos/falhas, memoização por entradas e
+impressões digitais (hash) de dados
+
+As chaves são normalizadas (números como float arredondado, dicionários
+ordenados, listas como tuplas), de modo que 70 e 70.0 ou {"a": 1, "b": 2}
+e {"b": 2, "a": 1} compartilham a mesma entrada. Os valores guardados são
+compartilhados entre chamadas e não devem ser modificados por quem os recebe.
+"""
+import functools
+import hashlib
+import inspect
+import math
+import threading
+from collections import OrderedDict
+from numbers import Integral, Real
+
+# Casas decimais usadas para normalizar números nas chaves
+KEY_DECIMALS = 6
+
+def normalize_key(value):
+    """Converte um valor em uma chave hashable e estável"""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return ("bool", value)  # evita colisão entre True e 1.0
+    if isinstance(value, (Integral, Real)):
+        value = float(value)
+        return "nan" if math.isnan(value) else round(value, KEY_DECIMALS)
+    if isinstance(value, dict):
+        return tuple(sorted((str(key), normalize_key(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize_key(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(normalize_key(item) for item in value))
+    if hasattr(value, "tolist"):
+        return normalize_key(value.tolist())
+    return value
+
+class LRUCache:
+    """Cache de tamanho limitado com descarte do item menos usado"""
+    
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key, default=None):
+        """Obtém um valor, contando acerto ou falha"""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+    
+    def put(self, key, value):
+        """Guarda um valor, descartando os menos usados se necessário"""
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+    
+    def pop(self, key, default=None):
+        """Remove e retorna um valor"""
+        with self._lock:
+            return self._data.pop(key, default)
+    
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+    
+    def __len__(self):
+        return len(self._data)
+    
+    def clear(self):
+        """Esvazia o cache e zera os contadores"""
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+    
+    def stats(self):
+        """Retorna tamanho, acertos, falhas, descartes e taxa de acerto"""
+        total = self.hits + self.misses
+        return {
+            "tamanho": len(self._data),
+            "capacidade": self.maxsize,
+            "acertos": self.hits,
+            "falhas": self.misses,
+            "descartes": self.evictions,
+            "taxa_acerto": round(self.hits / total, 3) if total else 0.0
+        }
+
+def _feed_fingerprint(digest, value):
+    if hasattr(value, "columns") and hasattr(value, "to_numpy"):
+        # DataFrame: nomes das colunas, índice e cada coluna
+        _feed_fingerprint(digest, [str(column) for column in value.columns])
+        _feed_fingerprint(digest, value.index)
+        for column in value.columns:
+            _feed_fingerprint(digest, value[column])
+    elif hasattr(value, "to_numpy"):
+        _feed_fingerprint(digest, value.to_numpy())
+    elif hasattr(value, "dtype") and hasattr(value, "tobytes") and getattr(value.dtype, "kind", "O") != "O":
+        digest.update(f"<{value.dtype.str}{value.shape}>".encode("utf-8"))
+        digest.update(value.tobytes())
+    elif isinstance(value, dict):
+        digest.update(b"{")
+        for key in sorted(value, key=str):
+            digest.update(repr(str(key)).encode("utf-8") + b":")
+            _feed_fingerprint(digest, value[key])
+        digest.update(b"}")
+    elif isinstance(value, (list, tuple)):
+        digest.update(b"[")
+        for item in value:
+            _feed_fingerprint(digest, item)
+            digest.update(b",")
+        digest.update(b"]")
+    else:
+        digest.update(repr(normalize_key(value)).encode("utf-8"))
+
+def fingerprint(*values):
+    """Hash SHA-1 do conteúdo dos valores (arrays e tabelas pelos bytes dos dados)"""
+    digest = hashlib.sha1()
+    for value in values:
+        _feed_fingerprint(digest, value)
+    return digest.hexdigest()
+
+# Caches criados por memoize (por nome qualificado da função) ou registrados
+_REGISTRY = {}
+
+def register_cache(name, cache):
+    """Inclui um cache nas estatísticas de cache_stats()"""
+    _REGISTRY[name] = cache
+    return cache
+
+_MISSING = object()
+
+def memoize(maxsize=128):
+    """Decorador que memoiza o resultado pelas entradas normalizadas
+    
+    Argumentos posicionais, nomeados e valores padrão geram a mesma chave.
+    Exceções não são guardadas. A função decorada expõe .cache,
+    .cache_info() e .cache_clear().
+    """
+    def decorator(func):
+        cache = LRUCache(maxsize)
+        signature = inspect.signature(func)
+        register_cache(f"{func.__module__}.{func.__qualname__}", cache)
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = normalize_key(bound.arguments)
+            result = cache.get(key, _MISSING)
+            if result is _MISSING:
+                result = func(*args, **kwargs)
+                cache.put(key, result)
+            return result
+        
+        wrapper.cache = cache
+        wrapper.cache_info = cache.stats
+        wrapper.cache_clear = cache.clear
+        return wrapper
+    
+    return decorator
+
+def cache_stats():
+    """Estatísticas de todos os caches memoizados"""
+    return {name: cache.stats() for name, cache in _REGISTRY.items()}
@@ -0,0 +1,89 @@
+# core/downsample.py
+"""Redução de pontos para gráficos de séries longas
+
+LTTB (Largest-Triangle-Three-Buckets, Steinarsson 2013) escolhe, em cada
+intervalo, o ponto que forma o maior triângulo com o ponto anterior e a
+média do intervalo seguinte, preservando a forma visual da curva com
+poucos pontos. O envelope mínimo/máximo por intervalo complementa a linha
+para que picos isolados não desapareçam do gráfico.
+
+Os eixos x podem ser datetime64 ou números; valores NaN são descartados.
+"""
+from core.formulas import _numpy, _as_float_array
+
+# Pontos por pixel de largura do gráfico e mínimo de pontos desenhados
+POINTS_PER_PIXEL = 1.0
+MIN_POINTS = 50
+
+def point_budget(width_px, points_per_pixel=POINTS_PER_PIXEL):
+    """Número de pontos a desenhar para uma largura de gráfico (pixels)"""
+    return max(MIN_POINTS, int(width_px * points_per_pixel))
+
+def _as_numeric_x(x):
+    np = _numpy()
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype('datetime64[s]').astype(float)
+    return x.astype(float)
+
+def lttb_indices(x, y, threshold):
+    """Índices dos pontos escolhidos pelo LTTB (sempre inclui o primeiro e o último)"""
+    np = _numpy()
+    x, y = _as_numeric_x(x), _as_float_array(y)
+    n = len(x)
+    
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    
+    # threshold - 2 intervalos entre o primeiro e o último ponto
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        cx, cy = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        
+        bx, by = x[start:end], y[start:end]
+        area = np.abs((x[a] - cx) * (by - y[a]) - (x[a] - bx) * (cy - y[a]))
+        a = start + int(area.argmax())
+        selected[i + 1] = a
+    
+    return selected
+
+def minmax_envelope(x, y, buckets):
+    """Mínimo e máximo de y por intervalo: {'x' (início do intervalo), 'min', 'max'}"""
+    np = _numpy()
+    x, y = np.asarray(x), _as_float_array(y)
+    n = len(y)
+    starts = np.unique(np.linspace(0, n, min(buckets, n), endpoint=False).astype(int))
+    
+    return {
+        'x': x[starts],
+        'min': np.minimum.reduceat(y, starts),
+        'max': np.maximum.reduceat(y, starts)
+    }
+
+def downsample_series(x, y, max_points):
+    """Reduz uma série a no máximo max_points pontos
+    
+    Retorna {'x', 'y', 'envelope', 'pontos_originais'}; envelope é None
+    quando a série já cabe no orçamento de pontos.
+    """
+    np = _numpy()
+    x, y = np.asarray(x), _as_float_array(y)
+    valid = np.isfinite(y)
+    x, y = x[valid], y[valid]
+    
+    if len(y) <= max_points:
+        return {'x': x, 'y': y, 'envelope': None, 'pontos_originais': len(y)}
+    
+    selected = lttb_indices(x, y, max_points)
+    return {
+        'x': x[selected],
+        'y': y[selected],
+        'envelope': minmax_envelope(x, y, max_points // 2),
+        'pontos_originais': len(y)
+    }
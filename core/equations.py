@@ -0,0 +1,220 @@
+# core/equations.py
+"""Registro de equações de gasto energético basal e de gordura corporal
+
+Cada equação declara as entradas que requer e é avaliada sobre arrays
+(NumPy importado sob demanda). O modo "comparar todas" avalia todas as
+equações para todos os pacientes de uma só vez; pacientes sem as entradas
+necessárias ou com valores fora das faixas válidas recebem NaN.
+
+Unidades: peso em kg, altura em cm, idade em anos, massa magra em kg,
+gordura corporal em %, dobras cutâneas em mm, circunferências em cm.
+"""
+from core.formulas import _numpy, _as_float_array, _male_mask, _batch_where, _bmr
+
+# Faixas válidas das entradas (mínimo, máximo)
+INPUT_RANGES = {
+    "peso": (2.0, 350.0),
+    "altura": (40.0, 250.0),
+    "idade": (0.0, 120.0),
+    "massa_magra": (1.0, 300.0),
+    "gordura_corporal": (2.0, 70.0),
+    "dobras_3": (3.0, 250.0),
+    "dobras_7": (7.0, 500.0),
+    "cintura": (40.0, 250.0),
+    "quadril": (50.0, 250.0),
+    "pescoco": (20.0, 70.0)
+}
+
+# Coeficientes por faixa etária: (idade_min, a_peso, b_altura_m, c)
+# FAO/WHO/UNU (1985) - apenas peso
+FAO_WHO_UNU_COEFFICIENTS = {
+    "Masculino": [(0, 60.9, 0, -54), (3, 22.7, 0, 495), (10, 17.5, 0, 651), (18, 15.3, 0, 679), (30, 11.6, 0, 879), (60, 13.5, 0, 487)],
+    "Feminino": [(0, 61.0, 0, -51), (3, 22.5, 0, 499), (10, 12.2, 0, 746), (18, 14.7, 0, 496), (30, 8.7, 0, 829), (60, 10.5, 0, 596)]
+}
+
+# Henry/Oxford (2005) - peso e altura (m)
+HENRY_OXFORD_COEFFICIENTS = {
+    "Masculino": [(0, 28.2, 859, -371), (3, 15.1, 74.2, 306), (10, 15.6, 266, 299), (18, 14.4, 313, 113), (30, 11.4, 541, -137), (60, 11.4, 541, -256)],
+    "Feminino": [(0, 30.4, 703, -287), (3, 15.9, 210, 349), (10, 9.40, 249, 462), (18, 10.4, 615, -282), (30, 8.18, 502, -11.6), (60, 8.52, 421, 10.7)]
+}
+
+def validate_inputs(inputs, required, strict=True, female_only=()):
+    """Valida presença e faixa das entradas de uma equação
+    
+    As entradas em female_only só são exigidas nas linhas do sexo feminino.
+    Com strict=True lança ValueError na primeira entrada inválida; caso
+    contrário retorna a máscara booleana das linhas válidas.
+    """
+    np = _numpy()
+    male = inputs["male"]
+    valid = None
+    
+    for name in (*required, *female_only):
+        if name == "sexo":
+            if strict and not inputs.get("sexo_informado", False):
+                raise ValueError("Entrada obrigatória ausente: sexo")
+            continue
+        
+        optional = male if name in female_only else np.zeros(len(male), dtype=bool)
+        values = inputs.get(name)
+        if values is None:
+            if strict and not optional.all():
+                raise ValueError(f"Entrada obrigatória ausente: {name}")
+            ok = optional.copy()
+        else:
+            values = _as_float_array(values)
+            low, high = INPUT_RANGES[name]
+            ok = optional | (np.isfinite(values) & (values >= low) & (values <= high))
+            
+            if strict and not ok.all():
+                raise ValueError(f"{name} fora da faixa válida ({low} - {high})")
+        
+        valid = ok if valid is None else valid & ok
+    
+    return valid
+
+def _by_age_band(coefficients, weight, height, age, male):
+    """Aplica equações com coeficientes por sexo e faixa etária"""
+    np = _numpy()
+    result = np.full(weight.shape, np.nan)
+    
+    for sex, rows in coefficients.items():
+        mask = male if sex == "Masculino" else ~male
+        if not mask.any():
+            continue
+        
+        table = np.asarray(rows, dtype=float)
+        band = np.clip(np.searchsorted(table[:, 0], age[mask], side="right") - 1, 0, len(table) - 1)
+        a, b, c = table[band, 1], table[band, 2], table[band, 3]
+        result[mask] = a * weight[mask] + b * (height[mask] / 100) + c
+    
+    return result
+
+def _harris_benedict(x):
+    return _bmr(x["peso"], x["altura"], x["idade"], x["male"], _batch_where)
+
+def _mifflin_st_jeor(x):
+    return 10 * x["peso"] + 6.25 * x["altura"] - 5 * x["idade"] + _batch_where(x["male"], 5, -161)
+
+def _katch_mcardle(x):
+    return 370 + 21.6 * x["massa_magra"]
+
+def _cunningham(x):
+    return 500 + 22 * x["massa_magra"]
+
+def _fao_who_unu(x):
+    return _by_age_band(FAO_WHO_UNU_COEFFICIENTS, x["peso"], x["altura"], x["idade"], x["male"])
+
+def _henry_oxford(x):
+    return _by_age_band(HENRY_OXFORD_COEFFICIENTS, x["peso"], x["altura"], x["idade"], x["male"])
+
+# Equações de taxa metabólica basal (kcal/dia)
+BMR_EQUATIONS = {
+    "harris_benedict": {"nome": "Harris-Benedict revisada", "requer": ("peso", "altura", "idade", "sexo"), "calcular": _harris_benedict},
+    "mifflin_st_jeor": {"nome": "Mifflin-St Jeor", "requer": ("peso", "altura", "idade", "sexo"), "calcular": _mifflin_st_jeor},
+    "katch_mcardle": {"nome": "Katch-McArdle", "requer": ("massa_magra",), "calcular": _katch_mcardle},
+    "cunningham": {"nome": "Cunningham", "requer": ("massa_magra",), "calcular": _cunningham},
+    "fao_who_unu": {"nome": "FAO/OMS/ONU (1985)", "requer": ("peso", "idade", "sexo"), "calcular": _fao_who_unu},
+    "henry_oxford": {"nome": "Henry/Oxford (2005)", "requer": ("peso", "altura", "idade", "sexo"), "calcular": _henry_oxford}
+}
+
+def _siri(density):
+    """Percentual de gordura a partir da densidade corporal (Siri)"""
+    return 495 / density - 450
+
+def _jackson_pollock_3(x):
+    s, age = x["dobras_3"], x["idade"]
+    density = _batch_where(
+        x["male"],
+        1.10938 - 0.0008267 * s + 0.0000016 * s ** 2 - 0.0002574 * age,
+        1.0994921 - 0.0009929 * s + 0.0000023 * s ** 2 - 0.0001392 * age
+    )
+    return _siri(density)
+
+def _jackson_pollock_7(x):
+    s, age = x["dobras_7"], x["idade"]
+    density = _batch_where(
+        x["male"],
+        1.112 - 0.00043499 * s + 0.00000055 * s ** 2 - 0.00028826 * age,
+        1.097 - 0.00046971 * s + 0.00000056 * s ** 2 - 0.00012828 * age
+    )
+    return _siri(density)
+
+def _us_navy(x):
+    # Coeficientes definidos para medidas em polegadas
+    np = _numpy()
+    waist, neck, height = x["cintura"] / 2.54, x["pescoco"] / 2.54, x["altura"] / 2.54
+    hip = x["quadril"] / 2.54 if "quadril" in x else np.nan
+    with np.errstate(invalid="ignore", divide="ignore"):
+        male = 86.010 * np.log10(waist - neck) - 70.041 * np.log10(height) + 36.76
+        female = 163.205 * np.log10(waist + hip - neck) - 97.684 * np.log10(height) - 78.387
+    return _batch_where(x["male"], male, female)
+
+# Equações de percentual de gordura corporal
+# Jackson-Pollock 3 dobras: homens peitoral, abdômen e coxa; mulheres tríceps, suprailíaca e coxa
+# Jackson-Pollock 7 dobras: peitoral, axilar média, tríceps, subescapular, abdômen, suprailíaca e coxa
+BODY_FAT_EQUATIONS = {
+    "jackson_pollock_3": {"nome": "Jackson-Pollock 3 dobras", "requer": ("dobras_3", "idade", "sexo"), "calcular": _jackson_pollock_3},
+    "jackson_pollock_7": {"nome": "Jackson-Pollock 7 dobras", "requer": ("dobras_7", "idade", "sexo"), "calcular": _jackson_pollock_7},
+    "marinha_americana": {"nome": "Marinha Americana (circunferências)", "requer": ("cintura", "pescoco", "altura", "sexo"), "requer_feminino": ("quadril",), "calcular": _us_navy}
+}
+
+def prepare_inputs(peso=None, altura=None, idade=None, sexo=None, **others):
+    """Converte as entradas em arrays e deriva a massa magra quando possível"""
+    np = _numpy()
+    inputs = {name: _as_float_array(value) for name, value in dict(peso=peso, altura=altura, idade=idade, **others).items() if value is not None}
+    n = max((values.size for values in inputs.values()), default=1)
+    inputs = {name: np.broadcast_to(values, (n,)).astype(float) for name, values in inputs.items()}
+    inputs["male"] = np.broadcast_to(_male_mask(sexo if sexo is not None else "Feminino"), (n,))
+    inputs["sexo_informado"] = sexo is not None
+    
+    # Massa magra a partir do percentual de gordura
+    if "massa_magra" not in inputs and "gordura_corporal" in inputs and "peso" in inputs:
+        inputs["massa_magra"] = inputs["peso"] * (1 - inputs["gordura_corporal"] / 100)
+    
+    return inputs
+
+def evaluate_equation(registry, key, inputs):
+    """Avalia uma equação sobre entradas já preparadas (NaN onde inválidas)"""
+    np = _numpy()
+    equation = registry[key]
+    valid = validate_inputs(inputs, equation["requer"], strict=False, female_only=equation.get("requer_feminino", ()))
+    n = len(inputs["male"])
+    
+    if valid is None:
+        valid = np.ones(n, dtype=bool)
+    if not valid.any():
+        return np.full(n, np.nan)
+    
+    with np.errstate(invalid="ignore", divide="ignore"):
+        result = np.asarray(equation["calcular"](inputs), dtype=float)
+    
+    return np.where(valid, result, np.nan)
+
+def compare_equations_batch(registry, **inputs):
+    """Avalia todas as equações do registro para todos os pacientes"""
+    prepared = prepare_inputs(**inputs)
+    return {key: evaluate_equation(registry, key, prepared) for key in registry}
+
+def compare_bmr_equations_batch(**inputs):
+    """TMB por todas as equações (dicionário chave -> array)"""
+    return compare_equations_batch(BMR_EQUATIONS, **inputs)
+
+def compare_body_fat_equations_batch(**inputs):
+    """Percentual de gordura por todas as equações (dicionário chave -> array)"""
+    return compare_equations_batch(BODY_FAT_EQUATIONS, **inputs)
+
+def calculate_with_equation(registry, key, **inputs):
+    """Avalia uma equação para um único indivíduo, validando as entradas"""
+    prepared = prepare_inputs(**inputs)
+    equation = registry[key]
+    validate_inputs(prepared, equation["requer"], strict=True, female_only=equation.get("requer_feminino", ()))
+    return round(float(evaluate_equation(registry, key, prepared)[0]), 1)
+
+def calculate_bmr_equation(key, **inputs):
+    """TMB (kcal/dia) por uma equação do registro"""
+    return calculate_with_equation(BMR_EQUATIONS, key, **inputs)
+
+def calculate_body_fat_equation(key, **inputs):
+    """Percentual de gordura corporal por uma equação do registro"""
+    return calculate_with_equation(BODY_FAT_EQUATIONS, key, **inputs)
@@ -0,0 +1,349 @@
+# core/formats.py
+"""Formatos dos arquivos de dados: JSON ou binário compacto (NTB1)
+
+O formato binário guarda os dados por coluna, como nos bancos analíticos.
+Um dicionário de registros ({id: {'nome': ..., 'peso': ...}}) vira uma
+coluna de ids e uma coluna por campo; cada coluna é gravada conforme o tipo
+dos valores: floats e inteiros como arrays de 8 bytes, textos repetidos
+(sexo, objetivo, status) como um vocabulário e um código de 1-2 bytes por
+valor, demais textos separados por NUL, listas e dicionários aninhados
+(diário, refeições do plano) recursivamente com o mesmo esquema. Colunas
+numéricas mistas (inteiros, floats e None, como quantidades em gramas) são
+gravadas como um array no tipo da maioria mais as posições dos demais,
+que voltam com o tipo original; as demais colunas com tipos misturados
+ficam em JSON compacto. Os nomes dos campos aparecem uma vez no
+cabeçalho, não uma vez por registro.
+
+A leitura monta cada coluna de uma vez (array.tolist, str.split, map) em
+vez de percorrer o texto caractere a caractere, então é mais rápida que o
+json.loads além de ocupar bem menos espaço. O resultado é o mesmo de um
+json.loads(json.dumps(dados)): tuplas viram listas e chaves não textuais
+viram texto.
+
+load_data reconhece o formato pelo conteúdo (assinatura NTB1), então os
+nomes dos arquivos não mudam e arquivos nos dois formatos convivem; ao
+trocar o formato em Administração → Configurações, cada arquivo é
+convertido na próxima gravação (ou de uma vez pelo conversor, com o app
+parado):
+    
+    python -m core.formats info
+    python -m core.formats converter binario [arquivos...]
+    python -m core.formats converter json [arquivos...]
+"""
+import argparse
+import json
+import os
+import struct
+import sys
+from array import array
+from itertools import chain, islice, repeat
+
+from core.storage import write_json, write_bytes, file_version
+
+FORMATS = {
+    'json': "JSON (texto legível)",
+    'binario': "Binário compacto (NTB1)"
+}
+
+# Arquivos dos gerenciadores gravados no formato configurado
+DATA_FILES = ['data/patients.json', 'data/meal_plans.json', 'data/food_diary.json', 'data/recipes.json']
+
+CONFIG_FILE = 'data/system_config.json'
+
+MAGIC = b'NTB1'
+
+# Dicionários com até tantos campos distintos (e formatos de registro) viram tabelas; acima disso, chave -> valor
+RECORD_KEYS = 64
+RECORD_SHAPES = 16
+
+def _key(key):
+    """Chave como o json.dumps gravaria (1 -> "1", True -> "true", None -> "null")"""
+    return key if type(key) is str else json.dumps(key)
+
+def _pack(typecode, values):
+    data = array(typecode, values)
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return data.tobytes()
+
+def _unpack(typecode, raw):
+    data = array(typecode)
+    data.frombytes(raw)
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return data.tolist()
+
+def _code_type(count):
+    return 'B' if count <= 0x100 else 'H' if count <= 0x10000 else 'I'
+
+class _Blobs:
+    """Corpo do arquivo: blocos de bytes referenciados pelo cabeçalho como [início, tamanho]"""
+    
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+    
+    def add(self, data):
+        position = [self.size, len(data)]
+        self.parts.append(data)
+        self.size += len(data)
+        return position
+
+def _encode_json(values, blobs):
+    return {'t': 'j', 'b': blobs.add(json.dumps(values, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8'))}
+
+def _encode_strings(values, blobs):
+    distinct = dict.fromkeys(values)
+    if len(distinct) <= len(values) // 4:
+        codes = {value: code for code, value in enumerate(distinct)}
+        typecode = _code_type(len(distinct))
+        return {'t': 'd', 'w': typecode, 'b': blobs.add(_pack(typecode, map(codes.__getitem__, values))), 'v': _encode_strings(list(distinct), blobs)}
+    
+    joined = '\x00'.join(values)
+    if joined.count('\x00') != len(values) - 1:  # textos com NUL
+        return _encode_json(values, blobs)
+    return {'t': 's', 'n': len(values), 'b': blobs.add(joined.encode('utf-8', 'surrogatepass'))}
+
+# Inteiros representados exatamente num float64
+FLOAT_EXACT_INT = 2 ** 53
+
+def _encode_numbers(values, blobs):
+    """Coluna com inteiros, floats e None: array no tipo da maioria, mais as posições dos demais"""
+    ints = [position for position, value in enumerate(values) if type(value) is int]
+    if any(abs(values[position]) > FLOAT_EXACT_INT for position in ints):
+        return _encode_json(values, blobs)
+    nulls = [position for position, value in enumerate(values) if value is None]
+    
+    if len(ints) * 2 > len(values):
+        # Maioria inteira (quantidades em gramas): int64 com 0 no lugar dos floats, guardados à parte
+        floats = [position for position, value in enumerate(values) if type(value) is float]
+        node = {'t': 'I', 'b': blobs.add(_pack('q', [value if type(value) is int else 0 for value in values]))}
+        if floats:
+            node['r'] = blobs.add(_pack('I', floats))
+            node['v'] = blobs.add(_pack('d', map(values.__getitem__, floats)))
+    else:
+        node = {'t': 'F', 'b': blobs.add(_pack('d', [0.0 if value is None else value for value in values] if nulls else values))}
+        if ints:
+            node['i'] = blobs.add(_pack('I', ints))
+    if nulls:
+        node['z'] = blobs.add(_pack('I', nulls))
+    return node
+
+def _positions(node, key, body):
+    return _unpack('I', body[node[key][0]:sum(node[key])]) if key in node else []
+
+def _encode_dicts(values, blobs):
+    shapes = dict.fromkeys(map(tuple, values))
+    names = set(chain.from_iterable(shapes))
+    if any(type(name) is not str for name in names):
+        values = [{_key(key): value for key, value in item.items()} for item in values]
+        return _encode_dicts(values, blobs)
+    
+    if len(shapes) > RECORD_SHAPES or len(names) > RECORD_KEYS:
+        # Chaves que são dados (ids, datas): uma coluna de chaves e uma de valores
+        return {
+            't': 'M',
+            'b': blobs.add(_pack('I', map(len, values))),
+            'k': _encode(list(chain.from_iterable(values)), blobs),
+            'v': _encode(list(chain.from_iterable(map(dict.values, values))), blobs)
+        }
+    
+    # Registros: uma coluna por campo, separados por formato (conjunto de campos)
+    shapes = list(shapes)
+    node = {'t': 'R', 'c': [list(shape) for shape in shapes], 'g': [], 'n': []}
+    if len(shapes) == 1:
+        groups = [values]
+    else:
+        index = {shape: position for position, shape in enumerate(shapes)}
+        kinds = [index[tuple(item)] for item in values]
+        node['b'] = blobs.add(_pack(_code_type(len(shapes)), kinds))
+        groups = [[] for _ in shapes]
+        for item, kind in zip(values, kinds):
+            groups[kind].append(item)
+    
+    for shape, group in zip(shapes, groups):
+        columns = zip(*map(dict.values, group)) if shape else []
+        node['g'].append([_encode(list(column), blobs) for column in columns])
+        node['n'].append(len(group))
+    return node
+
+def _encode(values, blobs):
+    """Descrição (cabeçalho) de uma coluna de valores, com os bytes acrescentados em blobs"""
+    kinds = set(map(type, values))
+    if len(kinds) != 1:
+        if len(kinds) > 1 and kinds <= {int, float, type(None)}:
+            return _encode_numbers(values, blobs)
+        if kinds and kinds <= {list, tuple}:
+            kinds = {list}
+        else:
+            return _encode_json(values, blobs) if values else {'t': 'n', 'n': 0}
+    
+    kind = kinds.pop()
+    if kind is dict:
+        return _encode_dicts(values, blobs)
+    if kind is list or kind is tuple:
+        return {'t': 'L', 'b': blobs.add(_pack('I', map(len, values))), 'v': _encode(list(chain.from_iterable(values)), blobs)}
+    if kind is str:
+        return _encode_strings(values, blobs)
+    if kind is bool:
+        return {'t': 'b', 'b': blobs.add(bytes(values))}
+    if kind is float:
+        return {'t': 'f', 'b': blobs.add(_pack('d', values))}
+    if kind is int:
+        try:
+            return {'t': 'i', 'b': blobs.add(_pack('q', values))}
+        except OverflowError:
+            return _encode_json(values, blobs)
+    if values[0] is None:
+        return {'t': 'n', 'n': len(values)}
+    return _encode_json(values, blobs)
+
+def _decode(node, body):
+    """Lista de valores de uma coluna"""
+    kind = node['t']
+    raw = body[node['b'][0]:sum(node['b'])] if 'b' in node else None
+    
+    if kind == 'n':
+        return [None] * node['n']
+    if kind == 'f':
+        return _unpack('d', raw)
+    if kind == 'i':
+        return _unpack('q', raw)
+    if kind == 'F':
+        values = _unpack('d', raw)
+        for position in _positions(node, 'i', body):
+            values[position] = int(values[position])
+        for position in _positions(node, 'z', body):
+            values[position] = None
+        return values
+    if kind == 'I':
+        values = _unpack('q', raw)
+        for position, value in zip(_positions(node, 'r', body), _unpack('d', body[node['v'][0]:sum(node['v'])]) if 'v' in node else []):
+            values[position] = value
+        for position in _positions(node, 'z', body):
+            values[position] = None
+        return values
+    if kind == 'b':
+        return list(map(bool, raw))
+    if kind == 's':
+        return str(raw, 'utf-8', 'surrogatepass').split('\x00') if node['n'] else []
+    if kind == 'd':
+        return list(map(_decode(node['v'], body).__getitem__, _unpack(node['w'], raw)))
+    if kind == 'j':
+        return json.loads(str(raw, 'utf-8'))
+    if kind == 'L':
+        items = iter(_decode(node['v'], body))
+        return [list(islice(items, count)) for count in _unpack('I', raw)]
+    if kind == 'M':
+        counts = _unpack('I', raw)
+        keys, values = _decode(node['k'], body), _decode(node['v'], body)
+        if len(counts) == 1:
+            return [dict(zip(keys, values))]
+        keys, values = iter(keys), iter(values)
+        return [dict(zip(islice(keys, count), islice(values, count))) for count in counts]
+    if kind == 'R':
+        groups = []
+        for shape, columns, count in zip(node['c'], node['g'], node['n']):
+            if shape:
+                groups.append(list(map(dict, map(zip, repeat(shape), zip(*[_decode(column, body) for column in columns])))))
+            else:
+                groups.append([{} for _ in range(count)])
+        if raw is None:
+            return groups[0]
+        groups = [iter(group) for group in groups]
+        return [next(groups[kind]) for kind in _unpack(_code_type(len(node['c'])), raw)]
+    raise ValueError(f"Coluna de tipo desconhecido no arquivo binário: {kind}")
+
+def encode_binary(data):
+    """Dados (o que o json.dumps aceita) -> bytes no formato NTB1"""
+    blobs = _Blobs()
+    header = json.dumps(_encode([data], blobs), separators=(',', ':')).encode('utf-8')
+    return MAGIC + struct.pack('<I', len(header)) + header + b''.join(blobs.parts)
+
+def decode_binary(raw):
+    """Bytes no formato NTB1 -> dados"""
+    if raw[:4] != MAGIC:
+        raise ValueError("Arquivo binário de dados inválido")
+    size, = struct.unpack('<I', raw[4:8])
+    header = json.loads(raw[8:8 + size])
+    return _decode(header, memoryview(raw)[8 + size:])[0]
+
+def dumps(data, fmt='json'):
+    """Dados -> bytes no formato indicado (JSON como nos arquivos atuais: indentado, UTF-8)"""
+    if fmt == 'binario':
+        return encode_binary(data)
+    if fmt == 'json':
+        return json.dumps(data, ensure_ascii=False, default=str, indent=2).encode('utf-8')
+    raise ValueError(f"Formato desconhecido: {fmt}")
+
+def detect(raw):
+    """Formato de um conteúdo ('json' ou 'binario')"""
+    return 'binario' if raw[:4] == MAGIC else 'json'
+
+def loads(raw):
+    """Bytes em qualquer dos formatos -> dados"""
+    return decode_binary(raw) if detect(raw) == 'binario' else json.loads(raw)
+
+def load_data(path):
+    """Lê um arquivo de dados em qualquer dos formatos"""
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+_CONFIGURED = None
+
+def data_format(config_path=CONFIG_FILE):
+    """Formato configurado para os arquivos dos gerenciadores (chave "formato_dados"; padrão JSON)"""
+    global _CONFIGURED
+    version = file_version(config_path)
+    if _CONFIGURED is None or _CONFIGURED[0] != (config_path, version):
+        fmt = 'json'
+        if version is not None:
+            with open(config_path, 'r', encoding='utf-8') as f:
+                fmt = json.load(f).get('formato_dados', 'json')
+        _CONFIGURED = ((config_path, version), fmt if fmt in FORMATS else 'json')
+    return _CONFIGURED[1]
+
+def save_data(path, data, fmt=None):
+    """Grava um arquivo de dados no formato indicado (padrão: o configurado)"""
+    fmt = fmt or data_format()
+    if fmt == 'json':
+        write_json(path, data, indent=2)
+    else:
+        write_bytes(path, dumps(data, fmt))
+
+def convert(path, fmt):
+    """Regrava um arquivo no formato indicado; retorna (formato anterior, bytes antes, bytes depois)"""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    previous = detect(raw)
+    if previous != fmt:
+        save_data(path, loads(raw), fmt)
+    return previous, len(raw), os.path.getsize(path)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m core.formats", description="Formato dos arquivos de dados (JSON ou binário NTB1)")
+    commands = parser.add_subparsers(dest='comando', required=True)
+    info = commands.add_parser('info', help="Formato e tamanho de cada arquivo")
+    info.add_argument('arquivos', nargs='*', default=DATA_FILES)
+    converter = commands.add_parser('converter', help="Converte os arquivos para o formato indicado")
+    converter.add_argument('formato', choices=list(FORMATS))
+    converter.add_argument('arquivos', nargs='*', default=DATA_FILES)
+    args = parser.parse_args(argv)
+    
+    for path in args.arquivos:
+        if not os.path.exists(path):
+            print(f"{path}: não encontrado")
+            continue
+        if args.comando == 'info':
+            with open(path, 'rb') as f:
+                print(f"{path}: {detect(f.read(4))}, {os.path.getsize(path)} bytes")
+        else:
+            previous, before, after = convert(path, args.formato)
+            print(f"{path}: {previous} -> {args.formato}, {before} -> {after} bytes")
+    
+    if args.comando == 'converter' and data_format() != args.formato:
+        print(f"Aviso: o formato configurado é '{data_format()}'; os arquivos voltam a ele na próxima gravação "
+              f"(altere em Administração → Configurações).")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# core/formulas.py
+"""Fórmulas das calculadoras nutricionais (escalares e em lote)
+
+As funções escalares usam apenas a biblioteca padrão. As versões *_batch
+aceitam arrays NumPy ou colunas pandas e importam NumPy somente quando
+chamadas, mantendo a importação deste módulo praticamente instantânea.
+"""
+
+# Fatores de atividade física para o gasto energético
+ACTIVITY_FACTORS = {
+    "Sedentário": 1.2,
+    "Levemente ativo": 1.375,
+    "Moderadamente ativo": 1.55,
+    "Muito ativo": 1.725,
+    "Extremamente ativo": 1.9
+}
+
+# Fatores de atividade física para a necessidade hídrica
+WATER_ACTIVITY_FACTORS = {
+    "Sedentário": 1.0,
+    "Levemente ativo": 1.1,
+    "Moderadamente ativo": 1.2,
+    "Muito ativo": 1.3,
+    "Extremamente ativo": 1.4
+}
+
+def _numpy():
+    """Importa NumPy sob demanda"""
+    try:
+        import numpy
+    except ImportError as e:
+        raise ImportError("As funções em lote requerem NumPy (pip install numpy)") from e
+    return numpy
+
+def _scalar_where(condition, if_true, if_false):
+    """Seleção condicional para valores escalares"""
+    return if_true if condition else if_false
+
+def _batch_where(condition, if_true, if_false):
+    """Seleção condicional elemento a elemento"""
+    return _numpy().where(condition, if_true, if_false)
+
+def _as_float_array(values):
+    """Converte valores (escalar, lista, Series) em array float"""
+    return _numpy().asarray(values, dtype=float)
+
+def _male_mask(sex):
+    """Máscara booleana para sexo masculino"""
+    return _numpy().asarray(sex, dtype=object) == "Masculino"
+
+# Fórmulas: operam igualmente sobre floats e arrays
+
+def _bmr(weight, height, age, male, where):
+    """Harris-Benedict revisada"""
+    return where(
+        male,
+        88.362 + (13.397 * weight) + (4.799 * height) - (5.677 * age),
+        447.593 + (9.247 * weight) + (3.098 * height) - (4.330 * age)
+    )
+
+def _ideal_weight(height, male, where):
+    """Robinson, Miller e Devine (altura em metros)"""
+    over = height * 100 - 152.4  # cm acima de 152,4 cm (5 pés)
+    return {
+        "Robinson": where(male, 52 + (1.9 * over / 2.54), 49 + (1.7 * over / 2.54)),
+        "Miller": where(male, 56.2 + (1.41 * over / 2.54), 53.1 + (1.36 * over / 2.54)),
+        "Devine": where(male, 50 + (2.3 * over / 2.54), 45.5 + (2.3 * over / 2.54))
+    }
+
+def _macros(calories, carb_percent, protein_percent, fat_percent):
+    """Gramas de cada macronutriente a partir dos percentuais"""
+    return {
+        "carboidratos": calories * (carb_percent / 100) / 4,  # 4 kcal/g
+        "proteinas": calories * (protein_percent / 100) / 4,  # 4 kcal/g
+        "gorduras": calories * (fat_percent / 100) / 9  # 9 kcal/g
+    }
+
+# Versões em lote
+
+def lookup_factors(levels, factors):
+    """Converte um array de categorias no array dos fatores correspondentes"""
+    np = _numpy()
+    levels = np.asarray(levels, dtype=object)
+    result = np.full(levels.shape, np.nan)
+    
+    for name, factor in factors.items():
+        result[levels == name] = factor
+    
+    if np.isnan(result).any():
+        unknown = levels[np.isnan(result)].ravel()[0]
+        raise KeyError(unknown)
+    
+    return result
+
+def calculate_bmr_batch(weight, height, age, sex):
+    """TMB (Harris-Benedict revisada) para arrays de pacientes"""
+    return _bmr(_as_float_array(weight), _as_float_array(height), _as_float_array(age), _male_mask(sex), _batch_where)
+
+def calculate_tdee_batch(bmr, activity_level):
+    """GET para arrays de TMB e níveis de atividade"""
+    return _as_float_array(bmr) * lookup_factors(activity_level, ACTIVITY_FACTORS)
+
+def calculate_bmi_batch(weight, height):
+    """IMC para arrays de peso (kg) e altura (m)"""
+    return _as_float_array(weight) / (_as_float_array(height) ** 2)
+
+def calculate_ideal_weight_batch(height, sex):
+    """Peso ideal (Robinson, Miller e Devine) para arrays de altura (m)"""
+    return _ideal_weight(_as_float_array(height), _male_mask(sex), _batch_where)
+
+def calculate_macros_batch(calories, carb_percent, protein_percent, fat_percent):
+    """Macronutrientes em gramas para arrays de calorias e percentuais"""
+    return _macros(_as_float_array(calories), _as_float_array(carb_percent), _as_float_array(protein_percent), _as_float_array(fat_percent))
+
+def calculate_water_needs_batch(weight, activity_level):
+    """Necessidade hídrica (ml) para arrays de peso e níveis de atividade"""
+    base_water = _as_float_array(weight) * 35  # 35ml por kg de peso
+    return base_water * lookup_factors(activity_level, WATER_ACTIVITY_FACTORS)
+
+# Versões escalares
+
+def calculate_bmr(weight, height, age, sex):
+    """Calcula Taxa Metabólica Basal usando equação de Harris-Benedict revisada"""
+    return round(_bmr(weight, height, age, sex == "Masculino", _scalar_where), 1)
+
+def calculate_tdee(bmr, activity_level):
+    """Calcula Gasto Energético Total Diário"""
+    return round(bmr * ACTIVITY_FACTORS[activity_level], 1)
+
+def calculate_bmi(weight, height):
+    """Calcula Índice de Massa Corporal"""
+    bmi = weight / (height ** 2)
+    return round(bmi, 1)
+
+def get_bmi_category(bmi):
+    """Retorna categoria do IMC"""
+    if bmi < 18.5:
+        return "Abaixo do peso", "blue"
+    elif bmi < 25:
+        return "Peso normal", "green"
+    elif bmi < 30:
+        return "Sobrepeso", "orange"
+    else:
+        return "Obesidade", "red"
+
+def calculate_ideal_weight(height, sex):
+    """Calcula peso ideal usando diferentes fórmulas"""
+    return {formula: round(value, 1) for formula, value in _ideal_weight(height, sex == "Masculino", _scalar_where).items()}
+
+def calculate_macros(calories, carb_percent, protein_percent, fat_percent):
+    """Calcula distribuição de macronutrientes"""
+    return {macro: round(value, 1) for macro, value in _macros(calories, carb_percent, protein_percent, fat_percent).items()}
+
+def calculate_water_needs(weight, activity_level):
+    """Calcula necessidade hídrica"""
+    base_water = weight * 35  # 35ml por kg de peso
+    return round(base_water * WATER_ACTIVITY_FACTORS[activity_level], 0)
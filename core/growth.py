@@ -0,0 +1,285 @@
+# core/growth.py
+"""Curvas de crescimento (método LMS da OMS) para pacientes pediátricos
+
+Calcula escores-z e percentis de IMC/idade, peso/idade e altura/idade com
+interpolação linear de L, M e S entre as idades tabeladas. As tabelas são
+carregadas uma única vez em arrays e avaliadas de forma vetorizada.
+
+A tabela embutida tem apenas nós anuais aproximados das referências OMS
+2006 (2-5 anos) e OMS 2007 (5-19 anos) e não cobre menores de 24 meses,
+cujas curvas mudam rápido demais para nós anuais (resultado NaN, "Sem
+referência"). Para uso clínico, coloque os arquivos oficiais da OMS em
+data/growth/ (ver load_lms_file), que substituem a tabela embutida.
+"""
+import glob
+import math
+import os
+
+from core.formulas import _numpy, _as_float_array, _male_mask
+
+GROWTH_DATA_DIR = 'data/growth'
+
+# Origem registrada em GrowthReference.sources quando não há arquivo oficial
+BUILTIN_SOURCE = "tabela embutida (aproximada)"
+
+# Idade máxima atendida pelas curvas (meses)
+PEDIATRIC_AGE_LIMIT_MONTHS = 228
+
+DAYS_PER_MONTH = 30.4375
+
+# Indicadores: nome de exibição e se aplica o ajuste OMS para |z| > 3
+GROWTH_INDICATORS = {
+    "imc_idade": {"nome": "IMC para idade", "ajuste_extremos": True},
+    "peso_idade": {"nome": "Peso para idade", "ajuste_extremos": True},
+    "altura_idade": {"nome": "Altura para idade", "ajuste_extremos": False}
+}
+
+# (idade em meses, L, M, S) - nós anuais aproximados a partir de 24 meses
+LMS_REFERENCE = {
+    "imc_idade": {
+        "Masculino": [
+            (24, -0.55, 16.0, 0.080),
+            (36, -0.65, 15.6, 0.080), (48, -0.70, 15.3, 0.081), (60, -0.75, 15.3, 0.083),
+            (72, -0.95, 15.3, 0.088), (84, -1.15, 15.5, 0.094), (96, -1.30, 15.7, 0.101),
+            (108, -1.45, 16.0, 0.109), (120, -1.55, 16.4, 0.117), (132, -1.60, 16.9, 0.123),
+            (144, -1.55, 17.5, 0.128), (156, -1.45, 18.2, 0.131), (168, -1.30, 19.0, 0.132),
+            (180, -1.15, 19.8, 0.132), (192, -1.00, 20.5, 0.131), (204, -0.90, 21.1, 0.130),
+            (216, -0.80, 21.7, 0.129), (228, -0.75, 22.2, 0.128)
+        ],
+        "Feminino": [
+            (24, -0.45, 15.7, 0.083),
+            (36, -0.60, 15.4, 0.085), (48, -0.75, 15.2, 0.087), (60, -0.85, 15.2, 0.090),
+            (72, -0.95, 15.3, 0.096), (84, -1.05, 15.4, 0.103), (96, -1.15, 15.7, 0.111),
+            (108, -1.20, 16.1, 0.120), (120, -1.25, 16.6, 0.128), (132, -1.25, 17.2, 0.134),
+            (144, -1.20, 18.0, 0.139), (156, -1.10, 18.8, 0.142), (168, -1.00, 19.6, 0.143),
+            (180, -0.90, 20.2, 0.143), (192, -0.80, 20.7, 0.143), (204, -0.75, 21.0, 0.142),
+            (216, -0.70, 21.3, 0.141), (228, -0.70, 21.4, 0.140)
+        ]
+    },
+    "peso_idade": {
+        "Masculino": [
+            (24, -0.05, 12.2, 0.115),
+            (36, -0.10, 14.3, 0.119), (48, -0.15, 16.3, 0.123), (60, -0.20, 18.3, 0.128),
+            (72, -0.25, 20.5, 0.135), (84, -0.30, 22.9, 0.143), (96, -0.35, 25.4, 0.152),
+            (108, -0.40, 28.1, 0.161), (120, -0.45, 31.2, 0.170)
+        ],
+        "Feminino": [
+            (24, -0.15, 11.5, 0.123),
+            (36, -0.25, 13.9, 0.128), (48, -0.30, 16.1, 0.134), (60, -0.35, 18.2, 0.140),
+            (72, -0.40, 20.2, 0.147), (84, -0.45, 22.4, 0.155), (96, -0.50, 25.0, 0.163),
+            (108, -0.55, 28.2, 0.171), (120, -0.60, 31.9, 0.178)
+        ]
+    },
+    "altura_idade": {
+        "Masculino": [
+            (24, 1, 87.1, 0.035),
+            (36, 1, 96.1, 0.038), (48, 1, 103.3, 0.040), (60, 1, 110.0, 0.041),
+            (72, 1, 116.0, 0.042), (84, 1, 121.7, 0.043), (96, 1, 127.3, 0.043),
+            (108, 1, 132.6, 0.044), (120, 1, 137.8, 0.045), (132, 1, 143.1, 0.046),
+            (144, 1, 149.1, 0.048), (156, 1, 156.0, 0.048), (168, 1, 163.2, 0.046),
+            (180, 1, 169.0, 0.043), (192, 1, 172.9, 0.041), (204, 1, 175.2, 0.040),
+            (216, 1, 176.1, 0.040), (228, 1, 176.5, 0.040)
+        ],
+        "Feminino": [
+            (24, 1, 85.7, 0.037),
+            (36, 1, 95.1, 0.039), (48, 1, 102.7, 0.041), (60, 1, 109.4, 0.042),
+            (72, 1, 115.1, 0.043), (84, 1, 120.8, 0.044), (96, 1, 126.6, 0.045),
+            (108, 1, 132.5, 0.046), (120, 1, 138.6, 0.047), (132, 1, 145.0, 0.047),
+            (144, 1, 151.2, 0.045), (156, 1, 156.4, 0.042), (168, 1, 159.8, 0.040),
+            (180, 1, 161.7, 0.039), (192, 1, 162.5, 0.039), (204, 1, 162.9, 0.039),
+            (216, 1, 163.1, 0.039), (228, 1, 163.2, 0.039)
+        ]
+    }
+}
+
+# Classificação do IMC para idade (OMS): (z mínimo, categoria, cor)
+BMI_FOR_AGE_CLASSES_UNDER_5 = [
+    (3, "Obesidade", "red"),
+    (2, "Sobrepeso", "orange"),
+    (1, "Risco de sobrepeso", "orange"),
+    (-2, "Eutrofia", "green"),
+    (-3, "Magreza", "blue"),
+    (-math.inf, "Magreza acentuada", "blue")
+]
+BMI_FOR_AGE_CLASSES_5_TO_19 = [
+    (2, "Obesidade", "red"),
+    (1, "Sobrepeso", "orange"),
+    (-2, "Eutrofia", "green"),
+    (-3, "Magreza", "blue"),
+    (-math.inf, "Magreza acentuada", "blue")
+]
+
+def load_lms_files(paths):
+    """Carrega e concatena vários arquivos LMS, ordenados pela idade
+    
+    Permite combinar OMS 2006 (0-5 anos, em dias) e OMS 2007 (5-19 anos,
+    em meses); idades repetidas na junção ficam com o primeiro arquivo.
+    """
+    np = _numpy()
+    rows = np.concatenate([load_lms_file(path) for path in paths])
+    rows = rows[np.argsort(rows[:, 0], kind="stable")]
+    _, first = np.unique(rows[:, 0], return_index=True)
+    return rows[first]
+
+def find_lms_files(data_dir, indicator, sex):
+    """Arquivos <indicador>_<sexo>*.txt/.csv do diretório, em ordem de nome"""
+    pattern = os.path.join(data_dir, f"{indicator}_{sex.lower()}")
+    return sorted(glob.glob(f"{pattern}*.txt") + glob.glob(f"{pattern}*.csv"))
+
+def load_lms_file(path):
+    """Carrega um arquivo LMS da OMS (colunas Month ou Day, L, M, S)
+    
+    Aceita os arquivos .txt (separados por tabulação) e .csv publicados
+    pela OMS; idades em dias são convertidas para meses.
+    """
+    np = _numpy()
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        lines = [line.strip() for line in f if line.strip()]
+    
+    separator = ',' if ',' in lines[0] else None
+    header = [column.strip().lower() for column in lines[0].split(separator)]
+    age_column = 'month' if 'month' in header else 'day'
+    columns = [header.index(name) for name in (age_column, 'l', 'm', 's')]
+    
+    rows = np.array([[float(line.split(separator)[i]) for i in columns] for line in lines[1:]])
+    if age_column == 'day':
+        rows[:, 0] /= DAYS_PER_MONTH
+    
+    return rows
+
+class GrowthReference:
+    """Tabelas LMS em arrays, por indicador e sexo"""
+    
+    def __init__(self, tables=None, data_dir=GROWTH_DATA_DIR):
+        np = _numpy()
+        self.tables = {}
+        self.sources = {}
+        
+        for indicator, by_sex in (tables or LMS_REFERENCE).items():
+            for sex, rows in by_sex.items():
+                paths = find_lms_files(data_dir, indicator, sex) if data_dir else []
+                if paths:
+                    self.tables[(indicator, sex)] = load_lms_files(paths)
+                    self.sources[(indicator, sex)] = ", ".join(paths)
+                else:
+                    self.tables[(indicator, sex)] = np.asarray(rows, dtype=float)
+                    self.sources[(indicator, sex)] = BUILTIN_SOURCE
+    
+    def approximate_indicators(self):
+        """Nomes dos indicadores avaliados (em algum sexo) pela tabela embutida aproximada"""
+        approximate = {indicator for (indicator, _), source in self.sources.items() if source == BUILTIN_SOURCE}
+        return [info["nome"] for indicator, info in GROWTH_INDICATORS.items() if indicator in approximate]
+    
+    def source_summary(self):
+        """Origem das tabelas: {fonte: ["IMC para idade (Masculino)", ...]}"""
+        summary = {}
+        for (indicator, sex), source in self.sources.items():
+            name = GROWTH_INDICATORS.get(indicator, {}).get("nome", indicator)
+            summary.setdefault(source, []).append(f"{name} ({sex})")
+        return summary
+    
+    def age_range(self, indicator, sex):
+        """Faixa de idade (meses) coberta pela tabela"""
+        table = self.tables[(indicator, sex)]
+        return table[0, 0], table[-1, 0]
+    
+    def lms(self, indicator, age_months, sex):
+        """Interpola L, M e S para arrays de idade (meses) e sexo"""
+        np = _numpy()
+        age_months = _as_float_array(age_months)
+        male = _male_mask(sex)
+        L, M, S = (np.full(age_months.shape, np.nan) for _ in range(3))
+        
+        for sex_name, mask in (("Masculino", male), ("Feminino", ~male)):
+            table = self.tables[(indicator, sex_name)]
+            inside = mask & (age_months >= table[0, 0]) & (age_months <= table[-1, 0])
+            if not inside.any():
+                continue
+            
+            ages = age_months[inside]
+            L[inside] = np.interp(ages, table[:, 0], table[:, 1])
+            M[inside] = np.interp(ages, table[:, 0], table[:, 2])
+            S[inside] = np.interp(ages, table[:, 0], table[:, 3])
+        
+        return L, M, S
+    
+    def zscore(self, indicator, values, age_months, sex):
+        """Escore-z LMS (NaN fora da faixa de idade da tabela)"""
+        np = _numpy()
+        values = _as_float_array(values)
+        L, M, S = self.lms(indicator, age_months, sex)
+        
+        with np.errstate(invalid="ignore", divide="ignore"):
+            small_l = np.abs(L) < 1e-6
+            safe_l = np.where(small_l, 1.0, L)
+            z = np.where(small_l, np.log(values / M) / S, ((values / M) ** safe_l - 1) / (safe_l * S))
+            
+            if GROWTH_INDICATORS[indicator]["ajuste_extremos"]:
+                # Ajuste da OMS para valores além de ±3 DP (distribuição assimétrica)
+                sd = lambda k: M * (1 + safe_l * S * k) ** (1 / safe_l)
+                sd3, sd2 = sd(3), sd(2)
+                sd3_neg, sd2_neg = sd(-3), sd(-2)
+                z = np.where(z > 3, 3 + (values - sd3) / (sd3 - sd2), z)
+                z = np.where(z < -3, -3 + (values - sd3_neg) / (sd2_neg - sd3_neg), z)
+        
+        return z
+
+def zscore_to_percentile(z):
+    """Converte escores-z em percentis (distribuição normal)"""
+    np = _numpy()
+    z = _as_float_array(z)
+    erf = np.vectorize(math.erf, otypes=[float])
+    percentile = np.full(z.shape, np.nan)
+    finite = np.isfinite(z)
+    percentile[finite] = 50 * (1 + erf(z[finite] / math.sqrt(2)))
+    return percentile
+
+_DEFAULT_REFERENCE = None
+
+def get_reference():
+    """Referência padrão, carregada uma única vez por processo"""
+    global _DEFAULT_REFERENCE
+    if _DEFAULT_REFERENCE is None:
+        _DEFAULT_REFERENCE = GrowthReference()
+    return _DEFAULT_REFERENCE
+
+def age_in_months(birth_date, reference_date):
+    """Idade em meses (fracionária) entre duas datas"""
+    return (reference_date - birth_date).days / DAYS_PER_MONTH
+
+def evaluate_growth_batch(age_months, sex, weight, height, reference=None):
+    """Escores-z e percentis dos três indicadores para vários pacientes
+    
+    weight em kg e height em cm; retorna {indicador: {'z', 'percentil'}}.
+    """
+    np = _numpy()
+    reference = reference or get_reference()
+    weight = _as_float_array(weight)
+    height = _as_float_array(height)
+    
+    with np.errstate(invalid="ignore", divide="ignore"):
+        bmi = weight / (height / 100) ** 2
+    
+    values = {"imc_idade": bmi, "peso_idade": weight, "altura_idade": height}
+    results = {}
+    
+    for indicator, indicator_values in values.items():
+        z = reference.zscore(indicator, indicator_values, age_months, sex)
+        results[indicator] = {"z": z, "percentil": zscore_to_percentile(z)}
+    
+    return results
+
+def classify_bmi_for_age(z, age_months):
+    """Classificação do IMC para idade pelo escore-z (OMS)"""
+    if z is None or math.isnan(z):
+        return "Sem referência", "gray"
+    
+    classes = BMI_FOR_AGE_CLASSES_UNDER_5 if age_months < 60 else BMI_FOR_AGE_CLASSES_5_TO_19
+    for threshold, category, color in classes:
+        # Cortes positivos são exclusivos (z > +1) e os negativos inclusivos (z >= -2 é eutrofia)
+        if z > threshold or (threshold < 0 and z >= threshold):
+            return category, color
+
+def is_pediatric(age_months):
+    """Verifica se a idade está coberta pelas curvas de crescimento"""
+    return age_months is not None and age_months < PEDIATRIC_AGE_LIMIT_MONTHS
@@ -0,0 +1,173 @@
+# core/intervals.py
+"""Árvore de intervalos (AVL aumentada com o maior fim de cada subárvore)
+
+Cada nó guarda um intervalo semiaberto [início, fim) identificado por uma
+chave. A ordem é pelo início (e pela chave, em caso de empate), e cada nó
+conhece o maior fim da sua subárvore, o que permite descartar ramos
+inteiros nas buscas por sobreposição:
+
+- inserção e remoção em O(log n);
+- "existe sobreposição com [a, b)?" em O(log n) quando os intervalos da
+  árvore não se sobrepõem entre si (uma agenda sem conflitos);
+- listagem dos k intervalos que tocam uma janela em O(log n + k), já em
+  ordem de início.
+"""
+
+class _Node:
+    __slots__ = ('start', 'end', 'key', 'value', 'left', 'right', 'height', 'max_end')
+    
+    def __init__(self, start, end, key, value):
+        self.start, self.end, self.key, self.value = start, end, key, value
+        self.left = self.right = None
+        self.height = 1
+        self.max_end = end
+
+def _height(node):
+    return node.height if node else 0
+
+def _update(node):
+    node.height = 1 + max(_height(node.left), _height(node.right))
+    node.max_end = node.end
+    if node.left and node.left.max_end > node.max_end:
+        node.max_end = node.left.max_end
+    if node.right and node.right.max_end > node.max_end:
+        node.max_end = node.right.max_end
+
+def _rotate_right(node):
+    pivot = node.left
+    node.left, pivot.right = pivot.right, node
+    _update(node)
+    _update(pivot)
+    return pivot
+
+def _rotate_left(node):
+    pivot = node.right
+    node.right, pivot.left = pivot.left, node
+    _update(node)
+    _update(pivot)
+    return pivot
+
+def _balance(node):
+    _update(node)
+    factor = _height(node.left) - _height(node.right)
+    if factor > 1:
+        if _height(node.left.left) < _height(node.left.right):
+            node.left = _rotate_left(node.left)
+        return _rotate_right(node)
+    if factor < -1:
+        if _height(node.right.right) < _height(node.right.left):
+            node.right = _rotate_right(node.right)
+        return _rotate_left(node)
+    return node
+
+class IntervalTree:
+    """Conjunto de intervalos [início, fim) com chave única"""
+    
+    def __init__(self, intervals=()):
+        self._root = None
+        self._starts = {}
+        for start, end, key, *value in intervals:
+            self.insert(start, end, key, value[0] if value else None)
+    
+    def __len__(self):
+        return len(self._starts)
+    
+    def __contains__(self, key):
+        return key in self._starts
+    
+    def __iter__(self):
+        """Todos os intervalos (início, fim, chave, valor) em ordem de início"""
+        stack, node = [], self._root
+        while stack or node:
+            while node:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield node.start, node.end, node.key, node.value
+            node = node.right
+    
+    def insert(self, start, end, key, value=None):
+        """Insere um intervalo (substitui o anterior com a mesma chave)"""
+        if not start < end:
+            raise ValueError("O fim do intervalo deve ser posterior ao início")
+        if key in self._starts:
+            self.remove(key)
+        self._root = self._insert(self._root, _Node(start, end, key, value))
+        self._starts[key] = start
+    
+    def _insert(self, node, new):
+        if node is None:
+            return new
+        if (new.start, new.key) < (node.start, node.key):
+            node.left = self._insert(node.left, new)
+        else:
+            node.right = self._insert(node.right, new)
+        return _balance(node)
+    
+    def remove(self, key):
+        """Remove o intervalo de uma chave; retorna False se não existir"""
+        if key not in self._starts:
+            return False
+        self._root = self._remove(self._root, self._starts.pop(key), key)
+        return True
+    
+    def _remove(self, node, start, key):
+        if node is None:
+            return None
+        if (start, key) < (node.start, node.key):
+            node.left = self._remove(node.left, start, key)
+        elif (start, key) > (node.start, node.key):
+            node.right = self._remove(node.right, start, key)
+        else:
+            if node.left is None or node.right is None:
+                return node.left or node.right
+            # Substitui pelo sucessor (menor início da subárvore direita)
+            successor = node.right
+            while successor.left:
+                successor = successor.left
+            node.start, node.end, node.key, node.value = successor.start, successor.end, successor.key, successor.value
+            node.right = self._remove(node.right, successor.start, successor.key)
+        return _balance(node)
+    
+    def overlapping(self, start, end):
+        """Intervalos que tocam [start, end), em ordem de início"""
+        found, stack, node = [], [], self._root
+        while stack or node:
+            # Desce à esquerda enquanto a subárvore ainda pode tocar a janela
+            while node and node.max_end > start:
+                stack.append(node)
+                node = node.left
+            if not stack:
+                break
+            node = stack.pop()
+            if node.start >= end:
+                break  # os próximos começam depois da janela
+            if node.end > start:
+                found.append((node.start, node.end, node.key, node.value))
+            node = node.right
+        return found
+    
+    def first_overlap(self, start, end):
+        """Primeiro intervalo (menor início) que toca [start, end), ou None"""
+        node = self._root
+        while node:
+            if node.left and node.left.max_end > start:
+                node = node.left
+            elif node.start < end and node.end > start:
+                return node.start, node.end, node.key, node.value
+            elif node.start >= end:
+                return None
+            else:
+                node = node.right
+        return None
+    
+    def gaps(self, start, end):
+        """Trechos livres de [start, end) como lista de (início, fim)"""
+        free, cursor = [], start
+        for busy_start, busy_end, _, _ in self.overlapping(start, end):
+            if busy_start > cursor:
+                free.append((cursor, busy_start))
+            cursor = max(cursor, busy_end)
+        if cursor < end:
+            free.append((cursor, end))
+        return free
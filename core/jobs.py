@@ -0,0 +1,375 @@
+# core/jobs.py
+"""Fila persistente de tarefas em segundo plano (SQLite)
+
+Trabalhos pesados (backups, relatórios, recálculos) não rodam dentro da
+execução de uma página: a página grava a tarefa em data/jobs.db e consulta
+o andamento pelo id, uma leitura de uma linha pela chave primária.
+
+Uma thread de agendamento por processo retira as tarefas pendentes por
+prioridade (maior primeiro) e ordem de chegada, e as entrega a um pool de
+threads (tarefas de E/S) ou de processos (tarefas de CPU, fora do GIL).
+A retirada é atômica (UPDATE ... RETURNING em transação), então vários
+processos podem compartilhar a mesma fila sem executar a mesma tarefa duas
+vezes.
+
+As funções das tarefas recebem (params, progress) e devolvem um resultado
+serializável em JSON. progress(fração, mensagem) grava o andamento (no
+máximo a cada PROGRESS_INTERVAL segundos) e interrompe a tarefa com
+JobCancelled se ela tiver sido cancelada. Falhas são repetidas com espera
+exponencial até max_attempts; tarefas de um processo que parou são
+devolvidas à fila quando o próximo processo inicia.
+"""
+import importlib
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+JOBS_DB = 'data/jobs.db'
+
+# Tarefas conhecidas: função (módulo:função), executor ('thread' ou 'process'), rótulo
+JOB_TYPES = {
+    'recalcular_agregados': {'alvo': 'core.aggregates:rebuild_job', 'executor': 'thread', 'rotulo': "Recalcular agregados do dashboard"},
+    'backup': {'alvo': 'core.backup:backup_job', 'executor': 'thread', 'rotulo': "Backup dos dados"},
+    'restaurar': {'alvo': 'core.backup:restore_job', 'executor': 'thread', 'rotulo': "Restauração de backup"},
+    'backup_automatico': {'alvo': 'core.backup:scheduled_backup_job', 'executor': 'thread', 'rotulo': "Backup automático"},
+    'arquivar_inativos': {'alvo': 'core.archive:archive_job', 'executor': 'thread', 'rotulo': "Arquivamento de pacientes inativos"},
+    'relatorio_tmb': {'alvo': 'modules.Tasks:equation_report_job', 'executor': 'process', 'rotulo': "Relatório de TMB por equação"},
+    'relatorio_crescimento': {'alvo': 'modules.Tasks:growth_report_job', 'executor': 'process', 'rotulo': "Relatório de curvas de crescimento"}
+}
+
+PRIORITIES = {'alta': 10, 'normal': 0, 'baixa': -10}
+
+JOB_STATUSES = {
+    'pendente': "Na fila",
+    'executando': "Em execução",
+    'concluida': "Concluída",
+    'falhou': "Falhou",
+    'cancelada': "Cancelada"
+}
+
+FINISHED_STATUSES = ('concluida', 'falhou', 'cancelada')
+
+# Trabalhadores por executor
+THREAD_WORKERS = 4
+PROCESS_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF = 5  # segundos, dobrando a cada tentativa
+
+# Intervalo de consulta da fila (segundos) e mínimo entre gravações de progresso
+POLL_INTERVAL = 1.0
+PROGRESS_INTERVAL = 0.25
+
+# Tarefas concluídas mantidas por este número de dias
+JOB_HISTORY_DAYS = 30
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tipo TEXT NOT NULL,
+    parametros TEXT NOT NULL DEFAULT '{}',
+    prioridade INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pendente',
+    progresso REAL NOT NULL DEFAULT 0,
+    mensagem TEXT,
+    resultado TEXT,
+    erro TEXT,
+    tentativas INTEGER NOT NULL DEFAULT 0,
+    max_tentativas INTEGER NOT NULL DEFAULT 3,
+    executar_apos REAL NOT NULL DEFAULT 0,
+    trabalhador TEXT,
+    criada_em TEXT NOT NULL,
+    iniciada_em TEXT,
+    concluida_em TEXT,
+    cancelar INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_fila ON jobs (status, prioridade DESC, id);
+"""
+
+class JobCancelled(Exception):
+    """A tarefa foi cancelada durante a execução"""
+
+def _connect(path):
+    connection = sqlite3.connect(path, timeout=10, isolation_level=None)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA busy_timeout=10000")
+    return connection
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+def _row_to_job(row):
+    if row is None:
+        return None
+    job = dict(row)
+    job['parametros'] = json.loads(job['parametros'] or '{}')
+    job['resultado'] = json.loads(job['resultado']) if job['resultado'] else None
+    job['rotulo'] = JOB_TYPES.get(job['tipo'], {}).get('rotulo', job['tipo'])
+    return job
+
+def _import_target(target):
+    module_name, function_name = target.split(':')
+    return getattr(importlib.import_module(module_name), function_name)
+
+class JobProgress:
+    """Callback de progresso de uma tarefa (serializável, usado também nos processos)"""
+    
+    def __init__(self, db_path, job_id):
+        self.db_path = db_path
+        self.job_id = job_id
+        self._last = 0.0
+        self._connection = None
+    
+    def __call__(self, fraction, message=None, force=False):
+        now = time.monotonic()
+        if not force and now - self._last < PROGRESS_INTERVAL:
+            return
+        self._last = now
+        if self._connection is None:
+            self._connection = _connect(self.db_path)
+        self._connection.execute(
+            "UPDATE jobs SET progresso = ?, mensagem = COALESCE(?, mensagem) WHERE id = ?",
+            (max(0.0, min(1.0, float(fraction))), message, self.job_id)
+        )
+        if self._connection.execute("SELECT cancelar FROM jobs WHERE id = ?", (self.job_id,)).fetchone()[0]:
+            raise JobCancelled("Tarefa cancelada")
+    
+    def __getstate__(self):
+        return {'db_path': self.db_path, 'job_id': self.job_id, '_last': 0.0, '_connection': None}
+
+def run_job(db_path, job_id, target, params):
+    """Executa a função de uma tarefa (na thread ou no processo trabalhador)"""
+    return _import_target(target)(params, JobProgress(db_path, job_id))
+
+class JobQueue:
+    """Fila de tarefas em SQLite com trabalhadores em threads e processos"""
+    
+    def __init__(self, path=JOBS_DB, job_types=None, thread_workers=THREAD_WORKERS, process_workers=PROCESS_WORKERS):
+        self.path = path
+        self.job_types = job_types or JOB_TYPES
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.limits = {'thread': thread_workers, 'process': process_workers}
+        self._running = {'thread': 0, 'process': 0}
+        self._executors = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._scheduler = None
+        self._local = threading.local()
+        
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with _connect(path) as connection:
+            connection.executescript(_SCHEMA)
+    
+    def _db(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = _connect(self.path)
+        return connection
+    
+    # Uso pelas páginas
+    
+    def submit(self, kind, params=None, priority='normal', max_attempts=MAX_ATTEMPTS, unique=False):
+        """Enfileira uma tarefa e retorna seu id
+        
+        Com unique=True, uma tarefa idêntica (mesmo tipo e parâmetros) que não
+        tenha sido cancelada nem falhado é reaproveitada em vez de duplicada.
+        """
+        if kind not in self.job_types:
+            raise ValueError(f"Tipo de tarefa desconhecido: {kind}")
+        priority = PRIORITIES.get(priority, priority)
+        params = json.dumps(params or {}, ensure_ascii=False, default=str, sort_keys=True)
+        
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            existing = unique and db.execute(
+                "SELECT id FROM jobs WHERE tipo = ? AND parametros = ? AND status NOT IN ('cancelada', 'falhou')",
+                (kind, params)
+            ).fetchone()
+            if existing:
+                job_id = existing['id']
+            else:
+                job_id = db.execute(
+                    "INSERT INTO jobs (tipo, parametros, prioridade, max_tentativas, criada_em) VALUES (?, ?, ?, ?, ?)",
+                    (kind, params, int(priority), max_attempts, _now())
+                ).lastrowid
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        self._wake.set()
+        return job_id
+    
+    def get(self, job_id):
+        """Estado de uma tarefa (None se não existir)"""
+        return _row_to_job(self._db().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+    
+    def recent(self, limit=20, kind=None):
+        """Tarefas mais recentes"""
+        if kind:
+            rows = self._db().execute("SELECT * FROM jobs WHERE tipo = ? ORDER BY id DESC LIMIT ?", (kind, limit))
+        else:
+            rows = self._db().execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,))
+        return [_row_to_job(row) for row in rows]
+    
+    def counts(self):
+        """Número de tarefas por status"""
+        return dict(self._db().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+    
+    def cancel(self, job_id):
+        """Cancela uma tarefa pendente ou pede a interrupção de uma em execução"""
+        db = self._db()
+        db.execute(
+            "UPDATE jobs SET status = 'cancelada', concluida_em = ? WHERE id = ? AND status = 'pendente'",
+            (_now(), job_id)
+        )
+        db.execute("UPDATE jobs SET cancelar = 1 WHERE id = ? AND status = 'executando'", (job_id,))
+    
+    # Execução
+    
+    def start(self):
+        """Inicia a thread de agendamento (uma vez por processo)"""
+        with self._lock:
+            if self._scheduler is not None:
+                return self
+            self._recover()
+            self._purge()
+            self._scheduler = threading.Thread(target=self._run, name="tarefas", daemon=True)
+            self._scheduler.start()
+        return self
+    
+    def stop(self, wait=True):
+        """Para de retirar tarefas e encerra os executores"""
+        self._stopping.set()
+        self._wake.set()
+        if self._scheduler is not None:
+            self._scheduler.join(5)
+        for executor in self._executors.values():
+            executor.shutdown(wait=wait, cancel_futures=True)
+    
+    def _recover(self):
+        """Devolve à fila as tarefas de processos deste computador que não existem mais"""
+        host = socket.gethostname()
+        for row in self._db().execute("SELECT id, trabalhador FROM jobs WHERE status = 'executando'").fetchall():
+            worker_host, _, pid = (row['trabalhador'] or '').rpartition(':')
+            if worker_host == host and pid.isdigit() and not _pid_alive(int(pid)):
+                self._db().execute(
+                    "UPDATE jobs SET status = 'pendente', mensagem = 'Retomada após reinício' WHERE id = ?", (row['id'],)
+                )
+    
+    def _purge(self):
+        limit = (datetime.now() - timedelta(days=JOB_HISTORY_DAYS)).isoformat(timespec='seconds')
+        placeholders = ", ".join("?" * len(FINISHED_STATUSES))
+        self._db().execute(f"DELETE FROM jobs WHERE status IN ({placeholders}) AND concluida_em < ?", (*FINISHED_STATUSES, limit))
+    
+    def _executor(self, kind):
+        if kind not in self._executors:
+            if kind == 'process':
+                self._executors[kind] = ProcessPoolExecutor(self.limits[kind], mp_context=multiprocessing.get_context('spawn'))
+            else:
+                self._executors[kind] = ThreadPoolExecutor(self.limits[kind], thread_name_prefix="tarefa")
+        return self._executors[kind]
+    
+    def _claim(self, executor):
+        """Retira atomicamente a próxima tarefa pendente de um tipo de executor"""
+        kinds = [kind for kind, spec in self.job_types.items() if spec['executor'] == executor]
+        if not kinds:
+            return None
+        placeholders = ", ".join("?" * len(kinds))
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute(
+                f"""UPDATE jobs SET status = 'executando', tentativas = tentativas + 1, trabalhador = ?,
+                        iniciada_em = ?, erro = NULL
+                    WHERE id = (
+                        SELECT id FROM jobs
+                        WHERE status = 'pendente' AND executar_apos <= ? AND tipo IN ({placeholders})
+                        ORDER BY prioridade DESC, id LIMIT 1
+                    )
+                    RETURNING *""",
+                (self.worker_id, _now(), time.time(), *kinds)
+            ).fetchone()
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        return _row_to_job(row)
+    
+    def _run(self):
+        while not self._stopping.is_set():
+            claimed = False
+            for executor in ('thread', 'process'):
+                while self._running[executor] < self.limits[executor] and not self._stopping.is_set():
+                    job = self._claim(executor)
+                    if job is None:
+                        break
+                    self._dispatch(job, executor)
+                    claimed = True
+            if not claimed:
+                self._wake.wait(POLL_INTERVAL)
+                self._wake.clear()
+    
+    def _dispatch(self, job, executor):
+        target = self.job_types[job['tipo']]['alvo']
+        with self._lock:
+            self._running[executor] += 1
+        future = self._executor(executor).submit(run_job, self.path, job['id'], target, job['parametros'])
+        future.add_done_callback(lambda future: self._finished(job, executor, future))
+    
+    def _finished(self, job, executor, future):
+        with self._lock:
+            self._running[executor] -= 1
+        db = self._db()
+        try:
+            result = future.result()
+        except JobCancelled:
+            db.execute("UPDATE jobs SET status = 'cancelada', concluida_em = ? WHERE id = ?", (_now(), job['id']))
+        except Exception as error:
+            message = "".join(traceback.format_exception_only(type(error), error)).strip()
+            if job['tentativas'] < job['max_tentativas']:
+                delay = RETRY_BACKOFF * 2 ** (job['tentativas'] - 1)
+                db.execute(
+                    "UPDATE jobs SET status = 'pendente', erro = ?, executar_apos = ?, mensagem = ? WHERE id = ?",
+                    (message, time.time() + delay, f"Nova tentativa em {delay:.0f}s", job['id'])
+                )
+            else:
+                db.execute(
+                    "UPDATE jobs SET status = 'falhou', erro = ?, concluida_em = ? WHERE id = ?",
+                    (message, _now(), job['id'])
+                )
+        else:
+            db.execute(
+                "UPDATE jobs SET status = 'concluida', progresso = 1, resultado = ?, concluida_em = ? WHERE id = ?",
+                (json.dumps(result, ensure_ascii=False, default=str), _now(), job['id'])
+            )
+        self._wake.set()
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+_DEFAULT_QUEUE = None
+_QUEUE_LOCK = threading.Lock()
+
+def get_job_queue():
+    """Fila padrão (data/jobs.db); inicia os trabalhadores deste processo"""
+    global _DEFAULT_QUEUE
+    with _QUEUE_LOCK:
+        if _DEFAULT_QUEUE is None:
+            _DEFAULT_QUEUE = JobQueue().start()
+        return _DEFAULT_QUEUE
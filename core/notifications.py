@@ -0,0 +1,475 @@
+# core/notifications.py
+"""Fila de notificações por e-mail com envio em segundo plano
+
+As mensagens (lembretes de consulta, envio de planos) entram em uma fila
+persistente ordenada pelo horário de envio: um heap mínimo de
+(horário, sequência, id) gravado em data/notifications.json junto com as
+mensagens. Uma thread de despacho dorme até a próxima mensagem vencer (ou
+até ser acordada por uma nova), retira as vencidas e as envia em lotes,
+um lote por conexão SMTP. As conexões ficam abertas em um pool e são
+reaproveitadas entre lotes.
+
+Falhas temporárias (conexão, respostas 4xx) voltam para a fila com espera
+exponencial. Falhas permanentes (5xx) e mensagens que esgotam as
+tentativas vão para o histórico como falha. Enfileirar só grava o arquivo
+e acorda a thread; nenhuma conexão de rede acontece na chamada, então uma
+página do Streamlit nunca espera pelo servidor de e-mail.
+
+Para testar sem servidor real: python -m core.smtp_local (porta 8025, a
+porta padrão das configurações).
+"""
+import heapq
+import json
+import os
+import random
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import formatdate, make_msgid
+
+from core.storage import write_json
+from core.formats import load_data
+
+NOTIFICATIONS_FILE = 'data/notifications.json'
+CONFIG_FILE = 'data/system_config.json'
+PATIENTS_FILE = 'data/patients.json'
+
+# Servidor padrão: o servidor local de testes (core.smtp_local ou aiosmtpd)
+SMTP_DEFAULTS = {
+    'host': 'localhost',
+    'port': 8025,
+    'user': '',
+    'password': '',
+    'use_tls': False,
+    'sender': 'NutriApp360 <nao-responda@nutriapp360.com>',
+    'timeout': 10
+}
+
+# Mensagens por conexão e conexões simultâneas no pool
+BATCH_SIZE = 20
+POOL_SIZE = 2
+# Conexões ociosas por mais tempo que isto (segundos) são fechadas
+CONNECTION_IDLE_TIMEOUT = 60
+
+# Novas tentativas: espera de BACKOFF_BASE * 2^(tentativa - 1) segundos, até BACKOFF_MAX
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 30
+BACKOFF_MAX = 3600
+
+# Lembrete enviado este número de horas antes da consulta
+REMINDER_HOURS_BEFORE = 24
+
+# Mensagens enviadas ou com falha mantidas no histórico
+HISTORY_SIZE = 200
+
+# Intervalo máximo de espera da thread (relê a fila gravada por outros processos)
+IDLE_WAIT = 30
+
+NOTIFICATION_KINDS = {
+    'lembrete_consulta': "Lembrete de consulta",
+    'plano': "Plano alimentar",
+    'backup': "Backup automático",
+    'geral': "Mensagem"
+}
+
+def load_settings(path=CONFIG_FILE):
+    """(notificações ativas, configurações SMTP) a partir das configurações do sistema"""
+    config = {}
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    return config.get('email_notifications', True), {**SMTP_DEFAULTS, **config.get('smtp', {})}
+
+def patient_email(patient_id, path=PATIENTS_FILE):
+    """E-mail cadastrado do paciente (None se não houver)"""
+    if not os.path.exists(path):
+        return None
+    patient = load_data(path).get(patient_id) or {}
+    return patient.get('email') or None
+
+def _seconds(moment):
+    return moment.timestamp() if isinstance(moment, datetime) else float(moment)
+
+def retry_delay(attempts):
+    """Espera (segundos) antes da próxima tentativa, com variação de até 10%"""
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1))
+    return delay * random.uniform(1.0, 1.1)
+
+class TemporaryFailure(Exception):
+    """Falha que pode ser repetida (conexão, respostas 4xx)"""
+
+class Outbox:
+    """Fila persistente de mensagens ordenada pelo horário de envio (heap mínimo)"""
+    
+    def __init__(self, path=NOTIFICATIONS_FILE):
+        self.path = path
+        self._lock = threading.RLock()
+        self._version = None
+        self._state = None
+    
+    def _empty(self):
+        return {'fila': [], 'mensagens': {}, 'historico': [], 'sequencia': 0}
+    
+    def _load(self):
+        """Estado atual, relido se outro processo alterou o arquivo"""
+        try:
+            version = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            version = None
+        
+        if self._state is not None and version == self._version:
+            return self._state
+        
+        first_load, state = self._state is None, self._empty()
+        if version is not None:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        if first_load:
+            # Mensagens que estavam sendo enviadas quando o processo parou voltam para a fila
+            for message in state['mensagens'].values():
+                if message['status'] == 'enviando':
+                    message['status'] = 'pendente'
+                    state['sequencia'] += 1
+                    heapq.heappush(state['fila'], [_seconds(datetime.now()), state['sequencia'], message['id']])
+        
+        self._state, self._version = state, version
+        return state
+    
+    def _save(self, state):
+        write_json(self.path, state)
+        self._version = os.stat(self.path).st_mtime_ns
+    
+    def _push(self, state, message, due):
+        state['sequencia'] += 1
+        message['envio'] = datetime.fromtimestamp(due).isoformat(timespec='seconds')
+        heapq.heappush(state['fila'], [due, state['sequencia'], message['id']])
+    
+    def enqueue(self, to, subject, body, due=None, kind='geral', key=None):
+        """Agenda uma mensagem (due: datetime, padrão agora); key substitui a pendente de mesma chave"""
+        with self._lock:
+            state = self._load()
+            if key:
+                self._cancel(state, key)
+            
+            state['sequencia'] += 1
+            message = {
+                'id': f"MSG_{state['sequencia']:06d}",
+                'tipo': kind,
+                'chave': key,
+                'para': to,
+                'assunto': subject,
+                'corpo': body,
+                'status': 'pendente',
+                'tentativas': 0,
+                'erro': None,
+                'criada_em': datetime.now().isoformat(timespec='seconds')
+            }
+            state['mensagens'][message['id']] = message
+            self._push(state, message, _seconds(due or datetime.now()))
+            self._save(state)
+            return message['id']
+    
+    def _cancel(self, state, key):
+        # Remoção preguiçosa: a entrada fica no heap e é descartada ao sair
+        cancelled = 0
+        for message in list(state['mensagens'].values()):
+            if message.get('chave') == key and message['status'] == 'pendente':
+                self._finish(state, message, 'cancelada')
+                cancelled += 1
+        return cancelled
+    
+    def cancel(self, key):
+        """Cancela as mensagens pendentes de uma chave"""
+        with self._lock:
+            state = self._load()
+            cancelled = self._cancel(state, key)
+            if cancelled:
+                self._save(state)
+            return cancelled
+    
+    def next_due(self):
+        """Horário (segundos) da próxima mensagem pendente, ou None"""
+        with self._lock:
+            state = self._load()
+            queue = state['fila']
+            while queue and state['mensagens'].get(queue[0][2], {}).get('status') != 'pendente':
+                heapq.heappop(queue)
+            return queue[0][0] if queue else None
+    
+    def take_due(self, limit, now=None):
+        """Retira até limit mensagens vencidas (marcadas como 'enviando')"""
+        now = _seconds(now or datetime.now())
+        with self._lock:
+            state = self._load()
+            queue, taken = state['fila'], []
+            while queue and queue[0][0] <= now and len(taken) < limit:
+                _, _, message_id = heapq.heappop(queue)
+                message = state['mensagens'].get(message_id)
+                if message and message['status'] == 'pendente':
+                    message['status'] = 'enviando'
+                    taken.append(dict(message))
+            if taken:
+                self._save(state)
+            return taken
+    
+    def _finish(self, state, message, status, error=None):
+        message.update(status=status, erro=error, concluida_em=datetime.now().isoformat(timespec='seconds'))
+        del state['mensagens'][message['id']]
+        state['historico'] = (state['historico'] + [message])[-HISTORY_SIZE:]
+    
+    def record(self, results):
+        """Registra o resultado dos envios: [(id, None | TemporaryFailure | Exception)]"""
+        with self._lock:
+            state = self._load()
+            for message_id, error in results:
+                message = state['mensagens'].get(message_id)
+                if message is None:
+                    continue
+                message['tentativas'] += 1
+                if error is None:
+                    self._finish(state, message, 'enviada')
+                elif isinstance(error, TemporaryFailure) and message['tentativas'] < MAX_ATTEMPTS:
+                    message.update(status='pendente', erro=str(error))
+                    self._push(state, message, time.time() + retry_delay(message['tentativas']))
+                else:
+                    self._finish(state, message, 'falhou', str(error))
+            self._save(state)
+    
+    def pending(self):
+        """Mensagens pendentes, em ordem de envio"""
+        with self._lock:
+            state = self._load()
+            return sorted((dict(message) for message in state['mensagens'].values()), key=lambda message: message['envio'])
+    
+    def history(self, limit=50):
+        """Últimas mensagens enviadas, canceladas ou com falha (mais recentes primeiro)"""
+        with self._lock:
+            return [dict(message) for message in reversed(self._load()['historico'][-limit:])]
+
+class SMTPPool:
+    """Conexões SMTP reaproveitadas entre lotes"""
+    
+    def __init__(self, settings, size=POOL_SIZE):
+        self.settings = settings
+        self.size = size
+        self._idle = []
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+    
+    def _connect(self):
+        settings = self.settings
+        connection = smtplib.SMTP(settings['host'], int(settings['port']), timeout=settings.get('timeout', 10))
+        if settings.get('use_tls'):
+            connection.starttls()
+        if settings.get('user'):
+            connection.login(settings['user'], settings['password'])
+        self.connections_opened += 1
+        return connection
+    
+    def _acquire(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                connection, released_at = self._idle.pop()
+            # O servidor pode ter fechado a conexão ociosa: confere com NOOP antes de reaproveitar
+            if time.monotonic() - released_at < CONNECTION_IDLE_TIMEOUT and self._alive(connection):
+                return connection
+            self._close(connection)
+        return self._connect()
+    
+    @staticmethod
+    def _alive(connection):
+        try:
+            return connection.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+    
+    def _release(self, connection):
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append((connection, time.monotonic()))
+                return
+        self._close(connection)
+    
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.quit()
+        except (smtplib.SMTPException, OSError):
+            connection.close()
+    
+    def build_message(self, message):
+        email = EmailMessage()
+        email['From'] = self.settings['sender']
+        email['To'] = message['para']
+        email['Subject'] = message['assunto']
+        email['Date'] = formatdate(localtime=True)
+        email['Message-ID'] = make_msgid(idstring=message['id'])
+        email.set_content(message['corpo'])
+        return email
+    
+    def send_batch(self, messages):
+        """Envia um lote por uma única conexão; retorna [(id, erro ou None)]"""
+        results = []
+        try:
+            connection = self._acquire()
+        except (smtplib.SMTPException, OSError) as error:
+            return [(message['id'], TemporaryFailure(f"Conexão: {error}")) for message in messages]
+        
+        for i, message in enumerate(messages):
+            try:
+                connection.send_message(self.build_message(message))
+                results.append((message['id'], None))
+            except smtplib.SMTPRecipientsRefused as error:
+                results.append((message['id'], error))
+            except smtplib.SMTPResponseException as error:
+                reply = f"{error.smtp_code} {error.smtp_error.decode('utf-8', 'replace') if isinstance(error.smtp_error, bytes) else error.smtp_error}"
+                results.append((message['id'], TemporaryFailure(reply) if 400 <= error.smtp_code < 500 else Exception(reply)))
+                try:
+                    connection.rset()
+                except (smtplib.SMTPException, OSError):
+                    pass
+            except (smtplib.SMTPServerDisconnected, OSError) as error:
+                # Conexão perdida: o restante do lote volta para a fila
+                connection.close()
+                results.extend((pending['id'], TemporaryFailure(f"Conexão: {error}")) for pending in messages[i:])
+                return results
+        
+        self._release(connection)
+        return results
+    
+    def close(self):
+        """Fecha as conexões ociosas"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection, _ in idle:
+            self._close(connection)
+
+class NotificationDispatcher(threading.Thread):
+    """Thread que envia as mensagens vencidas da fila"""
+    
+    def __init__(self, outbox, settings_loader=load_settings, batch_size=BATCH_SIZE, pool_size=POOL_SIZE):
+        super().__init__(name="notificacoes", daemon=True)
+        self.outbox = outbox
+        self.settings_loader = settings_loader
+        self.batch_size = batch_size
+        self.pool_size = pool_size
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._pool = None
+        self._pool_settings = None
+    
+    def wake(self):
+        """Acorda a thread (nova mensagem na fila)"""
+        self._wake.set()
+    
+    def stop(self, timeout=5):
+        """Encerra a thread e fecha as conexões"""
+        self._stopping.set()
+        self._wake.set()
+        self.join(timeout)
+    
+    def _get_pool(self, settings):
+        if self._pool is None or settings != self._pool_settings:
+            if self._pool is not None:
+                self._pool.close()
+            self._pool, self._pool_settings = SMTPPool(settings, self.pool_size), settings
+        return self._pool
+    
+    def dispatch_due(self):
+        """Envia tudo o que está vencido; retorna o número de mensagens processadas (None se desativado)"""
+        enabled, settings = self.settings_loader()
+        if not enabled:
+            return None
+        
+        processed = 0
+        while not self._stopping.is_set():
+            due = self.outbox.take_due(self.batch_size * self.pool_size)
+            if not due:
+                break
+            pool = self._get_pool(settings)
+            batches = [due[i:i + self.batch_size] for i in range(0, len(due), self.batch_size)]
+            with ThreadPoolExecutor(max_workers=len(batches)) as executor:
+                for results in executor.map(pool.send_batch, batches):
+                    self.outbox.record(results)
+            processed += len(due)
+        return processed
+    
+    def run(self):
+        while not self._stopping.is_set():
+            processed = None
+            try:
+                processed = self.dispatch_due()
+            except Exception as error:  # a thread não pode morrer com um erro inesperado
+                print(f"Erro no envio de notificações: {error}")
+            
+            next_due = self.outbox.next_due() if processed is not None else None
+            wait = IDLE_WAIT if next_due is None else min(IDLE_WAIT, max(0.0, next_due - time.time()))
+            self._wake.wait(wait)
+            self._wake.clear()
+        
+        if self._pool is not None:
+            self._pool.close()
+
+class Notifier:
+    """Ponto de entrada das notificações: enfileira e acorda o despacho"""
+    
+    def __init__(self, outbox, dispatcher=None, settings_loader=load_settings):
+        self.outbox = outbox
+        self.dispatcher = dispatcher
+        self.settings_loader = settings_loader
+    
+    def enabled(self):
+        """Notificações por e-mail ativas nas configurações"""
+        return self.settings_loader()[0]
+    
+    def send(self, to, subject, body, due=None, kind='geral', key=None):
+        """Enfileira uma mensagem; retorna o id (None se as notificações estiverem desativadas)"""
+        if not to or not self.enabled():
+            return None
+        message_id = self.outbox.enqueue(to, subject, body, due, kind, key)
+        if self.dispatcher is not None:
+            self.dispatcher.wake()
+        return message_id
+    
+    def appointment_saved(self, appointment, previous=None):
+        """Agenda, remarca ou cancela o lembrete de uma consulta"""
+        key = f"lembrete:{appointment['id']}"
+        start = datetime.fromisoformat(appointment['inicio'])
+        
+        if appointment.get('status') not in ('agendada', 'confirmada') or start <= datetime.now():
+            self.outbox.cancel(key)
+            return None
+        
+        to = patient_email(appointment.get('patient_id'))
+        if not to:
+            self.outbox.cancel(key)
+            return None
+        
+        due = max(start - timedelta(hours=REMINDER_HOURS_BEFORE), datetime.now())
+        body = (
+            f"Olá, {appointment.get('paciente') or ''}!\n\n"
+            f"Lembramos da sua consulta ({appointment.get('tipo', 'consulta').lower()}) "
+            f"em {start:%d/%m/%Y} às {start:%H:%M}"
+            + (f", {appointment['local']}" if appointment.get('local') else "")
+            + ".\n\nSe precisar remarcar, acesse a área do paciente no NutriApp360.\n"
+        )
+        return self.send(to, f"Lembrete: consulta em {start:%d/%m às %H:%M}", body, due, 'lembrete_consulta', key)
+
+_DEFAULT_NOTIFIER = None
+_NOTIFIER_LOCK = threading.Lock()
+
+def get_notifier():
+    """Notificações padrão (data/notifications.json); inicia a thread de envio do processo"""
+    global _DEFAULT_NOTIFIER
+    with _NOTIFIER_LOCK:
+        if _DEFAULT_NOTIFIER is None:
+            outbox = Outbox()
+            dispatcher = NotificationDispatcher(outbox)
+            dispatcher.start()
+            _DEFAULT_NOTIFIER = Notifier(outbox, dispatcher)
+        return _DEFAULT_NOTIFIER
@@ -0,0 +1,144 @@
+# core/smtp_local.py
+"""Servidor SMTP local mínimo para desenvolvimento e testes
+
+Substitui o aiosmtpd (python -m aiosmtpd -n -l localhost:8025) quando ele
+não está instalado: aceita EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP e QUIT,
+guarda as mensagens recebidas em memória (e opcionalmente em arquivos .eml)
+e permite simular falhas temporárias para testar as novas tentativas.
+
+Uso: python -m core.smtp_local [--porta 8025] [--pasta data/caixa_local]
+"""
+import argparse
+import os
+import socketserver
+import threading
+import time
+from email import message_from_bytes, policy
+
+DEFAULT_HOST = 'localhost'
+DEFAULT_PORT = 8025
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode('ascii'))
+    
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.reply("220 nutriapp-smtp-local pronto")
+        sender, recipients = None, []
+        
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command[:4].upper()
+            
+            if verb in ('EHLO', 'HELO'):
+                self.reply("250 nutriapp-smtp-local")
+            elif verb == 'MAIL':
+                sender, recipients = command.split(':', 1)[1].strip(), []
+                self.reply("250 OK")
+            elif verb == 'RCPT':
+                recipients.append(command.split(':', 1)[1].strip().strip('<>'))
+                self.reply("250 OK")
+            elif verb == 'DATA':
+                self.reply("354 Termine com <CRLF>.<CRLF>")
+                lines = []
+                while True:
+                    data = self.rfile.readline()
+                    if not data or data in (b".\r\n", b".\n"):
+                        break
+                    lines.append(data[1:] if data.startswith(b"..") else data)
+                
+                failure = server.take_failure()
+                if failure:
+                    self.reply(failure)
+                else:
+                    server.store(sender, recipients, b"".join(lines))
+                    self.reply("250 Mensagem aceita")
+                sender, recipients = None, []
+            elif verb == 'RSET':
+                sender, recipients = None, []
+                self.reply("250 OK")
+            elif verb == 'NOOP':
+                self.reply("250 OK")
+            elif verb == 'QUIT':
+                self.reply("221 Ate logo")
+                return
+            else:
+                self.reply("502 Comando nao implementado")
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    """Servidor SMTP em thread própria; messages guarda (remetente, destinatários, mensagem)"""
+    
+    daemon_threads = True
+    allow_reuse_address = True
+    
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, mailbox_dir=None):
+        super().__init__((host, port), _SMTPHandler)
+        self.mailbox_dir = mailbox_dir
+        self.messages = []
+        self.connections = 0
+        self._failures = []
+        self._lock = threading.Lock()
+        self._thread = None
+        if mailbox_dir:
+            os.makedirs(mailbox_dir, exist_ok=True)
+    
+    @property
+    def port(self):
+        return self.server_address[1]
+    
+    def fail_next(self, count=1, reply="451 Falha temporaria simulada"):
+        """Responde com erro às próximas count mensagens"""
+        with self._lock:
+            self._failures.extend([reply] * count)
+    
+    def take_failure(self):
+        with self._lock:
+            return self._failures.pop(0) if self._failures else None
+    
+    def store(self, sender, recipients, data):
+        message = message_from_bytes(data, policy=policy.default)
+        with self._lock:
+            self.messages.append((sender, recipients, message))
+            if self.mailbox_dir:
+                path = os.path.join(self.mailbox_dir, f"{time.time_ns()}.eml")
+                with open(path, 'wb') as f:
+                    f.write(data)
+    
+    def start(self):
+        """Atende em segundo plano (retorna o próprio servidor)"""
+        self._thread = threading.Thread(target=self.serve_forever, name="smtp-local", daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        """Encerra o servidor"""
+        self.shutdown()
+        self.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor SMTP local do NutriApp360")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--porta', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--pasta', default=None, help="Pasta onde salvar as mensagens (.eml)")
+    args = parser.parse_args()
+    
+    server = LocalSMTPServer(args.host, args.porta, args.pasta)
+    print(f"SMTP local em {args.host}:{server.port} (Ctrl+C para sair)")
+    received = 0
+    try:
+        server.start()
+        while True:
+            time.sleep(1)
+            for sender, recipients, message in server.messages[received:]:
+                print(f"{sender} -> {', '.join(recipients)}: {message['Subject']}")
+            received = len(server.messages)
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+# core/storage.py
+"""Escrita dos arquivos de dados e snapshots consistentes
+
+Toda escrita em data/ passa por aqui: os JSON são gravados num arquivo
+temporário e trocados por os.replace (quem lê vê o arquivo antigo ou o
+novo, nunca um pela metade) e as séries binárias só recebem acréscimos no
+final. Com isso um hardlink feito num instante continua mostrando o
+conteúdo daquele instante: o os.replace cria um arquivo novo em vez de
+alterar o antigo, e dos arquivos que crescem basta guardar o tamanho.
+
+O snapshot liga (hardlink) todos os arquivos sem parar ninguém, anotando
+os caminhos gravados enquanto isso. Em seguida fecha a barreira de escrita
+por um instante só para refazer as ligações dos arquivos que mudaram no
+meio do caminho. A pausa depende de quantos arquivos foram gravados
+durante o snapshot, não do tamanho dos dados, e fica registrada em
+BARRIER.pauses (segundos).
+
+updating() serializa quem lê, altera e grava de volta o mesmo arquivo
+(gerenciadores e o arquivamento de pacientes).
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+class WriteBarrier:
+    """Várias escritas simultâneas ou uma pausa exclusiva para o snapshot"""
+    
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._writers = 0
+        self._waiting = 0
+        self._exclusive = False
+        self._trackers = []
+        self._local = threading.local()
+        self.pauses = deque(maxlen=100)
+    
+    @contextmanager
+    def writing(self, *paths):
+        """Escrita nos caminhos indicados (reentrante na mesma thread)"""
+        depth = getattr(self._local, 'depth', 0)
+        if depth == 0:
+            with self._condition:
+                while self._exclusive or self._waiting:
+                    self._condition.wait()
+                self._writers += 1
+        self._local.depth = depth + 1
+        try:
+            yield
+        finally:
+            self._local.depth = depth
+            with self._condition:
+                for tracker in self._trackers:
+                    tracker.update(os.path.abspath(path) for path in paths)
+                if depth == 0:
+                    self._writers -= 1
+                    self._condition.notify_all()
+    
+    @contextmanager
+    def exclusive(self):
+        """Bloqueia novas escritas e espera as em andamento; a duração é registrada em pauses"""
+        start = time.perf_counter()
+        with self._condition:
+            self._waiting += 1
+            while self._writers or self._exclusive:
+                self._condition.wait()
+            self._waiting -= 1
+            self._exclusive = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._exclusive = False
+                self._condition.notify_all()
+            self.pauses.append(time.perf_counter() - start)
+    
+    @contextmanager
+    def track(self):
+        """Conjunto dos caminhos (absolutos) gravados enquanto o bloco estiver aberto"""
+        written = set()
+        with self._condition:
+            self._trackers.append(written)
+        try:
+            yield written
+        finally:
+            with self._condition:
+                self._trackers.remove(written)
+
+BARRIER = WriteBarrier()
+
+_UPDATE_LOCKS = {}
+_UPDATE_LOCKS_GUARD = threading.Lock()
+
+@contextmanager
+def updating(*paths):
+    """Leitura-modificação-gravação exclusiva dos caminhos (reentrante na mesma thread)
+    
+    Quem lê um arquivo de dados, altera e grava de volta segura esta trava
+    do início ao fim, para não sobrescrever o que outro gravou no meio.
+    Não bloqueia snapshots; as travas são tomadas em ordem de caminho.
+    """
+    with _UPDATE_LOCKS_GUARD:
+        locks = [_UPDATE_LOCKS.setdefault(path, threading.RLock()) for path in sorted({os.path.abspath(path) for path in paths})]
+    for lock in locks:
+        lock.acquire()
+    try:
+        yield
+    finally:
+        for lock in reversed(locks):
+            lock.release()
+
+def file_version(path):
+    """(modificação, tamanho) do arquivo, para invalidar caches; None se não existir"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def write_json(path, data, **options):
+    """Grava um JSON por arquivo temporário + os.replace"""
+    options = {'ensure_ascii': False, 'default': str, **options}
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temporary = f"{path}.tmp"
+    with BARRIER.writing(path):
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(data, f, **options)
+        os.replace(temporary, path)
+
+def write_bytes(path, data):
+    """Grava um arquivo binário por arquivo temporário + os.replace"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temporary = f"{path}.tmp"
+    with BARRIER.writing(path):
+        with open(temporary, 'wb') as f:
+            f.write(data)
+        os.replace(temporary, path)
+
+def append_bytes(path, data):
+    """Acrescenta bytes ao final de um arquivo"""
+    with BARRIER.writing(path):
+        with open(path, 'ab') as f:
+            f.write(data)
+
+def _link(source, target):
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    if os.path.lexists(target):
+        os.remove(target)
+    try:
+        os.link(source, target)
+    except OSError:
+        # Sistemas de arquivos sem hardlink: cópia (o arquivo pode estar sendo gravado, e é refeito abaixo)
+        shutil.copy2(source, target)
+    return os.stat(target).st_size
+
+def snapshot(files, target, root='.', accept=None):
+    """Cópia consistente (hardlinks) de arquivos relativos à raiz em target
+    
+    accept(relativo) decide se um arquivo criado durante o snapshot entra
+    nele. Retorna ({relativo: tamanho}, pausa em segundos); leia só os
+    primeiros `tamanho` bytes de cada arquivo (os que crescem continuam
+    crescendo no original).
+    """
+    sizes = {}
+    with BARRIER.track() as written:
+        for relative in files:
+            try:
+                sizes[relative] = _link(os.path.join(root, relative), os.path.join(target, relative))
+            except FileNotFoundError:
+                pass
+        
+        start = time.perf_counter()
+        with BARRIER.exclusive():
+            for path in written:
+                relative = os.path.relpath(path, os.path.abspath(root)).replace(os.sep, '/')
+                if relative not in sizes and not (accept and accept(relative)):
+                    continue
+                if os.path.exists(path):
+                    sizes[relative] = _link(path, os.path.join(target, relative))
+                elif relative in sizes:
+                    del sizes[relative]
+                    os.remove(os.path.join(target, relative))
+    
+    return sizes, time.perf_counter() - start
@@ -0,0 +1,256 @@
+# core/timeseries.py
+"""Séries temporais de medidas por paciente em arquivos binários compactos
+
+Cada série fica em um arquivo próprio (data/timeseries/<id>.bin) com um
+cabeçalho curto (assinatura, nomes das colunas) seguido de registros de
+float64: instante (segundos desde 1970) e uma coluna por medida, com NaN
+para medidas não informadas. Novas medidas são acrescentadas ao final do
+arquivo, sem reescrever o histórico.
+
+A leitura é feita de uma vez com NumPy e mantida em memória enquanto o
+arquivo não mudar (tamanho e data de modificação), então o histórico
+completo de um paciente é servido em microssegundos para os gráficos.
+"""
+import json
+import os
+import re
+import struct
+import threading
+from datetime import date, datetime, timezone
+
+from core.formulas import _numpy
+from core.storage import append_bytes, updating
+
+TIMESERIES_DIR = 'data/timeseries'
+
+# Medidas registradas por padrão: peso (kg), cintura (cm), gordura corporal (%)
+SERIES_COLUMNS = ('peso', 'cintura', 'gordura_corporal')
+
+MAGIC = b'NTS1'
+
+# Frequências de reamostragem: diária, semanal (início na segunda) e mensal
+RESAMPLE_FREQUENCIES = {'D': "Diária", 'W': "Semanal", 'M': "Mensal"}
+
+_SERIES_ID = re.compile(r'^[A-Za-z0-9_-]+$')
+
+def to_seconds(timestamp=None):
+    """Converte data/hora (ISO, date, datetime ou None = agora) em segundos desde 1970"""
+    if timestamp is None:
+        timestamp = datetime.now()
+    elif isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    elif isinstance(timestamp, date) and not isinstance(timestamp, datetime):
+        timestamp = datetime.combine(timestamp, datetime.min.time())
+    elif isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc)
+    return (timestamp.replace(tzinfo=None) - datetime(1970, 1, 1)).total_seconds()
+
+def _encode_header(columns):
+    names = ",".join(columns).encode('utf-8')
+    size = 8 + len(names)
+    padding = -size % 8  # registros alinhados em 8 bytes
+    return MAGIC + struct.pack('<HH', len(columns), size + padding) + names + b' ' * padding
+
+def _decode_header(data):
+    if data[:4] != MAGIC:
+        raise ValueError("Arquivo de série temporal inválido")
+    count, size = struct.unpack('<HH', data[4:8])
+    columns = tuple(data[8:size].decode('utf-8').strip().split(','))
+    if len(columns) != count:
+        raise ValueError("Cabeçalho de série temporal corrompido")
+    return columns, size
+
+def decode_series(data):
+    """Conteúdo de um arquivo de série -> {'timestamp': datetime64[s], coluna: float64, ...} ordenado"""
+    np = _numpy()
+    columns, offset = _decode_header(data)
+    width = len(columns) + 1
+    count = (len(data) - offset) // (8 * width)  # ignora registro incompleto no final
+    rows = np.frombuffer(data, dtype='<f8', count=count * width, offset=offset).reshape(count, width)
+    
+    if count > 1 and (np.diff(rows[:, 0]) < 0).any():
+        rows = rows[np.argsort(rows[:, 0], kind='stable')]
+    
+    series = {'timestamp': rows[:, 0].astype('datetime64[s]')}
+    for i, name in enumerate(columns, start=1):
+        series[name] = rows[:, i]
+    return series
+
+class TimeSeriesStore:
+    """Armazenamento de séries temporais por paciente (acréscimo, consulta e reamostragem)"""
+    
+    def __init__(self, data_dir=TIMESERIES_DIR, columns=SERIES_COLUMNS):
+        self.data_dir = data_dir
+        self.columns = tuple(columns)
+        self._cache = {}
+        self._lock = threading.Lock()
+        os.makedirs(data_dir, exist_ok=True)
+    
+    def path(self, series_id):
+        """Caminho do arquivo de uma série"""
+        if not _SERIES_ID.match(str(series_id)):
+            raise ValueError(f"Identificador de série inválido: {series_id}")
+        return os.path.join(self.data_dir, f"{series_id}.bin")
+    
+    def version(self, series_id):
+        """Versão da série (tamanho, modificação); None se não existir"""
+        try:
+            stat = os.stat(self.path(series_id))
+        except FileNotFoundError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+    
+    def append(self, series_id, timestamp=None, **values):
+        """Acrescenta uma medida; colunas ausentes ficam NaN"""
+        self.append_many(series_id, [timestamp], **{name: [value] for name, value in values.items()})
+    
+    def append_many(self, series_id, timestamps, **columns):
+        """Acrescenta várias medidas de uma vez (listas alinhadas com timestamps)"""
+        path = self.path(series_id)
+        
+        with self._lock, updating(path):
+            file_columns = self._file_columns(path)
+            unknown = set(columns) - set(file_columns)
+            if unknown:
+                raise ValueError(f"Colunas desconhecidas: {', '.join(sorted(unknown))}")
+            
+            records = []
+            for i, timestamp in enumerate(timestamps):
+                row = [to_seconds(timestamp)]
+                for name in file_columns:
+                    value = columns[name][i] if name in columns else None
+                    row.append(float('nan') if value is None else float(value))
+                records.append(struct.pack(f'<{len(row)}d', *row))
+            
+            header = b'' if os.path.exists(path) else _encode_header(file_columns)
+            append_bytes(path, header + b''.join(records))
+    
+    def _file_columns(self, path):
+        if not os.path.exists(path):
+            return self.columns
+        with open(path, 'rb') as f:
+            return _decode_header(f.read(512))[0]
+    
+    def load(self, series_id):
+        """Série completa ordenada: {'timestamp': datetime64[s], coluna: float64, ...}
+        
+        Os arrays são compartilhados com o cache e não devem ser modificados.
+        """
+        version = self.version(series_id)
+        if version is None:
+            return self._empty()
+        
+        cached = self._cache.get(series_id)
+        if cached and cached[0] == version:
+            return cached[1]
+        
+        with open(self.path(series_id), 'rb') as f:
+            series = decode_series(f.read())
+        
+        self._cache[series_id] = (version, series)
+        return series
+    
+    def _empty(self):
+        np = _numpy()
+        series = {'timestamp': np.array([], dtype='datetime64[s]')}
+        series.update({name: np.array([], dtype=float) for name in self.columns})
+        return series
+    
+    def query(self, series_id, start=None, end=None):
+        """Medidas com start <= instante <= end (busca binária no tempo)"""
+        np = _numpy()
+        series = self.load(series_id)
+        times = series['timestamp']
+        
+        if isinstance(end, date) and not isinstance(end, datetime):
+            end = datetime.combine(end, datetime.max.time())  # data final inclui o dia inteiro
+        
+        first = 0 if start is None else np.searchsorted(times, np.datetime64(int(to_seconds(start)), 's'), side='left')
+        last = len(times) if end is None else np.searchsorted(times, np.datetime64(int(to_seconds(end)), 's'), side='right')
+        return {name: values[first:last] for name, values in series.items()}
+    
+    def resample(self, series_id, freq='W', start=None, end=None):
+        """Médias por período ('D', 'W' ou 'M'), ignorando medidas ausentes
+        
+        Retorna {'timestamp': início do período, coluna: média, 'registros': contagem}.
+        """
+        np = _numpy()
+        series = self.query(series_id, start, end)
+        times = series['timestamp']
+        
+        if freq == 'D':
+            buckets = times.astype('datetime64[D]')
+        elif freq == 'W':
+            days = times.astype('datetime64[D]').astype('int64')
+            buckets = ((days + 3) // 7 * 7 - 3).astype('datetime64[D]')  # 1970-01-01 foi quinta-feira
+        elif freq == 'M':
+            buckets = times.astype('datetime64[M]')
+        else:
+            raise ValueError(f"Frequência inválida: {freq}")
+        
+        if len(times) == 0:
+            return {**{name: values for name, values in series.items()}, 'registros': np.array([], dtype=int)}
+        
+        starts = np.concatenate([[0], np.flatnonzero(buckets[1:] != buckets[:-1]) + 1])
+        result = {'timestamp': buckets[starts].astype('datetime64[s]'), 'registros': np.diff(np.append(starts, len(times)))}
+        
+        for name, values in series.items():
+            if name == 'timestamp':
+                continue
+            valid = np.isfinite(values)
+            sums = np.add.reduceat(np.where(valid, values, 0.0), starts)
+            counts = np.add.reduceat(valid.astype(int), starts)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                result[name] = np.where(counts > 0, sums / counts, np.nan)
+        
+        return result
+    
+    def latest(self, series_id):
+        """Última medida registrada de cada coluna (None se não houver)"""
+        np = _numpy()
+        series = self.load(series_id)
+        latest = {}
+        for name, values in series.items():
+            if name == 'timestamp':
+                continue
+            valid = np.flatnonzero(np.isfinite(values))
+            latest[name] = float(values[valid[-1]]) if len(valid) else None
+        return latest
+    
+    def import_progress_json(self, path):
+        """Importa o antigo patient_progress.json ({paciente: [entradas]}); retorna o nº de medidas
+        
+        Medidas cujo instante (em segundos) já está na série são ignoradas,
+        então repetir a importação após uma interrupção não duplica dados.
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            all_progress = json.load(f)
+        
+        imported = 0
+        for series_id, entries in all_progress.items():
+            existing = set(self.load(series_id)['timestamp'].astype('int64').tolist())
+            entries = [
+                entry for entry in entries
+                if any(entry.get(name) is not None for name in self.columns)
+                and int(to_seconds(entry.get('data') or entry.get('timestamp'))) not in existing
+            ]
+            if not entries:
+                continue
+            self.append_many(
+                series_id,
+                [entry.get('data') or entry.get('timestamp') for entry in entries],
+                **{name: [entry.get(name) for entry in entries] for name in self.columns}
+            )
+            imported += len(entries)
+        return imported
+
+_DEFAULT_STORE = None
+
+def get_store():
+    """Armazenamento padrão (data/timeseries), compartilhado pelo processo"""
+    global _DEFAULT_STORE
+    if _DEFAULT_STORE is None:
+        _DEFAULT_STORE = TimeSeriesStore()
+    return _DEFAULT_STORE
@@ -0,0 +1,109 @@
+# core/weight_dynamics.py
+"""Simulação da dinâmica do peso corporal (balanço energético)
+
+Modelo de dois compartimentos no estilo de Hall: a diferença entre ingestão
+e gasto energético é dividida entre massa gorda e massa magra pela regra de
+Forbes, na forma de partição de energia de Hall (2007). O gasto acompanha o peso ao longo do tempo (TMB de Harris-Benedict
+revisada × fator de atividade) e inclui termogênese adaptativa. Todos os
+cenários de ingestão são integrados juntos, dia a dia, sobre arrays NumPy.
+"""
+from core.formulas import _numpy, _as_float_array, ACTIVITY_FACTORS, calculate_bmr_batch
+
+# Densidade energética dos tecidos (kcal/kg)
+ENERGY_DENSITY_FAT = 9440
+ENERGY_DENSITY_LEAN = 1816
+
+# Constante da regra de Forbes (kg): dLean/dFat = FORBES_CONSTANT / fat
+FORBES_CONSTANT = 10.4
+
+# Constante de partição de energia de Hall (kg): a regra de Forbes vale para
+# a variação de massa; convertida para energia, a fração do balanço destinada
+# à massa magra é C / (C + fat), com C ≈ 2 kg
+ENERGY_PARTITION_CONSTANT = FORBES_CONSTANT * ENERGY_DENSITY_LEAN / ENERGY_DENSITY_FAT
+
+# Fração da variação da ingestão compensada pelo gasto (termogênese adaptativa)
+ADAPTIVE_THERMOGENESIS = 0.14
+
+def estimate_body_fat(weight, height, age, sex):
+    """Percentual de gordura estimado pelo IMC (Deurenberg), altura em cm"""
+    np = _numpy()
+    weight, height, age = _as_float_array(weight), _as_float_array(height), _as_float_array(age)
+    bmi = weight / (height / 100) ** 2
+    male = np.asarray(sex, dtype=object) == "Masculino"
+    return np.clip(1.2 * bmi + 0.23 * age - 10.8 * male - 5.4, 5, 60)
+
+def simulate_weight(weight, height, age, sex, activity_level, intakes, weeks=52, body_fat=None):
+    """Projeta o peso semanal para cada ingestão diária (kcal) informada
+    
+    Retorna {'semanas', 'peso', 'massa_gorda', 'massa_magra', 'gasto_inicial'};
+    as trajetórias têm forma (n_cenarios, weeks + 1).
+    """
+    np = _numpy()
+    intakes = np.atleast_1d(_as_float_array(intakes))
+    n = intakes.size
+    factor = ACTIVITY_FACTORS[activity_level]
+    
+    if body_fat is None:
+        body_fat = float(estimate_body_fat(weight, height, age, sex))
+    
+    fat = np.full(n, weight * body_fat / 100)
+    lean = np.full(n, weight - weight * body_fat / 100)
+    sexes = np.full(n, sex, dtype=object)
+    
+    baseline_expenditure = float(calculate_bmr_batch(weight, height, age, sex)) * factor
+    
+    weekly_fat = np.empty((n, weeks + 1))
+    weekly_lean = np.empty((n, weeks + 1))
+    weekly_fat[:, 0], weekly_lean[:, 0] = fat, lean
+    
+    adaptation = ADAPTIVE_THERMOGENESIS * (intakes - baseline_expenditure)
+    
+    for day in range(1, weeks * 7 + 1):
+        body_weight = fat + lean
+        expenditure = calculate_bmr_batch(body_weight, height, age, sexes) * factor + adaptation
+        balance = intakes - expenditure
+        
+        # Fração do balanço energético destinada à massa magra (Hall)
+        lean_share = ENERGY_PARTITION_CONSTANT / (ENERGY_PARTITION_CONSTANT + fat)
+        lean = lean + lean_share * balance / ENERGY_DENSITY_LEAN
+        fat = np.maximum(fat + (1 - lean_share) * balance / ENERGY_DENSITY_FAT, 0.5)
+        
+        if day % 7 == 0:
+            weekly_fat[:, day // 7], weekly_lean[:, day // 7] = fat, lean
+    
+    return {
+        'semanas': np.arange(weeks + 1),
+        'peso': weekly_fat + weekly_lean,
+        'massa_gorda': weekly_fat,
+        'massa_magra': weekly_lean,
+        'gasto_inicial': baseline_expenditure
+    }
+
+def weeks_to_goal(trajectories, initial_weight, goal_weight):
+    """Primeira semana em que cada trajetória atinge a meta (NaN se não atingir)"""
+    np = _numpy()
+    trajectories = np.atleast_2d(trajectories)
+    
+    if goal_weight < initial_weight:
+        reached = trajectories <= goal_weight
+    else:
+        reached = trajectories >= goal_weight
+    
+    first = reached.argmax(axis=1).astype(float)
+    first[~reached.any(axis=1)] = np.nan
+    return first
+
+def sweep_intakes(weight, height, age, sex, activity_level, goal_weight, intake_min, intake_max, steps=200, weeks=104, body_fat=None):
+    """Semanas até a meta para uma faixa de ingestões diárias
+    
+    Retorna {'ingestao', 'semanas_meta', 'peso_final'} com um valor por cenário.
+    """
+    np = _numpy()
+    intakes = np.linspace(intake_min, intake_max, steps)
+    simulation = simulate_weight(weight, height, age, sex, activity_level, intakes, weeks, body_fat)
+    
+    return {
+        'ingestao': intakes,
+        'semanas_meta': weeks_to_goal(simulation['peso'], weight, goal_weight),
+        'peso_final': simulation['peso'][:, -1]
+    }
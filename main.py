@@ -10,6 +10,12 @@ import hashlib
 import json
 import os
 from typing import Dict, List, Optional
+from core.notifications import get_notifier
+from core.jobs import get_job_queue
+from core.backup import get_backup_scheduler
+from core.archive import schedule_archiving
+from core.storage import write_json
+from core.formats import load_data
 
 # Configuração da página
 st.set_page_config(
@@ -46,15 +52,13 @@ def init_default_data():
                 "status": "ativo"
             }
         }
-        with open(users_file, 'w', encoding='utf-8') as f:
-            json.dump(default_users, f, indent=2, ensure_ascii=False)
+        write_json(users_file, default_users, indent=2)
     
     # Criar arquivos vazios se não existirem
     empty_files = ['data/patients.json', 'data/appointments.json', 'data/meal_plans.json']
     for file_path in empty_files:
         if not os.path.exists(file_path):
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump({}, f)
+            write_json(file_path, {})
 
 # Configuração de cache para melhor performance
 @st.cache_data
@@ -69,8 +73,7 @@ def load_user_data():
 def load_patient_data():
     """Carrega dados dos pacientes"""
     if os.path.exists('data/patients.json'):
-        with open('data/patients.json', 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return load_data('data/patients.json')
     return {}
 
 # Sistema de autenticação
@@ -106,9 +109,7 @@ class AuthSystem:
     
     def save_users(self):
         """Salva dados dos usuários"""
-        os.makedirs('data', exist_ok=True)
-        with open('data/users.json', 'w', encoding='utf-8') as f:
-            json.dump(self.users, f, indent=2, ensure_ascii=False)
+        write_json('data/users.json', self.users, indent=2)
 
 # Sistema de permissões
 class PermissionSystem:
@@ -169,6 +170,10 @@ def require_permission(permission: str):
 class NutriApp360:
     def __init__(self):
         init_default_data()
+        get_notifier()  # inicia a thread de envio de notificações (uma por processo)
+        get_job_queue()  # inicia os trabalhadores da fila de tarefas (um agendador por processo)
+        get_backup_scheduler()  # enfileira os backups automáticos nos horários configurados
+        schedule_archiving()  # arquiva os pacientes inativos antigos (uma tarefa por dia)
         self.auth = AuthSystem()
         self.init_session_state()
     
@@ -476,6 +481,13 @@ class NutriApp360:
                 elif current_page == 'calculators':
                     from modules.calculators import show_calculators
                     show_calculators()
+                elif current_page in ['schedule', 'scheduling', 'new_appointment']:
+                    from modules.Appointments import show_schedule
+                    show_schedule()
+                elif current_page == 'my_appointments':
+                    from modules.Appointments import show_my_appointments
+                    from modules.Patient_dashboard import get_patient_data
+                    show_my_appointments(get_patient_data()['id'])
                 elif current_page in ['admin_dashboard', 'user_management', 'system_config', 'system_logs', 'backup_restore']:
                     from modules.admin_config import show_admin_dashboard
                     show_admin_dashboard()
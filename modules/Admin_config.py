@@ -6,6 +6,17 @@ import os
 from datetime import datetime, timedelta
 import plotly.express as px
 import plotly.graph_objects as go
+from core.cache import cache_stats
+from core.aggregates import get_aggregates
+from core.notifications import get_notifier, SMTP_DEFAULTS, NOTIFICATION_KINDS
+from core.backup import (
+    DATASETS, COMPRESSIONS, RESTORE_ACTIONS, BACKUP_FREQUENCIES, BackupRepository,
+    load_backup_settings, get_backup_scheduler
+)
+from core.storage import write_json
+from core.formats import FORMATS, load_data
+from core.archive import ARCHIVE_DEFAULTS, load_archive_settings, get_archive
+from modules.Jobs import submit_job, show_job_result, show_jobs_panel
 
 class AdminManager:
     def __init__(self):
@@ -48,8 +59,7 @@ class AdminManager:
                 }
             }
             
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(default_config, f, indent=2, ensure_ascii=False)
+            write_json(self.config_file, default_config, indent=2)
     
     @st.cache_data
     def load_config(_self):
@@ -59,8 +69,8 @@ class AdminManager:
     
     def save_config(self, config):
         """Salva configurações do sistema"""
-        with open(self.config_file, 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=2, ensure_ascii=False)
+        write_json(self.config_file, config, indent=2)
+        AdminManager.load_config.clear()
         
         # Log da alteração
         self.log_action("config_updated", "Configurações do sistema atualizadas")
@@ -87,10 +97,9 @@ class AdminManager:
             logs = logs[-1000:]
         
         # Salvar logs
-        with open(self.logs_file, 'w', encoding='utf-8') as f:
-            json.dump(logs, f, indent=2, ensure_ascii=False, default=str)
+        write_json(self.logs_file, logs, indent=2)
     
-    @st.cache_data
+    @st.cache_data(ttl=60)
     def get_system_stats(_self):
         """Obtém estatísticas do sistema"""
         stats = {
@@ -101,9 +110,13 @@ class AdminManager:
             "total_appointments": 0,
             "disk_usage": "125 MB",
             "uptime": "15 dias, 3 horas",
-            "last_backup": "2024-09-04 03:00:00"
+            "last_backup": "Nunca"
         }
         
+        last_backup = BackupRepository().last_backup()
+        if last_backup:
+            stats["last_backup"] = last_backup.replace('T', ' ')
+        
         # Simular carregamento de dados reais
         if os.path.exists('data/users.json'):
             with open('data/users.json', 'r') as f:
@@ -112,14 +125,11 @@ class AdminManager:
                 stats["active_users"] = len([u for u in users.values() if u.get('status') != 'inactive'])
         
         if os.path.exists('data/patients.json'):
-            with open('data/patients.json', 'r') as f:
-                patients = json.load(f)
-                stats["total_patients"] = len(patients)
+            stats["total_patients"] = len(load_data('data/patients.json'))
+        stats["total_patients"] += len(get_archive())
         
         if os.path.exists('data/meal_plans.json'):
-            with open('data/meal_plans.json', 'r') as f:
-                plans = json.load(f)
-                stats["total_plans"] = len(plans)
+            stats["total_plans"] = len(load_data('data/meal_plans.json'))
         
         return stats
 
@@ -161,8 +171,8 @@ def show_system_overview():
         services = [
             {"name": "API Principal", "status": "🟢 Online"},
             {"name": "Banco de Dados", "status": "🟢 Online"},
-            {"name": "Sistema de Backup", "status": "🟢 Online"},
-            {"name": "Notificações", "status": "🟡 Degradado"},
+            {"name": "Sistema de Backup", "status": "🟢 Online" if get_backup_scheduler().is_alive() else "🔴 Parado"},
+            {"name": "Notificações", "status": "🟢 Online" if get_notifier().dispatcher.is_alive() else "🔴 Parado"},
             {"name": "Relatórios", "status": "🟢 Online"}
         ]
         
@@ -183,6 +193,53 @@ def show_system_overview():
         )
         
         st.plotly_chart(fig, use_container_width=True)
+    
+    # Caches de resultados em memória (calculadoras e gráficos)
+    caches = cache_stats()
+    if caches:
+        with st.expander("🧠 Caches de Resultados"):
+            caches_df = pd.DataFrame.from_dict(caches, orient='index')
+            caches_df.index = caches_df.index.str.rsplit('.', n=1).str[-1]
+            st.dataframe(caches_df, use_container_width=True)
+    
+    with st.expander("📊 Agregados do Dashboard"):
+        aggregates = get_aggregates()
+        st.caption(f"Última atualização: {aggregates.load().get('atualizado_em') or 'nunca'}")
+        if st.button("🔄 Recalcular a partir dos dados", key="rebuild_aggregates"):
+            submit_job('agregados', 'recalcular_agregados', priority='alta')
+        if show_job_result('agregados'):
+            st.success("✅ Agregados recalculados!")
+    
+    with st.expander("📧 Fila de Notificações"):
+        show_notification_queue()
+    
+    with st.expander("⚙️ Tarefas em Segundo Plano"):
+        show_jobs_panel()
+
+def show_notification_queue():
+    """Mensagens pendentes e últimos envios"""
+    notifier = get_notifier()
+    pending = notifier.outbox.pending()
+    history = notifier.outbox.history(limit=20)
+    
+    if not notifier.enabled():
+        st.warning("Notificações por e-mail desativadas: novas mensagens não são enfileiradas; as que já estão na fila aguardam a reativação.")
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Pendentes", len(pending))
+    with col2:
+        st.metric("Enviadas (recentes)", sum(message['status'] == 'enviada' for message in history))
+    with col3:
+        st.metric("Falhas (recentes)", sum(message['status'] == 'falhou' for message in history))
+    
+    columns = {'envio': 'Envio', 'tipo': 'Tipo', 'para': 'Para', 'assunto': 'Assunto', 'tentativas': 'Tentativas', 'status': 'Status', 'erro': 'Erro'}
+    for title, messages in (("Pendentes", pending), ("Últimos envios", history)):
+        if messages:
+            st.markdown(f"**{title}**")
+            table = pd.DataFrame(messages).reindex(columns=list(columns)).rename(columns=columns)
+            table['Tipo'] = table['Tipo'].map(NOTIFICATION_KINDS).fillna(table['Tipo'])
+            st.dataframe(table, use_container_width=True, hide_index=True)
 
 def show_user_management():
     """Gestão de usuários"""
@@ -271,8 +328,15 @@ def show_system_config():
         
         with col2:
             backup_frequency = st.selectbox("Frequência de Backup", 
-                                          ["hourly", "daily", "weekly"], 
-                                          index=["hourly", "daily", "weekly"].index(config.get("backup_frequency", "daily")))
+                                          list(BACKUP_FREQUENCIES), 
+                                          index=list(BACKUP_FREQUENCIES).index(config.get("backup_frequency", "daily")),
+                                          format_func=BACKUP_FREQUENCIES.get)
+            
+            data_format = st.selectbox("Formato dos Arquivos de Dados", list(FORMATS), index=list(FORMATS).index(config.get("formato_dados", "json")),
+                                       format_func=FORMATS.get,
+                                       help="Pacientes, planos, receitas e diários; cada arquivo muda de formato na próxima gravação. "
+                                            "O binário ocupa bem menos, mas como é gravado por coluna uma alteração pequena muda "
+                                            "mais trechos do arquivo: os backups incrementais regravam mais bytes que com JSON.")
             
             email_notifications = st.checkbox("Notificações por E-mail", value=config.get("email_notifications", True))
             maintenance_mode = st.checkbox("Modo de Manutenção", value=config.get("maintenance_mode", False))
@@ -318,14 +382,33 @@ def show_system_config():
             two_factor_auth = st.checkbox("Autenticação de Dois Fatores", 
                                         value=security.get("two_factor_auth", False))
         
+        # Servidor de e-mail (notificações)
+        st.markdown("#### 📧 Servidor de E-mail")
+        
+        smtp = {**SMTP_DEFAULTS, **config.get("smtp", {})}
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            smtp_host = st.text_input("Servidor SMTP", value=smtp["host"])
+            smtp_port = st.number_input("Porta", min_value=1, max_value=65535, value=int(smtp["port"]))
+            smtp_sender = st.text_input("Remetente", value=smtp["sender"])
+        
+        with col2:
+            smtp_user = st.text_input("Usuário SMTP", value=smtp["user"])
+            smtp_password = st.text_input("Senha SMTP", value=smtp["password"], type="password")
+            smtp_tls = st.checkbox("Usar STARTTLS", value=smtp["use_tls"])
+        
         # Botão para salvar
         if st.form_submit_button("💾 Salvar Configurações", use_container_width=True):
             new_config = {
+                **config,
                 "system_name": system_name,
                 "version": config.get("version", "1.0.0"),
                 "max_users": max_users,
                 "session_timeout": session_timeout,
                 "backup_frequency": backup_frequency,
+                "formato_dados": data_format,
                 "email_notifications": email_notifications,
                 "maintenance_mode": maintenance_mode,
                 "default_language": config.get("default_language", "pt-BR"),
@@ -342,6 +425,15 @@ def show_system_config():
                     "session_encryption": session_encryption,
                     "two_factor_auth": two_factor_auth,
                     "login_attempts": login_attempts
+                },
+                "smtp": {
+                    **smtp,
+                    "host": smtp_host,
+                    "port": int(smtp_port),
+                    "sender": smtp_sender,
+                    "user": smtp_user,
+                    "password": smtp_password,
+                    "use_tls": smtp_tls
                 }
             }
             
@@ -400,10 +492,110 @@ def show_system_logs():
             
             st.divider()
 
+def format_bytes(size):
+    """Tamanho legível (B, KB, MB, GB)"""
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+def show_backup_list(repository, backups):
+    """Backups existentes com o espaço realmente ocupado por cada um"""
+    if not backups:
+        return
+    
+    with st.expander(f"🗂️ Backups ({len(backups)}) | {format_bytes(repository.storage_size())} em disco"):
+        table = pd.DataFrame([
+            {
+                'Nome': manifest['nome'],
+                'Data': manifest['criado_em'].replace('T', ' '),
+                'Conjuntos': ", ".join(manifest['conjuntos']),
+                'Dados': format_bytes(manifest['totais']['bytes']),
+                'Gravado': format_bytes(manifest['totais']['bytes_gravados']),
+                'Blocos novos': f"{manifest['totais']['blocos_novos']}/{manifest['totais']['blocos']}",
+                'Pausa (ms)': manifest['totais'].get('pausa_ms')
+            }
+            for manifest in backups
+        ])
+        st.dataframe(table, use_container_width=True, hide_index=True)
+
+def show_restore_form(repository, backups):
+    """Simulação da restauração, confirmação e restauração em segundo plano"""
+    available_backups = {manifest['nome']: manifest for manifest in backups}
+    if not available_backups:
+        st.info("Nenhum backup criado ainda.")
+        return
+    
+    backup_to_restore = st.selectbox(
+        "Selecionar backup:",
+        options=list(available_backups),
+        format_func=lambda x: f"{x} | {available_backups[x]['criado_em'].replace('T', ' ')}"
+    )
+    
+    restore_options = st.multiselect(
+        "Selecionar dados para restaurar:",
+        available_backups[backup_to_restore]['conjuntos'],
+        default=[]
+    )
+    
+    if st.button("🔍 Simular Restauração", use_container_width=True):
+        if restore_options:
+            st.session_state.restore_plan = repository.restore(backup_to_restore, restore_options, dry_run=True)
+        else:
+            st.error("Selecione pelo menos um tipo de dado para restaurar.")
+    
+    # A confirmação fica fora do botão de simulação: o plano fica na sessão até ser confirmado ou cancelado
+    plan = st.session_state.get('restore_plan')
+    if plan and (plan['backup'], plan['conjuntos']) != (backup_to_restore, restore_options):
+        plan = st.session_state.restore_plan = None
+    
+    if plan:
+        changes = [change for change in plan['alteracoes'] if change['acao'] != 'igual']
+        st.caption(" | ".join(f"{label}: {plan[action]}" for action, label in RESTORE_ACTIONS.items()))
+        
+        if not changes:
+            st.success("Os dados atuais já são iguais aos do backup.")
+        else:
+            table = pd.DataFrame(changes).rename(columns={'arquivo': 'Arquivo', 'acao': 'Ação', 'tamanho_atual': 'Atual (bytes)', 'tamanho_backup': 'Backup (bytes)'})
+            table['Ação'] = table['Ação'].map(RESTORE_ACTIONS)
+            st.dataframe(table, use_container_width=True, hide_index=True)
+            st.warning("⚠️ Esta ação irá sobrescrever os dados atuais. Confirme para continuar.")
+            
+            col_cancel, col_confirm = st.columns(2)
+            
+            with col_cancel:
+                if st.button("❌ Cancelar", key="cancel_restore"):
+                    st.session_state.restore_plan = None
+                    st.rerun()
+            
+            with col_confirm:
+                if st.button("✅ Confirmar Restauração", key="confirm_restore"):
+                    submit_job('restauracao', 'restaurar', {'nome': plan['backup'], 'conjuntos': plan['conjuntos']}, priority='alta', max_attempts=1)
+                    st.session_state.restore_plan = None
+                    st.rerun()
+    
+    job = show_job_result('restauracao')
+    if job and st.session_state.get('restored_job') != job['id']:
+        # Os dados mudaram por baixo dos caches: recarrega tudo e refaz os agregados do dashboard
+        st.session_state.restored_job = job['id']
+        st.cache_data.clear()
+        submit_job('agregados', 'recalcular_agregados', priority='alta')
+    if job:
+        result = job['resultado']
+        st.success(
+            f"✅ Backup '{result['backup']}' restaurado com sucesso! "
+            f"{result['criar']} criados, {result['substituir']} substituídos, {result['remover']} removidos"
+        )
+
 def show_backup_restore():
     """Backup e restauração"""
     st.markdown("### 💾 Backup e Restauração")
     
+    repository = BackupRepository()
+    backups = repository.manifests()
+    show_backup_list(repository, backups)
+    
     col1, col2 = st.columns(2)
     
     with col1:
@@ -411,85 +603,148 @@ def show_backup_restore():
         
         backup_options = st.multiselect(
             "Selecionar dados para backup:",
-            ["Usuários", "Pacientes", "Planos Alimentares", "Consultas", "Configurações", "Logs"],
+            list(DATASETS),
             default=["Usuários", "Pacientes", "Planos Alimentares", "Configurações"]
         )
         
         backup_name = st.text_input("Nome do backup", value=f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
         
-        include_media = st.checkbox("Incluir arquivos de mídia")
-        compress_backup = st.checkbox("Comprimir backup", value=True)
+        compression = st.selectbox("Compressão", list(COMPRESSIONS), format_func=lambda key: COMPRESSIONS[key][0])
         
         if st.button("🚀 Criar Backup", use_container_width=True):
-            with st.spinner("Criando backup..."):
-                # Simular criação de backup
-                import time
-                time.sleep(2)
-                st.success(f"✅ Backup '{backup_name}' criado com sucesso!")
+            if not backup_options:
+                st.error("Selecione pelo menos um tipo de dado para o backup.")
+            elif os.path.exists(repository.manifest_path(backup_name)):
+                st.error(f"Já existe um backup chamado '{backup_name}'.")
+            else:
+                submit_job('backup', 'backup', {'nome': backup_name, 'conjuntos': backup_options, 'compressao': compression}, priority='alta')
+        
+        job = show_job_result('backup')
+        if job:
+            totals = job['resultado']['totais']
+            st.success(
+                f"✅ Backup '{job['parametros']['nome']}' criado com sucesso! "
+                f"{format_bytes(totals['bytes'])} de dados, {format_bytes(totals['bytes_gravados'])} gravados "
+                f"({totals['blocos_novos']} de {totals['blocos']} blocos novos, escritas pausadas por {totals['pausa_ms']:.1f} ms)"
+            )
     
     with col2:
         st.markdown("#### 📥 Restaurar Backup")
-        
-        # Lista de backups disponíveis (simulada)
-        available_backups = [
-            {"name": "backup_20240904_030000", "date": "2024-09-04 03:00:00", "size": "25 MB"},
-            {"name": "backup_20240903_030000", "date": "2024-09-03 03:00:00", "size": "24 MB"},
-            {"name": "backup_20240902_030000", "date": "2024-09-02 03:00:00", "size": "23 MB"},
-            {"name": "manual_backup_20240901", "date": "2024-09-01 15:30:00", "size": "22 MB"}
-        ]
-        
-        backup_to_restore = st.selectbox(
-            "Selecionar backup:",
-            options=[b["name"] for b in available_backups],
-            format_func=lambda x: f"{x} | {next(b['date'] for b in available_backups if b['name'] == x)}"
-        )
-        
-        restore_options = st.multiselect(
-            "Selecionar dados para restaurar:",
-            ["Usuários", "Pacientes", "Planos Alimentares", "Consultas", "Configurações"],
-            default=[]
-        )
-        
-        if st.button("⚠️ Restaurar Backup", use_container_width=True, type="secondary"):
-            if restore_options:
-                st.warning("⚠️ Esta ação irá sobrescrever os dados atuais. Confirme para continuar.")
-                
-                col_cancel, col_confirm = st.columns(2)
-                
-                with col_cancel:
-                    if st.button("❌ Cancelar"):
-                        st.info("Operação cancelada.")
-                
-                with col_confirm:
-                    if st.button("✅ Confirmar Restauração"):
-                        with st.spinner("Restaurando backup..."):
-                            import time
-                            time.sleep(3)
-                            st.success("✅ Backup restaurado com sucesso!")
-            else:
-                st.error("Selecione pelo menos um tipo de dado para restaurar.")
+        show_restore_form(repository, backups)
     
     # Configurações de backup automático
     st.markdown("---")
+    show_backup_schedule()
+    
+    st.markdown("---")
+    show_patient_archive()
+
+def show_backup_schedule():
+    """Configurações do backup automático (frequência, horário e retenção)"""
     st.markdown("#### ⚙️ Configurações de Backup Automático")
     
+    admin = AdminManager()
+    frequency, settings = load_backup_settings(admin.config_file)
+    scheduler = get_backup_scheduler()
+    
+    next_run = scheduler.next_run()
+    if next_run:
+        st.caption(f"Próximo backup automático: {next_run.strftime('%d/%m/%Y %H:%M')}")
+    else:
+        st.caption("Backup automático desativado.")
+    
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        auto_backup = st.checkbox("Backup Automático Ativo", value=True)
-        backup_frequency = st.selectbox("Frequência", ["Diário", "Semanal", "Mensal"], index=0)
+        auto_backup = st.checkbox("Backup Automático Ativo", value=settings['automatico'])
+        backup_frequency = st.selectbox("Frequência", list(BACKUP_FREQUENCIES), index=list(BACKUP_FREQUENCIES).index(frequency),
+                                        format_func=BACKUP_FREQUENCIES.get, help="Semanal: domingos; mensal: dia 1")
     
     with col2:
-        backup_time = st.time_input("Horário do backup", value=datetime.strptime("03:00", "%H:%M").time())
-        retention_days = st.number_input("Manter backups por (dias)", min_value=7, max_value=365, value=30)
+        backup_time = st.time_input("Horário do backup", value=datetime.strptime(settings['horario'], "%H:%M").time())
+        retention_days = st.number_input("Manter backups por (dias)", min_value=7, max_value=365, value=int(settings['retencao_dias']))
     
     with col3:
-        backup_location = st.selectbox("Local do backup", ["Local", "Nuvem", "Ambos"])
-        email_on_backup = st.checkbox("Notificar por e-mail", value=True)
+        compression = st.selectbox("Compressão", list(COMPRESSIONS), index=list(COMPRESSIONS).index(settings['compressao']),
+                                   format_func=lambda key: COMPRESSIONS[key][0], key="auto_backup_compression")
+        email_on_backup = st.checkbox("Notificar por e-mail", value=settings['notificar_email'])
+    
+    datasets = st.multiselect("Dados incluídos no backup automático", list(DATASETS), default=settings['conjuntos'], key="auto_backup_datasets")
     
     if st.button("💾 Salvar Configurações de Backup", use_container_width=True):
+        if not datasets:
+            st.error("Selecione pelo menos um tipo de dado para o backup automático.")
+            return
+        
+        config = admin.load_config()
+        admin.save_config({
+            **config,
+            "backup_frequency": backup_frequency,
+            "backup": {
+                **config.get("backup", {}),
+                "automatico": auto_backup,
+                "horario": backup_time.strftime("%H:%M"),
+                "retencao_dias": int(retention_days),
+                "compressao": compression,
+                "conjuntos": datasets,
+                "notificar_email": email_on_backup
+            }
+        })
+        scheduler.wake()
         st.success("Configurações de backup atualizadas!")
 
+def show_patient_archive():
+    """Arquivamento dos pacientes inativos (configuração, estatísticas e execução manual)"""
+    st.markdown("#### 🗄️ Arquivo de Pacientes Inativos")
+    st.caption("Pacientes inativos há mais tempo que o limite saem dos arquivos em uso (com diário, evolução e planos) "
+               "e são comprimidos em data/archive/. Voltam automaticamente quando acessados.")
+    
+    admin = AdminManager()
+    settings = load_archive_settings(admin.config_file)
+    archive = get_archive()
+    
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.metric("Pacientes arquivados", len(archive))
+    
+    with col2:
+        st.metric("Tamanho do arquivo", format_bytes(archive.size()))
+    
+    with col3:
+        st.metric("Prontos para arquivar", len(archive.candidates(settings['dias_inativo'])))
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        archive_enabled = st.checkbox("Arquivamento diário automático", value=settings['ativo'])
+    
+    with col2:
+        inactive_days = st.number_input("Arquivar após (dias inativo)", min_value=1, max_value=3650,
+                                        value=int(settings['dias_inativo']), help=f"Padrão: {ARCHIVE_DEFAULTS['dias_inativo']} dias")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        if st.button("💾 Salvar Configurações de Arquivamento", use_container_width=True):
+            config = admin.load_config()
+            admin.save_config({**config, "arquivamento": {"ativo": archive_enabled, "dias_inativo": int(inactive_days)}})
+            st.success("Configurações de arquivamento atualizadas!")
+    
+    with col2:
+        if st.button("🗄️ Arquivar Agora", use_container_width=True):
+            submit_job('archive', 'arquivar_inativos', {'dias_inativo': int(inactive_days)}, priority='alta')
+    
+    job = show_job_result('archive')
+    if job:
+        result = job['resultado']
+        st.success(
+            f"✅ {result['pacientes']} pacientes arquivados ({result['planos']} planos, {result['dias_diario']} dias de diário), "
+            f"{format_bytes(result['bytes_arquivo'])} no arquivo."
+        )
+        if result.get('alterados_durante'):
+            st.caption(f"{result['alterados_durante']} pacientes alterados durante o arquivamento ficam para a próxima execução.")
+
 def show_admin_dashboard():
     """Dashboard principal do administrador"""
     st.markdown("""
@@ -523,5 +778,11 @@ def show_admin_dashboard():
     with tab5:
         show_backup_restore()
 
+# Inicializar estados da sessão
+if 'restore_plan' not in st.session_state:
+    st.session_state.restore_plan = None
+if 'restored_job' not in st.session_state:
+    st.session_state.restored_job = None
+
 if __name__ == "__main__":
     show_admin_dashboard()
\ No newline at end of file
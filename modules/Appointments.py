@@ -0,0 +1,338 @@
+# modules/appointments.py
+import streamlit as st
+import pandas as pd
+import json
+import os
+from datetime import datetime, date, time, timedelta
+from modules.Patient_management import PatientManager
+from core.appointments import (
+    get_appointment_book, ScheduleConflict, APPOINTMENT_DURATION,
+    APPOINTMENT_TYPES, APPOINTMENT_STATUSES
+)
+from core.availability import (
+    find_slots, load_working_hours, save_working_hours, parse_windows, format_windows,
+    WORKING_HOURS, WEEKDAYS, PREFERRED_PERIODS
+)
+
+USERS_FILE = 'data/users.json'
+
+# Locais de atendimento oferecidos no agendamento
+APPOINTMENT_LOCATIONS = ["Consultório - Sala 1", "Consultório - Sala 2", "Online"]
+
+def load_nutritionists():
+    """Nutricionistas cadastrados: {usuário: nome}"""
+    if not os.path.exists(USERS_FILE):
+        return {}
+    with open(USERS_FILE, 'r', encoding='utf-8') as f:
+        users = json.load(f)
+    return {
+        username: user.get('profile', {}).get('nome_completo') or username
+        for username, user in users.items()
+        if user.get('user_type', '').startswith('nutricionista') and user.get('status', 'ativo') == 'ativo'
+    }
+
+def current_nutritionist():
+    """Usuário logado, se for nutricionista"""
+    user = st.session_state.get('user') or {}
+    return user.get('username') if user.get('user_type', '').startswith('nutricionista') else None
+
+def format_appointment_time(appointment):
+    """Data e horário de uma consulta (dd/mm/aaaa hh:mm - hh:mm)"""
+    start, end = datetime.fromisoformat(appointment['inicio']), datetime.fromisoformat(appointment['fim'])
+    return f"{start:%d/%m/%Y %H:%M} - {end:%H:%M}"
+
+def appointments_table(appointments, nutritionists=None):
+    """Tabela de consultas para exibição"""
+    nutritionists = nutritionists or {}
+    return pd.DataFrame([{
+        'Data': datetime.fromisoformat(appointment['inicio']).strftime('%d/%m'),
+        'Horário': datetime.fromisoformat(appointment['inicio']).strftime('%H:%M'),
+        'Paciente': appointment.get('paciente', appointment.get('patient_id')),
+        'Nutricionista': nutritionists.get(appointment['nutricionista'], appointment['nutricionista']),
+        'Tipo': appointment.get('tipo', ""),
+        'Status': APPOINTMENT_STATUSES.get(appointment.get('status'), appointment.get('status'))
+    } for appointment in appointments], columns=['Data', 'Horário', 'Paciente', 'Nutricionista', 'Tipo', 'Status'])
+
+def show_conflicts(error, nutritionist, day):
+    """Explica o conflito e sugere os horários livres do dia"""
+    st.error(f"❌ {error}: " + "; ".join(
+        f"{appointment.get('paciente', appointment.get('patient_id'))} ({format_appointment_time(appointment)})"
+        for appointment in error.conflicts
+    ))
+    
+    opening = datetime.combine(day, time(8, 0))
+    free = [
+        (start, end) for start, end in get_appointment_book().free_intervals(nutritionist, opening, opening + timedelta(hours=10))
+        if (end - start) >= timedelta(minutes=APPOINTMENT_DURATION)
+    ]
+    if free:
+        st.info("🕒 Horários livres neste dia: " + ", ".join(f"{start:%H:%M}-{end:%H:%M}" for start, end in free))
+
+def load_active_patients():
+    """Pacientes ativos: {id: nome}"""
+    return {
+        patient_id: patient.get('nome', patient_id)
+        for patient_id, patient in PatientManager().load_patients().items()
+        if patient.get('status', 'ativo') == 'ativo'
+    }
+
+def show_appointment_form(key_prefix="appointment"):
+    """Formulário de agendamento de consulta"""
+    nutritionists = load_nutritionists()
+    patients = load_active_patients()
+    
+    if not nutritionists:
+        st.warning("Nenhum nutricionista cadastrado.")
+        return
+    if not patients:
+        st.warning("Nenhum paciente ativo cadastrado.")
+        return
+    
+    own = current_nutritionist()
+    options = list(nutritionists)
+    
+    with st.form(f"{key_prefix}_form", clear_on_submit=True):
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            patient_id = st.selectbox("Paciente", options=list(patients), format_func=patients.get, key=f"{key_prefix}_patient")
+            nutritionist = st.selectbox(
+                "Nutricionista",
+                options=options,
+                index=options.index(own) if own in options else 0,
+                format_func=nutritionists.get,
+                key=f"{key_prefix}_nutritionist"
+            )
+            appointment_type = st.selectbox("Tipo", APPOINTMENT_TYPES, key=f"{key_prefix}_type")
+        
+        with col2:
+            day = st.date_input("Data", value=date.today(), min_value=date.today(), key=f"{key_prefix}_date")
+            start_time = st.time_input("Horário", value=time(9, 0), step=timedelta(minutes=15), key=f"{key_prefix}_time")
+            duration = st.number_input("Duração (min)", min_value=15, max_value=180, value=APPOINTMENT_DURATION, step=15, key=f"{key_prefix}_duration")
+        
+        location = st.selectbox("Local", APPOINTMENT_LOCATIONS, key=f"{key_prefix}_location")
+        notes = st.text_area("Observações", key=f"{key_prefix}_notes")
+        
+        if st.form_submit_button("📅 Agendar", type="primary", use_container_width=True):
+            start = datetime.combine(day, start_time)
+            if start < datetime.now():
+                st.error("❌ Escolha um horário futuro.")
+                return
+            try:
+                appointment = get_appointment_book().book(
+                    patient_id, nutritionist, start, duration=int(duration),
+                    paciente=patients[patient_id], tipo=appointment_type, local=location, observacoes=notes
+                )
+            except ScheduleConflict as error:
+                show_conflicts(error, nutritionist, day)
+            else:
+                st.success(f"✅ Consulta agendada: {appointment['paciente']} em {format_appointment_time(appointment)}")
+
+def show_appointment_actions(appointment, key_prefix="appointment"):
+    """Botões de status de uma consulta"""
+    book = get_appointment_book()
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        if appointment['status'] == 'agendada' and st.button("✅ Confirmar", key=f"{key_prefix}_confirm_{appointment['id']}", use_container_width=True):
+            book.set_status(appointment['id'], 'confirmada')
+            st.rerun()
+    with col2:
+        if st.button("🏁 Realizada", key=f"{key_prefix}_done_{appointment['id']}", use_container_width=True):
+            book.set_status(appointment['id'], 'realizada')
+            st.rerun()
+    with col3:
+        if st.button("🚫 Faltou", key=f"{key_prefix}_missed_{appointment['id']}", use_container_width=True):
+            book.set_status(appointment['id'], 'faltou')
+            st.rerun()
+    with col4:
+        if st.button("❌ Cancelar", key=f"{key_prefix}_cancel_{appointment['id']}", use_container_width=True):
+            book.cancel(appointment['id'])
+            st.rerun()
+
+def show_reschedule_form(appointment, key_prefix="reschedule"):
+    """Formulário para remarcar uma consulta"""
+    current = datetime.fromisoformat(appointment['inicio'])
+    
+    with st.form(f"{key_prefix}_{appointment['id']}"):
+        col1, col2 = st.columns(2)
+        with col1:
+            day = st.date_input("Nova data", value=max(current.date(), date.today()), min_value=date.today(), key=f"{key_prefix}_{appointment['id']}_date")
+        with col2:
+            start_time = st.time_input("Novo horário", value=current.time(), step=timedelta(minutes=15), key=f"{key_prefix}_{appointment['id']}_time")
+        
+        if st.form_submit_button("📅 Remarcar", use_container_width=True):
+            try:
+                get_appointment_book().reschedule(appointment['id'], datetime.combine(day, start_time))
+            except ScheduleConflict as error:
+                show_conflicts(error, appointment['nutricionista'], day)
+            else:
+                st.success("✅ Consulta remarcada!")
+                st.rerun()
+
+def show_day_schedule(nutritionist=None, nutritionists=None):
+    """Agenda de um dia, com ações por consulta"""
+    day = st.date_input("Dia", value=date.today(), key="schedule_day")
+    appointments = get_appointment_book().on_day(day, nutritionist)
+    
+    if not appointments:
+        st.info("📭 Nenhuma consulta neste dia.")
+        return
+    
+    st.caption(f"{len(appointments)} consulta(s)")
+    for appointment in appointments:
+        name = (nutritionists or {}).get(appointment['nutricionista'], appointment['nutricionista'])
+        with st.expander(f"🕒 {format_appointment_time(appointment)} · {appointment['paciente']} · {appointment['tipo']} · {APPOINTMENT_STATUSES[appointment['status']]}"):
+            st.write(f"**Nutricionista:** {name}")
+            st.write(f"**Local:** {appointment.get('local') or '-'}")
+            if appointment.get('observacoes'):
+                st.write(f"**Observações:** {appointment['observacoes']}")
+            show_appointment_actions(appointment, key_prefix="day")
+            show_reschedule_form(appointment)
+
+def show_slot_search(nutritionists):
+    """Busca dos próximos horários livres entre vários nutricionistas"""
+    patients = load_active_patients()
+    if not nutritionists or not patients:
+        st.warning("Cadastre nutricionistas e pacientes para buscar horários.")
+        return
+    
+    with st.form("slot_search_form"):
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            patient_id = st.selectbox("Paciente", options=list(patients), format_func=patients.get, key="slot_patient")
+            selected = st.multiselect("Nutricionistas", options=list(nutritionists), default=list(nutritionists), format_func=nutritionists.get, key="slot_nutritionists")
+            periods = st.multiselect("Períodos preferidos", options=list(PREFERRED_PERIODS), format_func=lambda period: PREFERRED_PERIODS[period][0], key="slot_periods")
+        
+        with col2:
+            weekdays = st.multiselect("Dias preferidos", options=list(range(7)), format_func=lambda weekday: WEEKDAYS[weekday], key="slot_weekdays")
+            start_day = st.date_input("A partir de", value=date.today(), min_value=date.today(), key="slot_start")
+            duration = st.number_input("Duração (min)", min_value=15, max_value=180, value=APPOINTMENT_DURATION, step=15, key="slot_duration")
+        
+        count = st.slider("Quantidade de horários", 1, 30, 10, key="slot_count")
+        
+        if st.form_submit_button("🔎 Buscar", type="primary", use_container_width=True):
+            st.session_state.slot_search = {
+                'patient_id': patient_id,
+                'duration': int(duration),
+                'slots': find_slots(
+                    get_appointment_book(), selected, start=datetime.combine(start_day, time()), k=count,
+                    duration=int(duration), patient_id=patient_id, periods=periods or None, weekdays=set(weekdays) or None
+                )
+            }
+    
+    search = st.session_state.get('slot_search')
+    if not search:
+        return
+    if not search['slots']:
+        st.info("📭 Nenhum horário livre encontrado com essas preferências.")
+        return
+    
+    for i, (start, end, nutritionist) in enumerate(search['slots']):
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            st.write(f"**{WEEKDAYS[start.weekday()]} {start:%d/%m %H:%M}-{end:%H:%M}** · {nutritionists.get(nutritionist, nutritionist)}")
+        with col2:
+            if st.button("📅 Agendar", key=f"book_slot_{i}", use_container_width=True):
+                try:
+                    appointment = get_appointment_book().book(
+                        search['patient_id'], nutritionist, start, duration=search['duration'],
+                        paciente=patients.get(search['patient_id'], search['patient_id'])
+                    )
+                except ScheduleConflict as error:
+                    st.error(f"❌ {error}. Busque novamente.")
+                else:
+                    st.session_state.slot_search = None
+                    st.success(f"✅ Consulta agendada: {appointment['paciente']} em {format_appointment_time(appointment)}")
+
+def show_working_hours_editor(nutritionist, nutritionists):
+    """Edição do modelo semanal de atendimento de um nutricionista"""
+    template = load_working_hours().get(nutritionist, WORKING_HOURS)
+    
+    with st.expander(f"🕒 Horários de atendimento - {nutritionists.get(nutritionist, nutritionist)}"):
+        with st.form(f"working_hours_{nutritionist}"):
+            st.caption("Janelas por dia no formato 08:00-12:00, 13:00-18:00 (vazio = sem atendimento)")
+            texts = {
+                weekday: st.text_input(name, value=format_windows(template.get(weekday, [])), key=f"working_hours_{nutritionist}_{weekday}")
+                for weekday, name in enumerate(WEEKDAYS)
+            }
+            
+            if st.form_submit_button("💾 Salvar horários", use_container_width=True):
+                try:
+                    save_working_hours(nutritionist, {weekday: parse_windows(text) for weekday, text in texts.items()})
+                except ValueError as error:
+                    st.error(f"❌ {error}")
+                else:
+                    st.success("✅ Horários salvos!")
+
+def show_schedule():
+    """Agenda de consultas (nutricionistas e recepção)"""
+    st.markdown("""
+    <div style='background: linear-gradient(90deg, #4CAF50, #45a049); padding: 1rem; border-radius: 10px; margin-bottom: 2rem;'>
+        <h1 style='color: white; margin: 0;'>📅 Agenda</h1>
+        <p style='color: white; margin: 0; opacity: 0.9;'>Agende, remarque e acompanhe as consultas</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    nutritionists = load_nutritionists()
+    own = current_nutritionist()
+    
+    if own:
+        nutritionist = own if st.checkbox("Somente minha agenda", value=True) else None
+    else:
+        options = [None, *nutritionists]
+        nutritionist = st.selectbox("Nutricionista", options, format_func=lambda option: "Todos" if option is None else nutritionists.get(option, option))
+    
+    tab_labels = ["📅 Dia", "📋 Próximos 7 dias", "➕ Nova consulta", "🔎 Buscar horário"]
+    if st.session_state.get('current_page') == 'new_appointment':
+        tab_labels.insert(0, tab_labels.pop())
+    tabs = dict(zip(tab_labels, st.tabs(tab_labels)))
+    
+    with tabs["📅 Dia"]:
+        show_day_schedule(nutritionist, nutritionists)
+    
+    with tabs["📋 Próximos 7 dias"]:
+        upcoming = get_appointment_book().upcoming(nutritionist, days=7)
+        if upcoming:
+            st.dataframe(appointments_table(upcoming, nutritionists), use_container_width=True, hide_index=True)
+        else:
+            st.info("📭 Nenhuma consulta nos próximos 7 dias.")
+    
+    with tabs["➕ Nova consulta"]:
+        show_appointment_form()
+    
+    with tabs["🔎 Buscar horário"]:
+        show_slot_search(nutritionists)
+    
+    if nutritionist:
+        show_working_hours_editor(nutritionist, nutritionists)
+
+def show_my_appointments(patient_id):
+    """Consultas do paciente: próximas (com remarcação/cancelamento) e histórico"""
+    st.markdown("## 📅 Minhas Consultas")
+    book = get_appointment_book()
+    nutritionists = load_nutritionists()
+    upcoming = book.upcoming(patient_id=patient_id, days=365)
+    
+    if not upcoming:
+        st.info("📭 Você não tem consultas agendadas.")
+    
+    for appointment in upcoming:
+        with st.expander(f"📅 {format_appointment_time(appointment)} · {appointment['tipo']}", expanded=appointment is upcoming[0]):
+            st.write(f"**Nutricionista:** {nutritionists.get(appointment['nutricionista'], appointment['nutricionista'])}")
+            st.write(f"**Local:** {appointment.get('local') or '-'}")
+            st.write(f"**Status:** {APPOINTMENT_STATUSES[appointment['status']]}")
+            show_reschedule_form(appointment, key_prefix="my_reschedule")
+            if st.button("❌ Cancelar consulta", key=f"my_cancel_{appointment['id']}"):
+                book.cancel(appointment['id'])
+                st.rerun()
+    
+    history = [appointment for appointment in book.all() if appointment.get('patient_id') == patient_id and appointment not in upcoming]
+    if history:
+        with st.expander("📋 Histórico"):
+            st.dataframe(appointments_table(history, nutritionists), use_container_width=True, hide_index=True)
+
+# Inicializar estados da sessão
+if 'slot_search' not in st.session_state:
+    st.session_state.slot_search = None
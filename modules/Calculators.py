@@ -1,105 +1,227 @@
 # modules/calculators.py
 import streamlit as st
 import math
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+from core.formulas import (
+    calculate_bmr, calculate_tdee, calculate_bmi, get_bmi_category,
+    calculate_ideal_weight, calculate_macros, calculate_water_needs,
+    calculate_bmr_batch, calculate_tdee_batch, calculate_bmi_batch
+)
+from core.equations import (
+    BMR_EQUATIONS, BODY_FAT_EQUATIONS,
+    calculate_bmr_equation, calculate_body_fat_equation,
+    compare_bmr_equations_batch
+)
+from core.cache import memoize
+from modules.Charts import cached_figure
+from core.weight_dynamics import simulate_weight, sweep_intakes, weeks_to_goal
+from core.growth import (
+    GROWTH_DATA_DIR, PEDIATRIC_AGE_LIMIT_MONTHS, DAYS_PER_MONTH,
+    evaluate_growth_batch, classify_bmi_for_age, zscore_to_percentile, get_reference
+)
 
-def calculate_bmr(weight, height, age, sex):
-    """Calcula Taxa Metabólica Basal usando equação de Harris-Benedict revisada"""
-    if sex == "Masculino":
-        bmr = 88.362 + (13.397 * weight) + (4.799 * height) - (5.677 * age)
-    else:
-        bmr = 447.593 + (9.247 * weight) + (3.098 * height) - (4.330 * age)
-    
-    return round(bmr, 1)
+# Tamanho dos caches de resultados e de figuras das calculadoras
+RESULT_CACHE_SIZE = 256
+FIGURE_CACHE_SIZE = 64
 
-def calculate_tdee(bmr, activity_level):
-    """Calcula Gasto Energético Total Diário"""
-    activity_factors = {
-        "Sedentário": 1.2,
-        "Levemente ativo": 1.375,
-        "Moderadamente ativo": 1.55,
-        "Muito ativo": 1.725,
-        "Extremamente ativo": 1.9
-    }
+def age_in_years_batch(birth_dates, reference_date=None):
+    """Idade em anos completos (como get_age) para uma série de datas de nascimento"""
+    reference_date = pd.Timestamp(reference_date or pd.Timestamp.today().normalize())
+    birth = pd.to_datetime(birth_dates)
+    before_birthday = (birth.dt.month > reference_date.month) | ((birth.dt.month == reference_date.month) & (birth.dt.day > reference_date.day))
+    return (reference_date.year - birth.dt.year - before_birthday).to_numpy()
+
+def calculate_patient_metrics_batch(patients_df, activity_level="Sedentário", reference_date=None):
+    """Calcula IMC, TMB e GET para uma tabela de pacientes
+    
+    Espera as colunas do cadastro: peso (kg), altura (m), data_nascimento e sexo.
+    """
+    age = age_in_years_batch(patients_df['data_nascimento'], reference_date)
+    
+    weight = patients_df['peso'].to_numpy(dtype=float)
+    height = patients_df['altura'].to_numpy(dtype=float)
+    sex = patients_df['sexo'].to_numpy()
+    activity = patients_df['nivel_atividade'].to_numpy() if 'nivel_atividade' in patients_df else np.full(len(patients_df), activity_level, dtype=object)
+    
+    bmr = calculate_bmr_batch(weight, height * 100, age, sex)
+    
+    return pd.DataFrame({
+        'idade': age,
+        'imc': np.round(calculate_bmi_batch(weight, height), 1),
+        'tmb': np.round(bmr, 1),
+        'get': np.round(calculate_tdee_batch(bmr, activity), 1)
+    }, index=patients_df.index)
+
+def calculate_patient_equations_batch(patients_df, reference_date=None):
+    """Compara todas as equações de TMB para uma tabela de pacientes
+    
+    Usa gordura_corporal (%) quando disponível para as equações baseadas em massa magra.
+    Retorna uma coluna por equação (kcal/dia, NaN quando faltam dados).
+    """
+    # Cadastros incompletos geram NaN nas equações que dependem do campo ausente
+    data = patients_df.reindex(columns=['peso', 'altura', 'sexo', 'gordura_corporal', 'data_nascimento'])
+    
+    age = age_in_years_batch(data['data_nascimento'].fillna('1990-01-01'), reference_date)
+    
+    results = compare_bmr_equations_batch(
+        peso=pd.to_numeric(data['peso'], errors='coerce').to_numpy(dtype=float),
+        altura=pd.to_numeric(data['altura'], errors='coerce').to_numpy(dtype=float) * 100,
+        idade=age,
+        sexo=data['sexo'].to_numpy(),
+        gordura_corporal=pd.to_numeric(data['gordura_corporal'], errors='coerce').to_numpy(dtype=float)
+    )
+    
+    return pd.DataFrame(
+        {BMR_EQUATIONS[key]['nome']: np.round(values, 1) for key, values in results.items()},
+        index=patients_df.index
+    )
+
+@memoize(maxsize=FIGURE_CACHE_SIZE)
+def build_equation_comparison(bmr_by_equation):
+    """Tabela e gráfico de comparação das equações de TMB (memoizados)"""
+    comparison = pd.DataFrame({
+        'Equação': list(bmr_by_equation.keys()),
+        'TMB (kcal/dia)': list(bmr_by_equation.values())
+    }).dropna()
+    
+    if comparison.empty:
+        return comparison, None
+    
+    fig = px.bar(comparison, x='Equação', y='TMB (kcal/dia)', color_discrete_sequence=['#4CAF50'])
+    fig.add_hline(y=comparison['TMB (kcal/dia)'].mean(), line_dash="dash", annotation_text="Média")
+    return comparison, fig
+
+def calculate_patient_growth_batch(patients_df, reference_date=None):
+    """Escores-z e percentis (OMS) dos pacientes com menos de 19 anos
+    
+    Retorna uma linha por paciente pediátrico com idade em meses, escores-z e
+    percentis de IMC/idade, peso/idade e altura/idade e a classificação do IMC.
+    """
+    data = patients_df.reindex(columns=['peso', 'altura', 'sexo', 'data_nascimento'])
+    
+    reference_date = pd.Timestamp(reference_date or pd.Timestamp.today().normalize())
+    birth = pd.to_datetime(data['data_nascimento'].fillna('1990-01-01'))
+    age_months = ((reference_date - birth).dt.days / DAYS_PER_MONTH).to_numpy()
+    
+    pediatric = age_months < PEDIATRIC_AGE_LIMIT_MONTHS
+    data, age_months = data[pediatric], age_months[pediatric]
+    
+    results = evaluate_growth_batch(
+        age_months,
+        data['sexo'].to_numpy(),
+        pd.to_numeric(data['peso'], errors='coerce').to_numpy(dtype=float),
+        pd.to_numeric(data['altura'], errors='coerce').to_numpy(dtype=float) * 100
+    )
     
-    return round(bmr * activity_factors[activity_level], 1)
+    growth = pd.DataFrame({'idade_meses': np.round(age_months, 1)}, index=data.index)
+    for indicator, values in results.items():
+        growth[f'z_{indicator}'] = np.round(values['z'], 2)
+        growth[f'percentil_{indicator}'] = np.round(values['percentil'], 1)
+    
+    growth['classificacao_imc'] = [
+        classify_bmi_for_age(z, months)[0]
+        for z, months in zip(results['imc_idade']['z'], age_months)
+    ]
+    
+    return growth
 
-def calculate_bmi(weight, height):
-    """Calcula Índice de Massa Corporal"""
-    bmi = weight / (height ** 2)
-    return round(bmi, 1)
+@memoize(maxsize=RESULT_CACHE_SIZE)
+def classify_bmi(bmi, age_months=None, sex=None):
+    """Classifica o IMC: curvas OMS (z e percentil) para menores de 19 anos, pontos de corte adultos para os demais"""
+    if age_months is None or age_months >= PEDIATRIC_AGE_LIMIT_MONTHS:
+        category, color = get_bmi_category(bmi)
+        return {'categoria': category, 'cor': color, 'z': None, 'percentil': None}
+    
+    z = get_reference().zscore('imc_idade', [bmi], [age_months], [sex])
+    category, color = classify_bmi_for_age(z[0], age_months)
+    
+    if np.isnan(z[0]):
+        return {'categoria': category, 'cor': color, 'z': None, 'percentil': None}
+    
+    percentile = zscore_to_percentile(z)[0]
+    return {'categoria': category, 'cor': color, 'z': round(float(z[0]), 2), 'percentil': round(float(percentile), 1)}
 
-def get_bmi_category(bmi):
-    """Retorna categoria do IMC"""
-    if bmi < 18.5:
-        return "Abaixo do peso", "blue"
-    elif bmi < 25:
-        return "Peso normal", "green"
-    elif bmi < 30:
-        return "Sobrepeso", "orange"
-    else:
-        return "Obesidade", "red"
+def show_growth_reference_notice():
+    """Avisa quando as curvas de crescimento usam a tabela embutida aproximada e mostra a origem das tabelas"""
+    reference = get_reference()
+    approximate = reference.approximate_indicators()
+    if approximate:
+        st.warning(
+            f"⚠️ Curvas aproximadas ({', '.join(approximate)}): escores-z e percentis são estimativas a partir de "
+            f"nós anuais, não os valores oficiais da OMS. Para uso clínico, coloque as tabelas LMS oficiais em {GROWTH_DATA_DIR}/."
+        )
+    st.caption("Fontes: " + "; ".join(f"{source} - {', '.join(names)}" for source, names in reference.source_summary().items()))
 
-def calculate_ideal_weight(height, sex):
-    """Calcula peso ideal usando diferentes fórmulas"""
-    height_cm = height * 100
-    
-    # Fórmula de Robinson (1983)
-    if sex == "Masculino":
-        robinson = 52 + (1.9 * (height_cm - 152.4) / 2.54)
-    else:
-        robinson = 49 + (1.7 * (height_cm - 152.4) / 2.54)
-    
-    # Fórmula de Miller (1983)
-    if sex == "Masculino":
-        miller = 56.2 + (1.41 * (height_cm - 152.4) / 2.54)
-    else:
-        miller = 53.1 + (1.36 * (height_cm - 152.4) / 2.54)
-    
-    # Fórmula de Devine (1974)
-    if sex == "Masculino":
-        devine = 50 + (2.3 * (height_cm - 152.4) / 2.54)
-    else:
-        devine = 45.5 + (2.3 * (height_cm - 152.4) / 2.54)
+def show_equation_comparison(bmr_by_equation, key_prefix="equations"):
+    """Exibe tabela e gráfico comparando as equações de TMB"""
+    comparison, fig = build_equation_comparison(bmr_by_equation)
     
-    return {
-        "Robinson": round(robinson, 1),
-        "Miller": round(miller, 1),
-        "Devine": round(devine, 1)
-    }
+    if fig is None:
+        st.info("Dados insuficientes para comparar as equações.")
+        return
+    
+    st.dataframe(comparison, use_container_width=True, hide_index=True)
+    st.plotly_chart(fig, use_container_width=True, key=f"{key_prefix}_chart")
 
-def calculate_macros(calories, carb_percent, protein_percent, fat_percent):
-    """Calcula distribuição de macronutrientes"""
-    carb_calories = calories * (carb_percent / 100)
-    protein_calories = calories * (protein_percent / 100)
-    fat_calories = calories * (fat_percent / 100)
+@memoize(maxsize=RESULT_CACHE_SIZE)
+def compute_bmr_results(weight, height, age, sex, activity_level, equation_key, body_fat=None):
+    """TMB, GET e comparação entre equações (memoizados pelas entradas)"""
+    inputs = dict(peso=weight, altura=height, idade=age, sexo=sex, gordura_corporal=body_fat)
+    bmr = calculate_bmr_equation(equation_key, **inputs)
     
-    carb_grams = carb_calories / 4  # 4 kcal/g
-    protein_grams = protein_calories / 4  # 4 kcal/g
-    fat_grams = fat_calories / 9  # 9 kcal/g
+    comparison = compare_bmr_equations_batch(**inputs)
     
     return {
-        "carboidratos": round(carb_grams, 1),
-        "proteinas": round(protein_grams, 1),
-        "gorduras": round(fat_grams, 1)
+        'bmr': bmr,
+        'tdee': calculate_tdee(bmr, activity_level),
+        'comparison': {BMR_EQUATIONS[key]['nome']: round(float(values[0]), 1) for key, values in comparison.items()}
     }
 
-def calculate_water_needs(weight, activity_level):
-    """Calcula necessidade hídrica"""
-    base_water = weight * 35  # 35ml por kg de peso
-    
-    activity_factors = {
-        "Sedentário": 1.0,
-        "Levemente ativo": 1.1,
-        "Moderadamente ativo": 1.2,
-        "Muito ativo": 1.3,
-        "Extremamente ativo": 1.4
-    }
+@memoize(maxsize=RESULT_CACHE_SIZE)
+def compute_ideal_weight(height, sex):
+    """Peso ideal por fórmula e média (memoizados pelas entradas)"""
+    ideal_weights = calculate_ideal_weight(height, sex)
+    return ideal_weights, sum(ideal_weights.values()) / len(ideal_weights)
+
+@memoize(maxsize=RESULT_CACHE_SIZE)
+def compute_macros(calories, carb_percent, protein_percent, fat_percent):
+    """Macronutrientes em gramas (memoizados pelas entradas)"""
+    return calculate_macros(calories, carb_percent, protein_percent, fat_percent)
+
+def build_macro_pie(carb_percent, protein_percent, fat_percent):
+    """Gráfico de pizza da distribuição de macronutrientes"""
+    return px.pie(
+        values=[carb_percent, protein_percent, fat_percent],
+        names=['Carboidratos', 'Proteínas', 'Gorduras'],
+        color_discrete_sequence=['#FF9999', '#66B2FF', '#99FF99'],
+        title="Distribuição de Macronutrientes"
+    )
+
+@memoize(maxsize=RESULT_CACHE_SIZE)
+def compute_water_needs(weight, activity_level, climate):
+    """Necessidade hídrica ajustada pelo clima (memoizada pelas entradas)"""
+    climate_factors = {"Temperado": 1.0, "Quente": 1.2, "Muito quente": 1.4}
+    return calculate_water_needs(weight, activity_level) * climate_factors[climate]
+
+@memoize(maxsize=RESULT_CACHE_SIZE)
+def compute_body_fat_results(equation_key, weight, inputs):
+    """Percentual de gordura, massa magra e TMB por massa magra (memoizados)"""
+    body_fat = calculate_body_fat_equation(equation_key, **inputs)
+    
+    if math.isnan(body_fat):
+        return None
+    
+    body_fat = max(0, min(50, body_fat))  # Limitar entre 0-50%
+    lean_mass = weight * (1 - body_fat / 100)
     
-    total_water = base_water * activity_factors[activity_level]
-    return round(total_water, 0)
+    return {
+        'body_fat': body_fat,
+        'lean_mass': lean_mass,
+        'bmr': calculate_bmr_equation('katch_mcardle', massa_magra=lean_mass)
+    }
 
 def show_bmr_calculator():
     """Calculadora de TMB e GET"""
@@ -115,6 +237,25 @@ def show_bmr_calculator():
         age = st.number_input("Idade (anos)", min_value=10, max_value=120, value=30)
         sex = st.selectbox("Sexo", ["Masculino", "Feminino"])
     
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        equation_key = st.selectbox(
+            "Equação",
+            list(BMR_EQUATIONS.keys()),
+            format_func=lambda key: BMR_EQUATIONS[key]['nome']
+        )
+    
+    with col2:
+        body_fat = st.number_input(
+            "Gordura corporal (%)",
+            min_value=0.0,
+            max_value=70.0,
+            value=0.0,
+            step=0.1,
+            help="Opcional. Necessário para Katch-McArdle e Cunningham (massa magra)."
+        )
+    
     activity_level = st.selectbox(
         "Nível de Atividade Física",
         ["Sedentário", "Levemente ativo", "Moderadamente ativo", "Muito ativo", "Extremamente ativo"],
@@ -122,9 +263,14 @@ def show_bmr_calculator():
     )
     
     if st.button("Calcular TMB e GET", use_container_width=True):
-        height_m = height / 100
-        bmr = calculate_bmr(weight, height, age, sex)
-        tdee = calculate_tdee(bmr, activity_level)
+        try:
+            results = compute_bmr_results(weight, height, age, sex, activity_level, equation_key, body_fat or None)
+        except ValueError:
+            st.error("❌ Informe o percentual de gordura corporal para usar esta equação.")
+            return
+        
+        bmr = results['bmr']
+        tdee = results['tdee']
         
         # Resultados
         col1, col2, col3 = st.columns(3)
@@ -163,6 +309,92 @@ def show_bmr_calculator():
             maintenance_min = tdee - 100
             maintenance_max = tdee + 100
             st.write(f"Faixa ideal: {maintenance_min:.0f} - {maintenance_max:.0f} kcal/dia")
+        
+        # Comparação entre equações
+        st.markdown("#### ⚖️ Comparação entre Equações")
+        
+        show_equation_comparison(results['comparison'], key_prefix="bmr_calculator")
+    
+    st.divider()
+    show_weight_projection(weight, height, age, sex, activity_level, body_fat or None)
+
+# Cenários de ingestão (kcal em relação ao GET) exibidos na projeção
+PROJECTION_SCENARIOS = {
+    "Déficit agressivo (-750)": -750,
+    "Déficit moderado (-500)": -500,
+    "Manutenção": 0,
+    "Ganho lento (+300)": 300,
+    "Ganho rápido (+500)": 500
+}
+
+# Número de cenários de ingestão na varredura
+PROJECTION_SWEEP_STEPS = 300
+
+@memoize(maxsize=FIGURE_CACHE_SIZE)
+def build_weight_projection(weight, height, age, sex, activity_level, goal_weight, weeks, body_fat=None):
+    """Trajetórias de peso por cenário e curva ingestão × semanas até a meta (memoizadas)"""
+    tdee = calculate_tdee(calculate_bmr(weight, height, age, sex), activity_level)
+    intakes = [tdee + delta for delta in PROJECTION_SCENARIOS.values()]
+    
+    simulation = simulate_weight(weight, height, age, sex, activity_level, intakes, weeks, body_fat)
+    
+    trajectories = go.Figure()
+    for name, intake, trajectory in zip(PROJECTION_SCENARIOS, intakes, simulation['peso']):
+        trajectories.add_trace(go.Scatter(
+            x=simulation['semanas'],
+            y=trajectory,
+            mode='lines',
+            name=f"{name}: {intake:.0f} kcal"
+        ))
+    trajectories.add_hline(y=goal_weight, line_dash="dash", annotation_text="Meta")
+    trajectories.update_layout(title="Projeção de Peso", xaxis_title="Semanas", yaxis_title="Peso (kg)")
+    
+    sweep = sweep_intakes(
+        weight, height, age, sex, activity_level, goal_weight,
+        max(800, tdee - 1200), tdee + 1000,
+        steps=PROJECTION_SWEEP_STEPS, weeks=weeks, body_fat=body_fat
+    )
+    
+    reachable = ~np.isnan(sweep['semanas_meta'])
+    sweep_fig = px.line(
+        x=sweep['ingestao'][reachable],
+        y=sweep['semanas_meta'][reachable],
+        labels={'x': 'Ingestão diária (kcal)', 'y': 'Semanas até a meta'},
+        title="Ingestão × Semanas até a Meta",
+        color_discrete_sequence=['#4CAF50']
+    )
+    sweep_fig.add_vline(x=tdee, line_dash="dot", annotation_text="GET")
+    
+    summary = pd.DataFrame({
+        'Cenário': list(PROJECTION_SCENARIOS.keys()),
+        'Ingestão (kcal/dia)': np.round(intakes, 0),
+        'Peso final (kg)': np.round(simulation['peso'][:, -1], 1),
+        'Semanas até a meta': pd.array(
+            [None if np.isnan(week) else int(week) for week in weeks_to_goal(simulation['peso'], weight, goal_weight)],
+            dtype="Int64"
+        )
+    })
+    
+    return trajectories, sweep_fig, summary
+
+def show_weight_projection(weight, height, age, sex, activity_level, body_fat=None):
+    """Projeção da evolução do peso para diferentes ingestões"""
+    st.markdown("#### 📉 Projeção de Peso")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        goal_weight = st.number_input("Peso meta (kg)", min_value=20.0, max_value=300.0, value=round(max(20.0, weight - 5), 1), step=0.5, key="projection_goal")
+    
+    with col2:
+        weeks = st.slider("Horizonte (semanas)", min_value=4, max_value=104, value=26, key="projection_weeks")
+    
+    trajectories, sweep_fig, summary = build_weight_projection(weight, height, age, sex, activity_level, goal_weight, weeks, body_fat)
+    
+    st.plotly_chart(trajectories, use_container_width=True, key="projection_trajectories")
+    st.dataframe(summary, use_container_width=True, hide_index=True)
+    st.plotly_chart(sweep_fig, use_container_width=True, key="projection_sweep")
+    st.caption("Modelo de balanço energético (massa gorda e magra, regra de Forbes, termogênese adaptativa). Estimativa; acompanhe a evolução real do paciente.")
 
 def show_bmi_calculator():
     """Calculadora de IMC"""
@@ -171,18 +403,25 @@ def show_bmi_calculator():
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        weight = st.number_input("Peso (kg)", min_value=20.0, max_value=300.0, value=70.0, step=0.1, key="bmi_weight")
+        weight = st.number_input("Peso (kg)", min_value=2.0, max_value=300.0, value=70.0, step=0.1, key="bmi_weight")
+        age = st.number_input("Idade (anos)", min_value=0.0, max_value=120.0, value=30.0, step=0.5, key="bmi_age")
     
     with col2:
-        height = st.number_input("Altura (m)", min_value=1.0, max_value=2.5, value=1.70, step=0.01, key="bmi_height")
+        height = st.number_input("Altura (m)", min_value=0.45, max_value=2.5, value=1.70, step=0.01, key="bmi_height")
+        sex = st.selectbox("Sexo", ["Masculino", "Feminino"], key="bmi_sex")
     
     with col3:
         if st.button("Calcular IMC", use_container_width=True):
             bmi = calculate_bmi(weight, height)
-            category, color = get_bmi_category(bmi)
+            classification = classify_bmi(bmi, age * 12, sex)
             
             st.metric("Seu IMC", f"{bmi}")
-            st.markdown(f"**Classificação:** <span style='color: {color}'>{category}</span>", unsafe_allow_html=True)
+            st.markdown(f"**Classificação:** <span style='color: {classification['cor']}'>{classification['categoria']}</span>", unsafe_allow_html=True)
+            
+            if classification['z'] is not None:
+                st.metric("Escore-z IMC/idade", f"{classification['z']:+.2f}", f"Percentil {classification['percentil']:.0f}", delta_color="off")
+                st.caption("Menores de 19 anos: classificação pelas curvas de IMC para idade da OMS.")
+                show_growth_reference_notice()
     
     # Tabela de referência IMC
     st.markdown("#### 📊 Tabela de Referência IMC")
@@ -207,7 +446,7 @@ def show_ideal_weight_calculator():
     
     with col2:
         if st.button("Calcular Peso Ideal", use_container_width=True):
-            ideal_weights = calculate_ideal_weight(height, sex)
+            ideal_weights, average_weight = compute_ideal_weight(height, sex)
             
             st.markdown("#### 📊 Resultados por Fórmula")
             
@@ -215,7 +454,6 @@ def show_ideal_weight_calculator():
                 st.metric(f"Fórmula de {formula}", f"{weight} kg")
             
             # Média das fórmulas
-            average_weight = sum(ideal_weights.values()) / len(ideal_weights)
             st.metric("**Peso Ideal Médio**", f"{average_weight:.1f} kg")
     
     # Informações sobre as fórmulas
@@ -257,7 +495,7 @@ def show_macro_calculator():
     
     with col2:
         if total_percent == 100:
-            macros = calculate_macros(calories, carb_percent, protein_percent, fat_percent)
+            macros = compute_macros(calories, carb_percent, protein_percent, fat_percent)
             
             st.markdown("#### 📊 Resultado em Gramas")
             
@@ -266,12 +504,7 @@ def show_macro_calculator():
             st.metric("Gorduras", f"{macros['gorduras']} g", f"{fat_percent}%")
             
             # Gráfico de pizza
-            fig = px.pie(
-                values=[carb_percent, protein_percent, fat_percent],
-                names=['Carboidratos', 'Proteínas', 'Gorduras'],
-                color_discrete_sequence=['#FF9999', '#66B2FF', '#99FF99'],
-                title="Distribuição de Macronutrientes"
-            )
+            fig = cached_figure(build_macro_pie, carb_percent, protein_percent, fat_percent)
             
             st.plotly_chart(fig, use_container_width=True)
     
@@ -309,14 +542,10 @@ def show_water_calculator():
         )
         
         climate = st.selectbox("Clima", ["Temperado", "Quente", "Muito quente"])
-        
+    
     with col2:
         if st.button("Calcular Necessidade Hídrica", use_container_width=True):
-            water_ml = calculate_water_needs(weight, activity_level)
-            
-            # Ajuste por clima
-            climate_factors = {"Temperado": 1.0, "Quente": 1.2, "Muito quente": 1.4}
-            water_ml *= climate_factors[climate]
+            water_ml = compute_water_needs(weight, activity_level, climate)
             
             water_liters = water_ml / 1000
             glasses = water_ml / 200  # Considerando copo de 200ml
@@ -337,7 +566,10 @@ def show_body_fat_calculator():
     """Calculadora de percentual de gordura corporal"""
     st.markdown("### 📊 Calculadora de Gordura Corporal")
     
-    method = st.selectbox("Método de Cálculo", ["Fórmula do Exército Americano", "Fórmula da Marinha"])
+    method = st.selectbox(
+        "Método de Cálculo",
+        ["Fórmula do Exército Americano", "Fórmula da Marinha", "Jackson-Pollock 3 dobras", "Jackson-Pollock 7 dobras"]
+    )
     
     col1, col2 = st.columns(2)
     
@@ -345,22 +577,43 @@ def show_body_fat_calculator():
         sex = st.selectbox("Sexo", ["Masculino", "Feminino"], key="bf_sex")
         weight = st.number_input("Peso (kg)", min_value=20.0, max_value=300.0, value=70.0, key="bf_weight")
         height = st.number_input("Altura (cm)", min_value=100.0, max_value=250.0, value=170.0, key="bf_height")
+        age = st.number_input("Idade (anos)", min_value=10, max_value=120, value=30, key="bf_age")
         
-        if method == "Fórmula do Exército Americano":
+        if method.startswith("Jackson-Pollock"):
+            # Dobras cutâneas (mm) de cada protocolo
+            if method == "Jackson-Pollock 7 dobras":
+                equation_key, input_name = "jackson_pollock_7", "dobras_7"
+                sites = ["Peitoral", "Axilar média", "Tríceps", "Subescapular", "Abdominal", "Suprailíaca", "Coxa"]
+            else:
+                equation_key, input_name = "jackson_pollock_3", "dobras_3"
+                sites = ["Peitoral", "Abdominal", "Coxa"] if sex == "Masculino" else ["Tríceps", "Suprailíaca", "Coxa"]
+            
+            skinfolds = [
+                st.number_input(f"Dobra {site} (mm)", min_value=1.0, max_value=80.0, value=15.0, step=0.5, key=f"bf_{input_name}_{site}")
+                for site in sites
+            ]
+            inputs = {input_name: sum(skinfolds), 'idade': age, 'sexo': sex}
+        else:
+            equation_key = "marinha_americana"
             waist = st.number_input("Circunferência da Cintura (cm)", min_value=50.0, max_value=200.0, value=80.0)
+            neck = st.number_input("Circunferência do Pescoço (cm)", min_value=20.0, max_value=60.0, value=35.0)
+            inputs = {'cintura': waist, 'pescoco': neck, 'altura': height, 'sexo': sex}
             if sex == "Feminino":
-                hip = st.number_input("Circunferência do Quadril (cm)", min_value=60.0, max_value=200.0, value=90.0)
-                neck = st.number_input("Circunferência do Pescoço (cm)", min_value=20.0, max_value=60.0, value=35.0)
+                inputs['quadril'] = st.number_input("Circunferência do Quadril (cm)", min_value=60.0, max_value=200.0, value=90.0)
     
     with col2:
         if st.button("Calcular Gordura Corporal", use_container_width=True):
-            # Cálculo simplificado (fórmulas completas seriam mais complexas)
-            if sex == "Masculino":
-                body_fat = 86.010 * math.log10(waist - neck) - 70.041 * math.log10(height) + 36.76
-            else:
-                body_fat = 163.205 * math.log10(waist + hip - neck) - 97.684 * math.log10(height) - 78.387
+            try:
+                results = compute_body_fat_results(equation_key, weight, inputs)
+            except ValueError as e:
+                st.error(f"❌ Medidas inválidas: {e}")
+                return
             
-            body_fat = max(0, min(50, body_fat))  # Limitar entre 0-50%
+            if results is None:
+                st.error("❌ Medidas inválidas: verifique as circunferências informadas.")
+                return
+            
+            body_fat = results['body_fat']
             
             st.metric("Percentual de Gordura", f"{body_fat:.1f}%")
             
@@ -389,6 +642,11 @@ def show_body_fat_calculator():
                     category = "Obesidade"
             
             st.markdown(f"**Classificação:** {category}")
+            
+            # Composição corporal e TMB por massa magra
+            st.metric("Massa Magra", f"{results['lean_mass']:.1f} kg")
+            st.caption(f"Equação: {BODY_FAT_EQUATIONS[equation_key]['nome']}")
+            st.metric("TMB (Katch-McArdle)", f"{results['bmr']:.0f} kcal/dia")
 
 def show_calculators():
     """Função principal das calculadoras"""
@@ -0,0 +1,33 @@
+# modules/charts.py
+import json
+import plotly.graph_objects as go
+from core.cache import LRUCache, fingerprint, register_cache
+
+# Figuras serializadas (JSON) mantidas em memória
+FIGURE_JSON_CACHE_SIZE = 128
+
+_FIGURE_CACHE = register_cache("modules.Charts.figuras", LRUCache(FIGURE_JSON_CACHE_SIZE))
+
+def figure_key(builder, *data, **params):
+    """Chave da figura: função construtora + hash dos dados e parâmetros de layout"""
+    return f"{builder.__module__}.{builder.__qualname__}", fingerprint(data, params)
+
+def cached_figure(builder, *data, **params):
+    """Figura de builder(*data, **params), servida do cache se os dados não mudaram
+    
+    O cache guarda o JSON da figura; cada chamada devolve uma figura nova,
+    então quem a recebe pode alterá-la sem afetar o cache.
+    """
+    key = figure_key(builder, *data, **params)
+    spec = _FIGURE_CACHE.get(key)
+    
+    if spec is None:
+        spec = builder(*data, **params).to_json()
+        _FIGURE_CACHE.put(key, spec)
+    
+    # O JSON veio de uma figura já validada; revalidar custaria quase tanto quanto construí-la
+    return go.Figure(json.loads(spec), _validate=False)
+
+def clear_figure_cache():
+    """Esvazia o cache de figuras"""
+    _FIGURE_CACHE.clear()
@@ -0,0 +1,197 @@
+# modules/dietary_reference.py
+import numpy as np
+import pandas as pd
+import json
+import os
+from datetime import datetime, date
+from core.formats import load_data
+
+# Nutrientes avaliados (mesma ordem do vetor nutricional dos planos)
+DRI_NUTRIENTS = ['calorias', 'carboidratos', 'proteinas', 'gorduras', 'fibras']
+
+# Ingestão Dietética de Referência (IOM) por sexo e faixa etária
+# RDA/AI em g/dia; AMDR em % da energia total
+DRI_TABLE = [
+    # sexo, idade_min, idade_max, carboidratos, proteinas, fibras, amdr_carb, amdr_prot, amdr_gord
+    ("Masculino", 1, 4, 130, 13, 19, (45, 65), (5, 20), (30, 40)),
+    ("Masculino", 4, 9, 130, 19, 25, (45, 65), (10, 30), (25, 35)),
+    ("Masculino", 9, 14, 130, 34, 31, (45, 65), (10, 30), (25, 35)),
+    ("Masculino", 14, 19, 130, 52, 38, (45, 65), (10, 30), (25, 35)),
+    ("Masculino", 19, 51, 130, 56, 38, (45, 65), (10, 35), (20, 35)),
+    ("Masculino", 51, 200, 130, 56, 30, (45, 65), (10, 35), (20, 35)),
+    ("Feminino", 1, 4, 130, 13, 19, (45, 65), (5, 20), (30, 40)),
+    ("Feminino", 4, 9, 130, 19, 25, (45, 65), (10, 30), (25, 35)),
+    ("Feminino", 9, 14, 130, 34, 26, (45, 65), (10, 30), (25, 35)),
+    ("Feminino", 14, 19, 130, 46, 26, (45, 65), (10, 30), (25, 35)),
+    ("Feminino", 19, 51, 130, 46, 25, (45, 65), (10, 35), (20, 35)),
+    ("Feminino", 51, 200, 130, 46, 21, (45, 65), (10, 35), (20, 35))
+]
+
+# Energia por grama de macronutriente
+KCAL_PER_GRAM = {'carboidratos': 4, 'proteinas': 4, 'gorduras': 9}
+
+# Abaixo desta fração da meta o nutriente é considerado deficiente
+DEFICIENCY_THRESHOLD = 0.7
+
+# Tolerância da meta calórica (fração)
+ENERGY_TOLERANCE = 0.1
+
+COMPLIANCE_FILE = 'data/dri_compliance.json'
+
+def build_reference_arrays():
+    """Converte a tabela de referência em arrays indexados por sexo"""
+    arrays = {}
+    for sex in ("Masculino", "Feminino"):
+        rows = [row for row in DRI_TABLE if row[0] == sex]
+        arrays[sex] = {
+            'idade_min': np.array([row[1] for row in rows], dtype=float),
+            'rda': np.array([[row[3], row[4], row[5]] for row in rows], dtype=float),
+            'amdr': np.array([[row[6], row[7], row[8]] for row in rows], dtype=float)
+        }
+    return arrays
+
+REFERENCE_ARRAYS = build_reference_arrays()
+
+def get_age(birth_date, reference_date=None):
+    """Calcula idade em anos a partir da data de nascimento (ISO)"""
+    reference_date = reference_date or date.today()
+    birth = datetime.fromisoformat(birth_date).date() if isinstance(birth_date, str) else birth_date
+    return reference_date.year - birth.year - ((reference_date.month, reference_date.day) < (birth.month, birth.day))
+
+def lookup_targets(ages, sexes):
+    """Retorna metas RDA/AI (n, 3) e faixas AMDR (n, 3, 2) para cada paciente"""
+    ages = np.asarray(ages, dtype=float)
+    sexes = np.asarray(sexes, dtype=object)
+    n = len(ages)
+    
+    rda = np.zeros((n, 3))
+    amdr = np.zeros((n, 3, 2))
+    
+    for sex, reference in REFERENCE_ARRAYS.items():
+        # Pacientes com sexo diferente de "Masculino" usam a referência feminina
+        mask = sexes == "Masculino" if sex == "Masculino" else sexes != "Masculino"
+        if not mask.any():
+            continue
+        
+        group = np.searchsorted(reference['idade_min'], ages[mask], side='right') - 1
+        group = np.clip(group, 0, len(reference['idade_min']) - 1)
+        rda[mask] = reference['rda'][group]
+        amdr[mask] = reference['amdr'][group]
+    
+    return rda, amdr
+
+def amdr_score(percent, ranges):
+    """Pontua (0-1) o percentual de energia em relação à faixa AMDR"""
+    low, high = ranges[..., 0], ranges[..., 1]
+    below = np.clip((low - percent) / low, 0, 1)
+    above = np.clip((percent - high) / high, 0, 1)
+    return 1 - np.maximum(below, above)
+
+def evaluate_compliance_batch(nutrients, ages, sexes, target_calories):
+    """Avalia a adequação de vários planos às DRIs em uma única computação
+    
+    nutrients: array (n, 5) na ordem de DRI_NUTRIENTS
+    """
+    nutrients = np.atleast_2d(np.asarray(nutrients, dtype=float))
+    target_calories = np.asarray(target_calories, dtype=float)
+    rda, amdr = lookup_targets(ages, sexes)
+    
+    calories = nutrients[:, 0]
+    carbs, proteins, fats, fiber = nutrients[:, 1], nutrients[:, 2], nutrients[:, 3], nutrients[:, 4]
+    
+    # Adequação às metas RDA/AI (carboidratos, proteínas, fibras)
+    intake = np.column_stack([carbs, proteins, fiber])
+    rda_ratio = np.divide(intake, rda, out=np.zeros_like(intake), where=rda > 0)
+    rda_scores = np.clip(rda_ratio, 0, 1)
+    
+    # Distribuição de energia (AMDR)
+    macro_kcal = np.column_stack([
+        carbs * KCAL_PER_GRAM['carboidratos'],
+        proteins * KCAL_PER_GRAM['proteinas'],
+        fats * KCAL_PER_GRAM['gorduras']
+    ])
+    total_kcal = macro_kcal.sum(axis=1, keepdims=True)
+    energy_percent = np.divide(macro_kcal * 100, total_kcal, out=np.zeros_like(macro_kcal), where=total_kcal > 0)
+    amdr_scores = amdr_score(energy_percent, amdr)
+    
+    # Energia em relação à meta do plano
+    energy_ratio = np.divide(calories, target_calories, out=np.zeros_like(calories), where=target_calories > 0)
+    energy_score = 1 - np.clip((np.abs(energy_ratio - 1) - ENERGY_TOLERANCE) / (1 - ENERGY_TOLERANCE), 0, 1)
+    
+    scores = np.column_stack([energy_score, rda_scores, amdr_scores])
+    deficient = rda_ratio < DEFICIENCY_THRESHOLD
+    
+    return {
+        'rda': rda,
+        'rda_ratio': rda_ratio,
+        'energy_percent': energy_percent,
+        'amdr': amdr,
+        'energy_ratio': energy_ratio,
+        'score': np.round(scores.mean(axis=1) * 100, 1),
+        'deficient': deficient,
+        'is_deficient': deficient.any(axis=1)
+    }
+
+def evaluate_plan_compliance(plan_data, patient_data, reference_date=None):
+    """Avalia a adequação de um plano às DRIs do paciente"""
+    result = evaluate_compliance_batch(
+        [[plan_data.get('total_nutrition', {}).get(key, 0) for key in DRI_NUTRIENTS]],
+        [get_age(patient_data.get('data_nascimento', '1990-01-01'), reference_date)],
+        [patient_data.get('sexo', 'Feminino')],
+        [plan_data.get('target_calories', 0)]
+    )
+    return {key: value[0] for key, value in result.items()}
+
+def evaluate_active_plans(plans, patients, reference_date=None):
+    """Avalia todos os planos ativos e retorna tabela com pontuação e deficiências"""
+    rows = [
+        (plan_id, plan_data, patients[plan_data.get('patient_id')])
+        for plan_id, plan_data in plans.items()
+        if plan_data.get('status', 'ativo') == 'ativo' and plan_data.get('patient_id') in patients
+    ]
+    
+    columns = ['plan_id', 'patient_id', 'score', 'deficiente', 'nutrientes_deficientes']
+    if not rows:
+        return pd.DataFrame(columns=columns)
+    
+    result = evaluate_compliance_batch(
+        [[plan_data.get('total_nutrition', {}).get(key, 0) for key in DRI_NUTRIENTS] for _, plan_data, _ in rows],
+        [get_age(patient.get('data_nascimento', '1990-01-01'), reference_date) for _, _, patient in rows],
+        [patient.get('sexo', 'Feminino') for _, _, patient in rows],
+        [plan_data.get('target_calories', 0) for _, plan_data, _ in rows]
+    )
+    
+    rda_names = np.array(['carboidratos', 'proteinas', 'fibras'])
+    
+    return pd.DataFrame({
+        'plan_id': [plan_id for plan_id, _, _ in rows],
+        'patient_id': [plan_data.get('patient_id') for _, plan_data, _ in rows],
+        'score': result['score'],
+        'deficiente': result['is_deficient'],
+        'nutrientes_deficientes': [list(rda_names[mask]) for mask in result['deficient']]
+    }, columns=columns)
+
+def run_nightly_compliance(plans_file='data/meal_plans.json', patients_file='data/patients.json', output_file=COMPLIANCE_FILE):
+    """Avalia todos os planos ativos e grava os planos deficientes"""
+    plans, patients = {}, {}
+    if os.path.exists(plans_file):
+        plans = load_data(plans_file)
+    if os.path.exists(patients_file):
+        patients = load_data(patients_file)
+    
+    report = evaluate_active_plans(plans, patients)
+    
+    output = {
+        'generated_at': datetime.now().isoformat(),
+        'total_plans': len(report),
+        'deficient_plans': report[report['deficiente']].to_dict(orient='records')
+    }
+    
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(output, f, indent=2, ensure_ascii=False, default=str)
+    
+    return report
+
+if __name__ == "__main__":
+    report = run_nightly_compliance()
+    print(f"{len(report)} planos avaliados, {int(report['deficiente'].sum()) if len(report) else 0} com deficiências")
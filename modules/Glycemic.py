@@ -0,0 +1,76 @@
+# modules/glycemic.py
+
+# Índice glicêmico (glicose = 100) e carboidratos disponíveis (g/100g)
+GLYCEMIC_DATA = {
+    "arroz_branco": {"indice_glicemico": 73, "carboidratos_disponiveis": 27.6},
+    "arroz_integral": {"indice_glicemico": 68, "carboidratos_disponiveis": 21.2},
+    "aveia": {"indice_glicemico": 55, "carboidratos_disponiveis": 55.7},
+    "quinoa": {"indice_glicemico": 53, "carboidratos_disponiveis": 19.2},
+    "frango_peito": {"indice_glicemico": 0, "carboidratos_disponiveis": 0},
+    "ovo": {"indice_glicemico": 0, "carboidratos_disponiveis": 1.1},
+    "salmao": {"indice_glicemico": 0, "carboidratos_disponiveis": 0},
+    "tofu": {"indice_glicemico": 15, "carboidratos_disponiveis": 1.6},
+    "brocolis": {"indice_glicemico": 15, "carboidratos_disponiveis": 1.8},
+    "cenoura": {"indice_glicemico": 35, "carboidratos_disponiveis": 6.8},
+    "espinafre": {"indice_glicemico": 15, "carboidratos_disponiveis": 1.4},
+    "tomate": {"indice_glicemico": 15, "carboidratos_disponiveis": 2.7},
+    "banana": {"indice_glicemico": 51, "carboidratos_disponiveis": 20.4},
+    "maca": {"indice_glicemico": 36, "carboidratos_disponiveis": 11.6},
+    "laranja": {"indice_glicemico": 43, "carboidratos_disponiveis": 9.6},
+    "abacate": {"indice_glicemico": 15, "carboidratos_disponiveis": 1.8}
+}
+
+# Faixas de carga glicêmica (baixa até o 1º limite, alta a partir do 2º)
+MEAL_GL_THRESHOLDS = (10, 20)
+DAILY_GL_THRESHOLDS = (80, 120)
+
+def available_carbohydrates(food_data):
+    """Carboidratos disponíveis por 100g (carboidratos totais - fibras se não informado)"""
+    if 'carboidratos_disponiveis' in food_data:
+        return food_data['carboidratos_disponiveis']
+    return max(food_data.get('carboidratos', 0) - food_data.get('fibras', 0), 0)
+
+def glycemic_load_per_100g(food_data):
+    """Carga glicêmica de 100g do alimento"""
+    if 'carga_glicemica' in food_data:
+        return food_data['carga_glicemica']
+    return food_data.get('indice_glicemico', 0) * available_carbohydrates(food_data) / 100
+
+def add_glycemic_columns(foods_db):
+    """Completa o banco de alimentos com IG e carboidratos disponíveis; retorna True se alterou"""
+    changed = False
+    for foods in foods_db.values():
+        for food_key, food_data in foods.items():
+            defaults = GLYCEMIC_DATA.get(food_key, {})
+            
+            if 'indice_glicemico' not in food_data:
+                food_data['indice_glicemico'] = defaults.get('indice_glicemico', 0)
+                changed = True
+            
+            if 'carboidratos_disponiveis' not in food_data:
+                food_data['carboidratos_disponiveis'] = defaults.get('carboidratos_disponiveis', available_carbohydrates(food_data))
+                changed = True
+    
+    return changed
+
+def meal_glycemic_index(nutrition):
+    """Índice glicêmico médio ponderado de uma refeição ou dia"""
+    carbs = nutrition.get('carboidratos_disponiveis', 0)
+    if carbs <= 0:
+        return 0
+    return round(nutrition.get('carga_glicemica', 0) * 100 / carbs, 0)
+
+def classify_glycemic_load(glycemic_load, daily=False):
+    """Classifica a carga glicêmica (refeição ou dia)"""
+    low, high = DAILY_GL_THRESHOLDS if daily else MEAL_GL_THRESHOLDS
+    
+    if glycemic_load <= low:
+        return "Baixa", "green"
+    elif glycemic_load < high:
+        return "Média", "orange"
+    else:
+        return "Alta", "red"
+
+def has_diabetes(patient_data):
+    """Verifica se o paciente tem diabetes registrada nas condições médicas"""
+    return 'diabet' in (patient_data or {}).get('condicoes_medicas', '').lower()
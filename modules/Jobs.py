@@ -0,0 +1,79 @@
+# modules/jobs.py
+"""Acompanhamento das tarefas em segundo plano nas páginas
+
+A página enfileira a tarefa e guarda o id na sessão; enquanto ela não
+termina, um fragmento consulta o status a cada segundo (uma leitura por
+chave primária) e, ao concluir, executa a página de novo para exibir o
+resultado.
+"""
+import pandas as pd
+import streamlit as st
+
+from core.jobs import get_job_queue, JOB_STATUSES, FINISHED_STATUSES
+
+def submit_job(key, kind, params=None, priority='normal', **options):
+    """Enfileira uma tarefa e a associa a uma chave da sessão"""
+    job_id = get_job_queue().submit(kind, params, priority, **options)
+    st.session_state.setdefault('jobs', {})[key] = job_id
+    return job_id
+
+def current_job(key):
+    """Última tarefa enfileirada com a chave (None se não houver)"""
+    job_id = st.session_state.get('jobs', {}).get(key)
+    return get_job_queue().get(job_id) if job_id is not None else None
+
+def forget_job(key):
+    st.session_state.get('jobs', {}).pop(key, None)
+
+@st.fragment(run_every=1)
+def show_job_progress(key):
+    """Barra de progresso atualizada enquanto a tarefa estiver na fila ou em execução"""
+    job = current_job(key)
+    if job is None or job['status'] in FINISHED_STATUSES:
+        st.rerun()
+    
+    text = job['mensagem'] or JOB_STATUSES[job['status']]
+    if job['tentativas'] > 1:
+        text += f" (tentativa {job['tentativas']}/{job['max_tentativas']})"
+    st.progress(job['progresso'], text=f"{job['rotulo']}: {text}")
+    
+    if st.button("⏹️ Cancelar", key=f"cancel_job_{key}"):
+        get_job_queue().cancel(job['id'])
+
+def show_job_result(key):
+    """Mostra o andamento ou o desfecho da tarefa; retorna a tarefa se tiver concluído"""
+    job = current_job(key)
+    if job is None:
+        return None
+    if job['status'] not in FINISHED_STATUSES:
+        show_job_progress(key)
+    elif job['status'] == 'falhou':
+        st.error(f"❌ {job['rotulo']} falhou após {job['tentativas']} tentativa(s): {job['erro']}")
+    elif job['status'] == 'cancelada':
+        st.info(f"{job['rotulo']} cancelada.")
+    else:
+        return job
+    return None
+
+def show_jobs_panel(limit=20):
+    """Resumo da fila e últimas tarefas (administração)"""
+    queue = get_job_queue()
+    counts = queue.counts()
+    
+    columns = st.columns(len(JOB_STATUSES))
+    for column, (status, label) in zip(columns, JOB_STATUSES.items()):
+        with column:
+            st.metric(label, counts.get(status, 0))
+    
+    jobs = queue.recent(limit)
+    if jobs:
+        columns = {'id': 'ID', 'rotulo': 'Tarefa', 'status': 'Status', 'progresso': 'Progresso', 'tentativas': 'Tentativas',
+                   'criada_em': 'Criada em', 'concluida_em': 'Concluída em', 'erro': 'Erro'}
+        table = pd.DataFrame(jobs).reindex(columns=list(columns)).rename(columns=columns)
+        table['Status'] = table['Status'].map(JOB_STATUSES)
+        table['Progresso'] = (table['Progresso'] * 100).round().astype(int).astype(str) + "%"
+        st.dataframe(table, use_container_width=True, hide_index=True)
+
+# Inicializar estados da sessão
+if 'jobs' not in st.session_state:
+    st.session_state.jobs = {}
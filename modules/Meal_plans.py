@@ -1,10 +1,31 @@
 # modules/meal_plans.py
 import streamlit as st
 import pandas as pd
+import numpy as np
 import json
 import os
+import hashlib
 from datetime import datetime, date
 import plotly.express as px
+from modules.Shopping_list import show_shopping_list
+from modules.Charts import cached_figure
+from core.aggregates import get_aggregates
+from core.notifications import get_notifier
+from core.storage import write_json, file_version, updating
+from core.formats import load_data, save_data
+from core.archive import get_archive, next_id
+from modules.Dietary_reference import evaluate_plan_compliance, DEFICIENCY_THRESHOLD
+from modules.Patient_management import PatientManager, rehydrate_patient
+from modules.Glycemic import (
+    add_glycemic_columns, available_carbohydrates, glycemic_load_per_100g,
+    classify_glycemic_load, meal_glycemic_index, has_diabetes
+)
+
+# Nutrientes considerados nos cálculos (valores por 100g)
+NUTRIENT_KEYS = ['calorias', 'carboidratos', 'proteinas', 'gorduras', 'fibras', 'carboidratos_disponiveis', 'carga_glicemica']
+
+# Prefixo das chaves de receitas usadas como itens do plano
+RECIPE_KEY_PREFIX = 'receita_'
 
 class MealPlanManager:
     def __init__(self):
@@ -48,8 +69,16 @@ class MealPlanManager:
                 }
             }
             
-            with open(self.foods_file, 'w', encoding='utf-8') as f:
-                json.dump(foods_db, f, indent=2, ensure_ascii=False)
+            add_glycemic_columns(foods_db)
+            
+            write_json(self.foods_file, foods_db, indent=2)
+        else:
+            # Bancos antigos não têm índice glicêmico
+            with open(self.foods_file, 'r', encoding='utf-8') as f:
+                foods_db = json.load(f)
+            
+            if add_glycemic_columns(foods_db):
+                write_json(self.foods_file, foods_db, indent=2)
     
     @st.cache_data
     def load_foods_database(_self):
@@ -57,236 +86,507 @@ class MealPlanManager:
         with open(_self.foods_file, 'r', encoding='utf-8') as f:
             return json.load(f)
     
+    def load_meal_plans(self):
+        """Carrega planos alimentares (os de pacientes arquivados ficam no arquivo)"""
+        return self._load_meal_plans(file_version(self.plans_file))
+    
     @st.cache_data
-    def load_meal_plans(_self):
-        """Carrega planos alimentares"""
+    def _load_meal_plans(_self, version):
         if os.path.exists(_self.plans_file):
-            with open(_self.plans_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return load_data(_self.plans_file)
         return {}
     
     def save_meal_plan(self, plan_data):
         """Salva plano alimentar"""
-        plans = self.load_meal_plans()
-        plan_id = f"PLAN_{len(plans) + 1:04d}"
-        plan_data['id'] = plan_id
-        plan_data['created_at'] = datetime.now().isoformat()
-        plans[plan_id] = plan_data
-        
-        with open(self.plans_file, 'w', encoding='utf-8') as f:
-            json.dump(plans, f, indent=2, ensure_ascii=False, default=str)
+        rehydrate_patient(plan_data.get('patient_id'))
+        with updating(self.plans_file):
+            plans = self.load_meal_plans()
+            plan_id = next_id('PLAN', plans, get_archive().reserved_ids())
+            plan_data['id'] = plan_id
+            plan_data['created_at'] = datetime.now().isoformat()
+            plans[plan_id] = plan_data
+            
+            save_data(self.plans_file, plans)
         
+        get_aggregates().plan_saved(plan_data)
         return plan_id
-
-def calculate_nutrition(foods_selected):
-    """Calcula valores nutricionais totais"""
-    total_calories = 0
-    total_carbs = 0
-    total_proteins = 0
-    total_fats = 0
-    total_fiber = 0
-    
-    for food_item in foods_selected:
-        quantity = food_item.get('quantity', 0) / 100  # converter para porção de 100g
-        food_data = food_item.get('nutrition', {})
+    
+    @st.cache_data
+    def load_recipes(_self):
+        """Carrega receitas"""
+        if os.path.exists(_self.recipes_file):
+            return load_data(_self.recipes_file)
+        return {}
+    
+    def save_recipes(self, recipes):
+        """Salva receitas"""
+        save_data(self.recipes_file, recipes)
+        
+        MealPlanManager.load_recipes.clear()
+    
+    def save_recipe(self, recipe_data):
+        """Salva receita com nutrição por porção pré-calculada"""
+        recipes = dict(self.load_recipes())
+        recipe_id = f"REC_{len(recipes) + 1:04d}"
+        recipe_data['id'] = recipe_id
+        recipe_data['created_at'] = datetime.now().isoformat()
+        recipe_data['nutrition_cache'] = compute_recipe_nutrition(recipe_data, get_food_index(self.load_foods_database()))
+        recipes[recipe_id] = recipe_data
         
-        total_calories += food_data.get('calorias', 0) * quantity
-        total_carbs += food_data.get('carboidratos', 0) * quantity
-        total_proteins += food_data.get('proteinas', 0) * quantity
-        total_fats += food_data.get('gorduras', 0) * quantity
-        total_fiber += food_data.get('fibras', 0) * quantity
+        self.save_recipes(recipes)
+        return recipe_id
+    
+    def get_recipe_foods(self):
+        """Retorna receitas no formato de alimentos (valores por 100g)"""
+        recipes = self.load_recipes()
+        if not recipes:
+            return {}
+        
+        food_index = get_food_index(self.load_foods_database())
+        recipe_foods = {}
+        
+        for recipe_id, recipe in recipes.items():
+            cache = recipe.get('nutrition_cache')
+            
+            # Recalcular (só em memória, a leitura não grava) se algum ingrediente mudou
+            if not cache or cache.get('fingerprint') != recipe_fingerprint(recipe, food_index):
+                cache = compute_recipe_nutrition(recipe, food_index)
+            
+            recipe_foods[f"{RECIPE_KEY_PREFIX}{recipe_id}"] = {
+                'nome': recipe.get('nome', recipe_id),
+                'recipe_id': recipe_id,
+                'peso_porcao': cache['peso_porcao'],
+                'por_porcao': cache['por_porcao'],
+                **cache['por_100g']
+            }
+        
+        return recipe_foods
+
+def get_food_index(foods_db):
+    """Indexa alimentos por chave, independente da categoria"""
+    return {food_key: food_data for foods in foods_db.values() for food_key, food_data in foods.items()}
+
+# Nutrientes calculados a partir dos demais campos do alimento
+DERIVED_NUTRIENTS = {
+    'carboidratos_disponiveis': available_carbohydrates,
+    'carga_glicemica': glycemic_load_per_100g
+}
+
+def nutrient_vector(food_data):
+    """Converte os nutrientes de um alimento em vetor (por 100g), na ordem de NUTRIENT_KEYS"""
+    return np.array([
+        DERIVED_NUTRIENTS[key](food_data) if key in DERIVED_NUTRIENTS else food_data.get(key, 0)
+        for key in NUTRIENT_KEYS
+    ], dtype=float)
+
+def recipe_fingerprint(recipe, food_index):
+    """Impressão digital dos ingredientes e das linhas de alimentos usadas"""
+    rows = [
+        [item.get('key'), item.get('quantity', 0), nutrient_vector(food_index.get(item.get('key'), {})).tolist()]
+        for item in recipe.get('ingredientes', [])
+    ]
+    payload = json.dumps([rows, recipe.get('rendimento', 1)], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def compute_recipe_nutrition(recipe, food_index):
+    """Calcula nutrição por porção e por 100g de uma receita"""
+    ingredients = recipe.get('ingredientes', [])
+    servings = max(recipe.get('rendimento', 1), 1)
+    
+    quantities = np.array([item.get('quantity', 0) for item in ingredients], dtype=float)
+    matrix = np.array([nutrient_vector(food_index.get(item.get('key'), {})) for item in ingredients], dtype=float).reshape(-1, len(NUTRIENT_KEYS))
+    
+    total = quantities @ matrix / 100
+    total_weight = float(quantities.sum())
+    serving_weight = total_weight / servings
+    per_100g = total / total_weight * 100 if total_weight > 0 else np.zeros(len(NUTRIENT_KEYS))
     
     return {
-        'calorias': round(total_calories, 1),
-        'carboidratos': round(total_carbs, 1),
-        'proteinas': round(total_proteins, 1),
-        'gorduras': round(total_fats, 1),
-        'fibras': round(total_fiber, 1)
+        'fingerprint': recipe_fingerprint(recipe, food_index),
+        'peso_total': round(total_weight, 1),
+        'peso_porcao': round(serving_weight, 1),
+        'por_porcao': dict(zip(NUTRIENT_KEYS, np.round(total / servings, 1).tolist())),
+        'por_100g': dict(zip(NUTRIENT_KEYS, np.round(per_100g, 4).tolist()))
     }
 
-def show_nutrition_chart(nutrition_data):
-    """Exibe gráfico de macronutrientes"""
-    macros = ['Carboidratos', 'Proteínas', 'Gorduras']
-    values = [nutrition_data['carboidratos'], nutrition_data['proteinas'], nutrition_data['gorduras']]
-    colors = ['#FF9999', '#66B2FF', '#99FF99']
-    
-    fig = px.pie(
-        values=values,
-        names=macros,
-        color_discrete_sequence=colors,
+def calculate_nutrition_vector(foods_selected):
+    """Calcula vetor nutricional total (uma multiplicação matricial)"""
+    if not foods_selected:
+        return np.zeros(len(NUTRIENT_KEYS))
+    
+    quantities = np.array([food_item.get('quantity', 0) for food_item in foods_selected], dtype=float) / 100  # converter para porção de 100g
+    matrix = np.array([nutrient_vector(food_item.get('nutrition', {})) for food_item in foods_selected])
+    
+    return quantities @ matrix
+
+def calculate_meal_vectors(meals, food_index=None):
+    """Calcula os vetores nutricionais de todas as refeições em uma única passada
+    
+    Itens salvos antes da inclusão do índice glicêmico são completados com a
+    linha atual do banco de alimentos.
+    """
+    food_index = food_index or {}
+    meal_names = list(meals.keys())
+    
+    items = [(meal_idx, food) for meal_idx, meal_name in enumerate(meal_names) for food in meals[meal_name].get('foods', [])]
+    if not items:
+        return meal_names, np.zeros((len(meal_names), len(NUTRIENT_KEYS)))
+    
+    meal_index = np.array([meal_idx for meal_idx, _ in items])
+    quantities = np.array([food.get('quantity', 0) for _, food in items], dtype=float) / 100
+    matrix = np.array([
+        nutrient_vector({**food_index.get(food.get('key'), {}), **food.get('nutrition', {})})
+        for _, food in items
+    ])
+    
+    # Soma dos itens por refeição
+    vectors = np.zeros((len(meal_names), len(NUTRIENT_KEYS)))
+    np.add.at(vectors, meal_index, matrix * quantities[:, None])
+    
+    return meal_names, vectors
+
+def calculate_nutrition(foods_selected):
+    """Calcula valores nutricionais totais"""
+    totals = calculate_nutrition_vector(foods_selected)
+    return {key: round(float(value), 1) for key, value in zip(NUTRIENT_KEYS, totals)}
+
+def build_nutrition_pie(carbs, proteins, fats):
+    """Gráfico de pizza dos macronutrientes (g)"""
+    return px.pie(
+        values=[carbs, proteins, fats],
+        names=['Carboidratos', 'Proteínas', 'Gorduras'],
+        color_discrete_sequence=['#FF9999', '#66B2FF', '#99FF99'],
         title="Distribuição de Macronutrientes"
     )
-    
+
+def show_nutrition_chart(nutrition_data):
+    """Exibe gráfico de macronutrientes"""
+    fig = cached_figure(build_nutrition_pie, nutrition_data['carboidratos'], nutrition_data['proteinas'], nutrition_data['gorduras'])
     st.plotly_chart(fig, use_container_width=True)
 
-def show_meal_plan_form():
-    """Formulário para criar plano alimentar"""
-    st.markdown("### 🍽️ Criar Novo Plano Alimentar")
+def show_dri_compliance(plan, patient):
+    """Exibe adequação do plano às DRIs do paciente"""
+    if not patient:
+        st.info("Paciente não encontrado: não é possível comparar com as DRIs.")
+        return
     
-    manager = MealPlanManager()
-    foods_db = manager.load_foods_database()
+    result = evaluate_plan_compliance(plan, patient)
     
-    with st.form("meal_plan_form"):
-        # Informações básicas do plano
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            plan_name = st.text_input("Nome do Plano *")
-            patient_id = st.text_input("ID do Paciente *")
-            target_calories = st.number_input("Meta de Calorias Diárias", min_value=800, max_value=4000, value=2000)
-        
-        with col2:
-            plan_duration = st.selectbox("Duração do Plano", ["1 semana", "2 semanas", "1 mês", "2 meses", "3 meses"])
-            plan_type = st.selectbox("Tipo de Plano", ["Perda de peso", "Ganho de peso", "Manutenção", "Ganho de massa"])
-            observations = st.text_area("Observações")
-        
-        st.markdown("#### 🍳 Refeições do Dia")
-        
-        # Estrutura para diferentes refeições
-        meals = ["Café da manhã", "Lanche da manhã", "Almoço", "Lanche da tarde", "Jantar", "Ceia"]
-        meal_plans = {}
-        
-        for meal in meals:
-            with st.expander(f"🍽️ {meal}"):
-                st.markdown(f"##### {meal}")
-                
-                # Seleção de alimentos por categoria
-                meal_foods = []
-                
-                for category, foods in foods_db.items():
-                    st.markdown(f"**{category.title()}:**")
-                    
-                    selected_foods = st.multiselect(
-                        f"Selecionar {category}",
-                        options=list(foods.keys()),
-                        format_func=lambda x: foods[x]['nome'],
-                        key=f"{meal}_{category}"
-                    )
-                    
-                    for food_key in selected_foods:
-                        food_data = foods[food_key]
-                        
-                        col_food, col_qty = st.columns([3, 1])
-                        
-                        with col_food:
-                            st.write(f"• {food_data['nome']}")
-                        
-                        with col_qty:
-                            quantity = st.number_input(
-                                "Quantidade (g)",
-                                min_value=0,
-                                max_value=1000,
-                                value=100,
-                                step=10,
-                                key=f"{meal}_{food_key}_qty"
-                            )
-                        
-                        meal_foods.append({
-                            'name': food_data['nome'],
-                            'key': food_key,
-                            'quantity': quantity,
-                            'nutrition': food_data
-                        })
-                
-                # Calcular nutrição da refeição
-                if meal_foods:
-                    meal_nutrition = calculate_nutrition(meal_foods)
-                    
-                    col1, col2, col3, col4 = st.columns(4)
-                    with col1:
-                        st.metric("Calorias", f"{meal_nutrition['calorias']}")
-                    with col2:
-                        st.metric("Carboidratos (g)", f"{meal_nutrition['carboidratos']}")
-                    with col3:
-                        st.metric("Proteínas (g)", f"{meal_nutrition['proteinas']}")
-                    with col4:
-                        st.metric("Gorduras (g)", f"{meal_nutrition['gorduras']}")
-                
-                meal_plans[meal] = {
-                    'foods': meal_foods,
-                    'nutrition': meal_nutrition if meal_foods else {}
-                }
+    col1, col2 = st.columns([1, 3])
+    
+    with col1:
+        st.metric("Pontuação DRI", f"{result['score']:.0f}/100")
+        if result['is_deficient']:
+            st.error("⚠️ Plano com nutrientes abaixo da referência")
+        else:
+            st.success("✅ Metas de referência atendidas")
+    
+    with col2:
+        total_nutrition = plan.get('total_nutrition', {})
+        rows = []
         
-        # Botões do formulário
-        col_cancel, col_preview, col_save = st.columns(3)
+        for i, (key, label) in enumerate([('carboidratos', 'Carboidratos'), ('proteinas', 'Proteínas'), ('fibras', 'Fibras')]):
+            ratio = result['rda_ratio'][i]
+            rows.append({
+                'Nutriente': label,
+                'Plano (g)': round(total_nutrition.get(key, 0), 1),
+                'Referência (g)': round(result['rda'][i], 1),
+                'Adequação': f"{ratio * 100:.0f}%",
+                'Status': "🔴" if ratio < DEFICIENCY_THRESHOLD else ("🟡" if ratio < 1 else "🟢")
+            })
         
-        with col_cancel:
-            if st.form_submit_button("❌ Cancelar", use_container_width=True):
-                st.session_state.show_meal_plan_form = False
-                st.rerun()
+        for i, label in enumerate(['Carboidratos', 'Proteínas', 'Gorduras']):
+            low, high = result['amdr'][i]
+            percent = result['energy_percent'][i]
+            rows.append({
+                'Nutriente': f"{label} (% energia)",
+                'Plano (g)': f"{percent:.0f}%",
+                'Referência (g)': f"{low:.0f}-{high:.0f}%",
+                'Adequação': "Dentro da faixa" if low <= percent <= high else "Fora da faixa",
+                'Status': "🟢" if low <= percent <= high else "🟡"
+            })
         
-        with col_preview:
-            preview_button = st.form_submit_button("👁️ Visualizar", use_container_width=True)
+        st.dataframe(pd.DataFrame(rows).astype(str), use_container_width=True, hide_index=True)
+
+# Refeições do dia
+MEALS = ["Café da manhã", "Lanche da manhã", "Almoço", "Lanche da tarde", "Jantar", "Ceia"]
+
+def nutrition_from_vector(vector):
+    """Converte vetor nutricional em dicionário arredondado"""
+    return {key: round(float(value), 1) for key, value in zip(NUTRIENT_KEYS, vector)}
+
+def init_meal_plan_draft():
+    """Inicializa rascunho do plano na sessão (alimentos e vetor por refeição)"""
+    if st.session_state.get('meal_plan_draft') is None:
+        st.session_state.meal_plan_draft = {
+            'meals': {meal: {'foods': [], 'vector': [0.0] * len(NUTRIENT_KEYS)} for meal in MEALS},
+            'total': [0.0] * len(NUTRIENT_KEYS),
+            'editing': None
+        }
+    return st.session_state.meal_plan_draft
+
+def update_draft_meal(draft, meal, meal_foods):
+    """Atualiza uma refeição do rascunho e o total diário de forma incremental"""
+    old_vector = np.array(draft['meals'][meal]['vector'])
+    new_vector = calculate_nutrition_vector(meal_foods)
+    
+    draft['meals'][meal] = {'foods': meal_foods, 'vector': new_vector.tolist()}
+    draft['total'] = (np.array(draft['total']) - old_vector + new_vector).tolist()
+    
+    return new_vector
+
+@st.fragment
+def show_meal_editor(meal, foods_db):
+    """Editor de uma refeição (fragmento: apenas ele é reexecutado ao editar)"""
+    draft = init_meal_plan_draft()
+    draft_foods = {food['key']: food for food in draft['meals'][meal]['foods']}
+    
+    # Seleção de alimentos por categoria
+    meal_foods = []
+    
+    for category, foods in foods_db.items():
+        st.markdown(f"**{category.title()}:**")
         
-        with col_save:
-            save_button = st.form_submit_button("💾 Salvar Plano", use_container_width=True, type="primary")
+        selected_foods = st.multiselect(
+            f"Selecionar {category}",
+            options=list(foods.keys()),
+            default=[food_key for food_key in draft_foods if food_key in foods],
+            format_func=lambda x: foods[x]['nome'],
+            key=f"{meal}_{category}"
+        )
         
-        if preview_button:
-            # Mostrar prévia do plano
-            st.markdown("### 📋 Prévia do Plano Alimentar")
+        for food_key in selected_foods:
+            food_data = foods[food_key]
             
-            total_nutrition = {'calorias': 0, 'carboidratos': 0, 'proteinas': 0, 'gorduras': 0, 'fibras': 0}
+            col_food, col_qty = st.columns([3, 1])
             
-            for meal, meal_data in meal_plans.items():
-                if meal_data['foods']:
-                    st.markdown(f"#### {meal}")
-                    
-                    for food in meal_data['foods']:
-                        st.write(f"• {food['name']} - {food['quantity']}g")
-                    
-                    # Somar nutrição total
-                    meal_nutrition = meal_data.get('nutrition', {})
-                    for key in total_nutrition:
-                        total_nutrition[key] += meal_nutrition.get(key, 0)
+            with col_food:
+                st.write(f"• {food_data['nome']}")
             
-            # Mostrar resumo nutricional
-            st.markdown("#### 📊 Resumo Nutricional Diário")
-            col1, col2, col3, col4, col5 = st.columns(5)
+            with col_qty:
+                default_quantity = draft_foods[food_key]['quantity'] if food_key in draft_foods else int(food_data.get('peso_porcao', 100))
+                quantity = st.number_input(
+                    "Quantidade (g)",
+                    min_value=0,
+                    max_value=1000,
+                    value=min(default_quantity, 1000),
+                    step=10,
+                    key=f"{meal}_{food_key}_qty"
+                )
             
-            with col1:
-                st.metric("Calorias Totais", f"{total_nutrition['calorias']:.0f}")
-            with col2:
-                st.metric("Carboidratos (g)", f"{total_nutrition['carboidratos']:.1f}")
-            with col3:
-                st.metric("Proteínas (g)", f"{total_nutrition['proteinas']:.1f}")
-            with col4:
-                st.metric("Gorduras (g)", f"{total_nutrition['gorduras']:.1f}")
-            with col5:
-                st.metric("Fibras (g)", f"{total_nutrition['fibras']:.1f}")
+            food_item = {
+                'name': food_data['nome'],
+                'key': food_key,
+                'quantity': quantity,
+                'nutrition': dict(zip(NUTRIENT_KEYS, nutrient_vector(food_data).tolist()))
+            }
             
-            # Gráfico de macronutrientes
-            show_nutrition_chart(total_nutrition)
+            if food_data.get('recipe_id'):
+                food_item['recipe_id'] = food_data['recipe_id']
+            
+            meal_foods.append(food_item)
+    
+    # Recalcular apenas esta refeição; o total do dia vem dos vetores em cache
+    meal_nutrition = nutrition_from_vector(update_draft_meal(draft, meal, meal_foods))
+    
+    if meal_foods:
+        col1, col2, col3, col4, col5 = st.columns(5)
+        with col1:
+            st.metric("Calorias", f"{meal_nutrition['calorias']}")
+        with col2:
+            st.metric("Carboidratos (g)", f"{meal_nutrition['carboidratos']}")
+        with col3:
+            st.metric("Proteínas (g)", f"{meal_nutrition['proteinas']}")
+        with col4:
+            st.metric("Gorduras (g)", f"{meal_nutrition['gorduras']}")
+        with col5:
+            gl_category, _ = classify_glycemic_load(meal_nutrition['carga_glicemica'])
+            st.metric("Carga Glicêmica", f"{meal_nutrition['carga_glicemica']}", gl_category, delta_color="off")
+    
+    st.caption(f"Total do dia: {draft['total'][0]:.0f} kcal")
+    
+    if st.button("✅ Concluir refeição", key=f"{meal}_done"):
+        draft['editing'] = None
+        st.rerun()
+
+def show_meal_plan_form():
+    """Formulário para criar plano alimentar"""
+    st.markdown("### 🍽️ Criar Novo Plano Alimentar")
+    
+    manager = MealPlanManager()
+    foods_db = dict(manager.load_foods_database())
+    
+    # Receitas entram no formulário como mais uma categoria de alimentos
+    recipe_foods = manager.get_recipe_foods()
+    if recipe_foods:
+        foods_db['receitas'] = recipe_foods
+    
+    draft = init_meal_plan_draft()
+    
+    # Informações básicas do plano
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        plan_name = st.text_input("Nome do Plano *", key="plan_form_name")
+        patient_id = st.text_input("ID do Paciente *", key="plan_form_patient")
+        target_calories = st.number_input("Meta de Calorias Diárias", min_value=800, max_value=4000, value=2000, key="plan_form_calories")
+    
+    with col2:
+        plan_duration = st.selectbox("Duração do Plano", ["1 semana", "2 semanas", "1 mês", "2 meses", "3 meses"], key="plan_form_duration")
+        plan_type = st.selectbox("Tipo de Plano", ["Perda de peso", "Ganho de peso", "Manutenção", "Ganho de massa"], key="plan_form_type")
+        observations = st.text_area("Observações", key="plan_form_observations")
+    
+    st.markdown("#### 🍳 Refeições do Dia")
+    
+    # Apenas a refeição em edição monta os widgets de seleção
+    for meal in MEALS:
+        meal_draft = draft['meals'][meal]
+        is_editing = draft['editing'] == meal
         
-        if save_button:
-            if not plan_name or not patient_id:
-                st.error("Por favor, preencha todos os campos obrigatórios.")
+        with st.expander(f"🍽️ {meal} - {meal_draft['vector'][0]:.0f} kcal", expanded=is_editing):
+            if is_editing:
+                st.markdown(f"##### {meal}")
+                show_meal_editor(meal, foods_db)
             else:
-                # Calcular nutrição total
-                total_nutrition = {'calorias': 0, 'carboidratos': 0, 'proteinas': 0, 'gorduras': 0, 'fibras': 0}
+                for food in meal_draft['foods']:
+                    st.write(f"• {food['name']} - {food['quantity']}g")
                 
-                for meal_data in meal_plans.values():
-                    meal_nutrition = meal_data.get('nutrition', {})
-                    for key in total_nutrition:
-                        total_nutrition[key] += meal_nutrition.get(key, 0)
-                
-                # Preparar dados do plano
-                plan_data = {
-                    'name': plan_name,
-                    'patient_id': patient_id,
-                    'target_calories': target_calories,
-                    'duration': plan_duration,
-                    'type': plan_type,
-                    'observations': observations,
-                    'meals': meal_plans,
-                    'total_nutrition': total_nutrition,
-                    'status': 'ativo'
-                }
+                if st.button("✏️ Editar refeição", key=f"{meal}_edit"):
+                    draft['editing'] = meal
+                    st.rerun()
+    
+    total_nutrition = nutrition_from_vector(draft['total'])
+    st.caption(f"Total do dia: {total_nutrition['calorias']:.0f} kcal | Meta: {target_calories} kcal")
+    
+    meal_plans = {
+        meal: {
+            'foods': meal_draft['foods'],
+            'nutrition': nutrition_from_vector(meal_draft['vector']) if meal_draft['foods'] else {}
+        }
+        for meal, meal_draft in draft['meals'].items()
+    }
+    
+    # Botões do formulário
+    col_cancel, col_preview, col_save = st.columns(3)
+    
+    with col_cancel:
+        if st.button("❌ Cancelar", use_container_width=True):
+            st.session_state.show_meal_plan_form = False
+            st.session_state.meal_plan_draft = None
+            st.rerun()
+    
+    with col_preview:
+        preview_button = st.button("👁️ Visualizar", use_container_width=True)
+    
+    with col_save:
+        save_button = st.button("💾 Salvar Plano", use_container_width=True, type="primary")
+    
+    if preview_button:
+        # Mostrar prévia do plano
+        st.markdown("### 📋 Prévia do Plano Alimentar")
+        
+        for meal, meal_data in meal_plans.items():
+            if meal_data['foods']:
+                st.markdown(f"#### {meal}")
                 
-                # Salvar plano
-                plan_id = manager.save_meal_plan(plan_data)
-                st.success(f"✅ Plano alimentar salvo com sucesso! ID: {plan_id}")
-                st.session_state.show_meal_plan_form = False
-                st.rerun()
+                for food in meal_data['foods']:
+                    st.write(f"• {food['name']} - {food['quantity']}g")
+        
+        # Mostrar resumo nutricional
+        st.markdown("#### 📊 Resumo Nutricional Diário")
+        col1, col2, col3, col4, col5 = st.columns(5)
+        
+        with col1:
+            st.metric("Calorias Totais", f"{total_nutrition['calorias']:.0f}")
+        with col2:
+            st.metric("Carboidratos (g)", f"{total_nutrition['carboidratos']:.1f}")
+        with col3:
+            st.metric("Proteínas (g)", f"{total_nutrition['proteinas']:.1f}")
+        with col4:
+            st.metric("Gorduras (g)", f"{total_nutrition['gorduras']:.1f}")
+        with col5:
+            st.metric("Fibras (g)", f"{total_nutrition['fibras']:.1f}")
+        
+        gl_category, _ = classify_glycemic_load(total_nutrition['carga_glicemica'], daily=True)
+        st.write(f"**Carga glicêmica diária:** {total_nutrition['carga_glicemica']:.0f} ({gl_category}) | **IG médio:** {meal_glycemic_index(total_nutrition):.0f}")
+        
+        # Gráfico de macronutrientes
+        show_nutrition_chart(total_nutrition)
+    
+    if save_button:
+        if not plan_name or not patient_id:
+            st.error("Por favor, preencha todos os campos obrigatórios.")
+        else:
+            # Preparar dados do plano
+            plan_data = {
+                'name': plan_name,
+                'patient_id': patient_id,
+                'target_calories': target_calories,
+                'duration': plan_duration,
+                'type': plan_type,
+                'observations': observations,
+                'meals': meal_plans,
+                'total_nutrition': total_nutrition,
+                'status': 'ativo'
+            }
+            
+            # Salvar plano
+            plan_id = manager.save_meal_plan(plan_data)
+            st.success(f"✅ Plano alimentar salvo com sucesso! ID: {plan_id}")
+            st.session_state.show_meal_plan_form = False
+            st.session_state.meal_plan_draft = None
+            st.rerun()
+
+def format_plan_email(plan, patient=None):
+    """Texto do plano alimentar para envio por e-mail"""
+    total = plan.get('total_nutrition', {})
+    lines = [
+        f"Olá, {(patient or {}).get('nome', '')}!",
+        "",
+        f"Segue o seu plano alimentar \"{plan.get('name', 'Plano Alimentar')}\" ({plan.get('duration', '')}).",
+        f"Total diário: {total.get('calorias', 0):.0f} kcal | Carboidratos {total.get('carboidratos', 0):.0f}g | "
+        f"Proteínas {total.get('proteinas', 0):.0f}g | Gorduras {total.get('gorduras', 0):.0f}g",
+        ""
+    ]
+    
+    for meal_name, meal_data in plan.get('meals', {}).items():
+        if not meal_data.get('foods'):
+            continue
+        lines.append(f"{meal_name} ({meal_data.get('nutrition', {}).get('calorias', 0):.0f} kcal)")
+        lines.extend(f"  - {food['name']}: {food['quantity']:g}g" for food in meal_data['foods'])
+        lines.append("")
+    
+    if plan.get('observations'):
+        lines += ["Observações:", plan['observations'], ""]
+    
+    lines.append("Bons resultados! Equipe NutriApp360")
+    return "\n".join(lines)
+
+def send_plan_to_patient(plan):
+    """Enfileira o envio do plano por e-mail; retorna (sucesso, mensagem)"""
+    notifier = get_notifier()
+    if not notifier.enabled():
+        return False, "Notificações por e-mail estão desativadas nas configurações."
+    
+    patient = PatientManager().get_patient(plan.get('patient_id'))
+    if not patient or not patient.get('email'):
+        return False, "Paciente sem e-mail cadastrado."
+    
+    notifier.send(
+        patient['email'],
+        f"Seu plano alimentar: {plan.get('name', 'Plano Alimentar')}",
+        format_plan_email(plan, patient),
+        kind='plano',
+        key=f"plano:{plan.get('id')}"
+    )
+    return True, f"Plano na fila de envio para {patient['email']}."
+
+def show_send_result(sent, message):
+    """Mensagem de retorno do envio do plano"""
+    if sent:
+        st.success(f"📧 {message}")
+    else:
+        st.warning(f"⚠️ {message}")
 
 def show_meal_plans_list():
     """Exibe lista de planos alimentares"""
@@ -312,11 +612,32 @@ def show_meal_plans_list():
         if st.button("➕ Novo Plano", use_container_width=True):
             st.session_state.show_meal_plan_form = True
             st.rerun()
+        
+        if st.button("📖 Receitas", use_container_width=True):
+            st.session_state.show_recipes = True
+            st.rerun()
     
     # Exibir planos
     if plans:
         st.markdown(f"### 🍽️ Planos Alimentares ({len(plans)} total)")
         
+        # Lista de compras para programas em grupo
+        with st.expander("🛒 Lista de Compras em Grupo"):
+            selected_plans = st.multiselect(
+                "Selecionar planos",
+                options=list(plans.keys()),
+                format_func=lambda x: f"{plans[x].get('name', x)} ({plans[x].get('patient_id', 'N/A')})",
+                key="group_shopping_plans"
+            )
+            
+            if selected_plans:
+                show_shopping_list(
+                    [plans[plan_id] for plan_id in selected_plans],
+                    manager.load_foods_database(),
+                    key_prefix="group_shopping",
+                    recipes=manager.load_recipes()
+                )
+        
         for plan_id, plan_data in plans.items():
             # Aplicar filtros
             if search_patient and search_patient.lower() not in plan_data.get('patient_id', '').lower():
@@ -353,7 +674,7 @@ def show_meal_plans_list():
                     
                     with col_edit:
                         if st.button("📧", key=f"send_plan_{plan_id}", help="Enviar para paciente"):
-                            st.success("Plano enviado para o paciente!")
+                            show_send_result(*send_plan_to_patient(plan_data))
                 
                 st.divider()
     else:
@@ -382,10 +703,17 @@ def show_plan_detail(plan_id):
             st.rerun()
         
         if st.button("📧 Enviar", use_container_width=True):
-            st.success("Plano enviado para o paciente!")
+            show_send_result(*send_plan_to_patient(plan))
     
     # Resumo nutricional
     total_nutrition = plan.get('total_nutrition', {})
+    patient = PatientManager().get_patient(plan.get('patient_id'))
+    
+    # Carga glicêmica por refeição (mesma passada vetorizada dos nutrientes)
+    meals = plan.get('meals', {})
+    meal_names, meal_vectors = calculate_meal_vectors(meals, get_food_index(manager.load_foods_database()))
+    meal_glycemic = {name: dict(zip(NUTRIENT_KEYS, vector.round(1).tolist())) for name, vector in zip(meal_names, meal_vectors)}
+    daily_glycemic = dict(zip(NUTRIENT_KEYS, meal_vectors.sum(axis=0).round(1).tolist()))
     
     col1, col2, col3, col4, col5 = st.columns(5)
     with col1:
@@ -416,12 +744,32 @@ def show_plan_detail(plan_id):
             st.markdown("**Observações:**")
             st.write(plan.get('observations'))
     
+    # Comparação com as referências de ingestão
+    st.markdown("### 🎯 Adequação às DRIs")
+    show_dri_compliance(plan, patient)
+    
+    # Carga glicêmica
+    st.markdown("### 🩸 Carga Glicêmica")
+    
+    gl_category, gl_color = classify_glycemic_load(daily_glycemic['carga_glicemica'], daily=True)
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.metric("Carga Glicêmica Diária", f"{daily_glycemic['carga_glicemica']:.0f}")
+    with col2:
+        st.metric("IG Médio", f"{meal_glycemic_index(daily_glycemic):.0f}")
+    with col3:
+        st.markdown(f"**Classificação:** <span style='color: {gl_color}'>{gl_category}</span>", unsafe_allow_html=True)
+    
+    if has_diabetes(patient):
+        high_meals = [name for name, values in meal_glycemic.items() if classify_glycemic_load(values['carga_glicemica'])[0] == "Alta"]
+        if high_meals:
+            st.warning(f"⚠️ Paciente com diabetes: refeições com carga glicêmica alta: {', '.join(high_meals)}")
+    
     # Detalhes das refeições
     st.markdown("---")
     st.markdown("### 🍽️ Refeições Detalhadas")
     
-    meals = plan.get('meals', {})
-    
     for meal_name, meal_data in meals.items():
         if meal_data.get('foods'):
             with st.expander(f"{meal_name} - {meal_data.get('nutrition', {}).get('calorias', 0):.0f} kcal"):
@@ -444,7 +792,7 @@ def show_plan_detail(plan_id):
                 meal_nutrition = meal_data.get('nutrition', {})
                 
                 st.markdown("**Resumo da refeição:**")
-                col1, col2, col3, col4 = st.columns(4)
+                col1, col2, col3, col4, col5 = st.columns(5)
                 
                 with col1:
                     st.metric("Calorias", f"{meal_nutrition.get('calorias', 0):.0f}")
@@ -454,12 +802,115 @@ def show_plan_detail(plan_id):
                     st.metric("Proteínas", f"{meal_nutrition.get('proteinas', 0):.1f}g")
                 with col4:
                     st.metric("Gorduras", f"{meal_nutrition.get('gorduras', 0):.1f}g")
+                with col5:
+                    meal_gl = meal_glycemic[meal_name]['carga_glicemica']
+                    st.metric("Carga Glicêmica", f"{meal_gl:.1f}", classify_glycemic_load(meal_gl)[0], delta_color="off")
+    
+    # Lista de compras
+    st.markdown("---")
+    st.markdown("### 🛒 Lista de Compras")
+    
+    show_shopping_list([plan], manager.load_foods_database(), key_prefix=f"shopping_{plan_id}", recipes=manager.load_recipes())
+
+def show_recipes_manager():
+    """Cadastro e listagem de receitas"""
+    st.markdown("### 📖 Receitas")
+    
+    if st.button("🔙 Voltar"):
+        st.session_state.show_recipes = False
+        st.rerun()
+    
+    manager = MealPlanManager()
+    foods_db = manager.load_foods_database()
+    food_index = get_food_index(foods_db)
+    
+    with st.expander("➕ Nova Receita", expanded=True):
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            recipe_name = st.text_input("Nome da Receita *", key="recipe_name")
+        
+        with col2:
+            servings = st.number_input("Rendimento (porções)", min_value=1, max_value=50, value=1, key="recipe_servings")
+        
+        ingredient_keys = st.multiselect(
+            "Ingredientes",
+            options=list(food_index.keys()),
+            format_func=lambda x: food_index[x]['nome'],
+            key="recipe_ingredients"
+        )
+        
+        ingredients = []
+        for food_key in ingredient_keys:
+            col_food, col_qty = st.columns([3, 1])
+            
+            with col_food:
+                st.write(f"• {food_index[food_key]['nome']}")
+            
+            with col_qty:
+                quantity = st.number_input(
+                    "Quantidade (g)",
+                    min_value=0,
+                    max_value=5000,
+                    value=100,
+                    step=10,
+                    key=f"recipe_{food_key}_qty"
+                )
+            
+            ingredients.append({'key': food_key, 'quantity': quantity})
+        
+        if ingredients:
+            recipe_data = {'nome': recipe_name, 'ingredientes': ingredients, 'rendimento': servings}
+            per_serving = compute_recipe_nutrition(recipe_data, food_index)['por_porcao']
+            
+            st.markdown("**Por porção:**")
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Calorias", f"{per_serving['calorias']:.0f}")
+            with col2:
+                st.metric("Carboidratos (g)", f"{per_serving['carboidratos']:.1f}")
+            with col3:
+                st.metric("Proteínas (g)", f"{per_serving['proteinas']:.1f}")
+            with col4:
+                st.metric("Gorduras (g)", f"{per_serving['gorduras']:.1f}")
+            
+            if st.button("💾 Salvar Receita", type="primary"):
+                if not recipe_name:
+                    st.error("Por favor, informe o nome da receita.")
+                else:
+                    recipe_id = manager.save_recipe(recipe_data)
+                    st.success(f"✅ Receita salva com sucesso! ID: {recipe_id}")
+    
+    # Receitas cadastradas
+    recipe_foods = manager.get_recipe_foods()
+    
+    if recipe_foods:
+        for recipe_food in recipe_foods.values():
+            per_serving = recipe_food['por_porcao']
+            
+            col1, col2, col3 = st.columns([3, 1, 2])
+            
+            with col1:
+                st.markdown(f"**{recipe_food['nome']}**")
+                st.caption(f"ID: {recipe_food['recipe_id']} | Porção: {recipe_food['peso_porcao']:.0f}g")
+            
+            with col2:
+                st.metric("kcal/porção", f"{per_serving['calorias']:.0f}")
+            
+            with col3:
+                st.caption(f"C: {per_serving['carboidratos']:.1f}g | P: {per_serving['proteinas']:.1f}g | G: {per_serving['gorduras']:.1f}g")
+            
+            st.divider()
+    else:
+        st.info("Nenhuma receita cadastrada ainda.")
 
 def show_meal_plans():
     """Função principal do módulo de planos alimentares"""
     # Verificar estado da sessão
     if st.session_state.get('show_meal_plan_form', False):
         show_meal_plan_form()
+    elif st.session_state.get('show_recipes', False):
+        show_recipes_manager()
     elif st.session_state.get('view_plan'):
         show_plan_detail(st.session_state.view_plan)
     else:
@@ -477,6 +928,10 @@ if 'show_meal_plan_form' not in st.session_state:
     st.session_state.show_meal_plan_form = False
 if 'view_plan' not in st.session_state:
     st.session_state.view_plan = None
+if 'meal_plan_draft' not in st.session_state:
+    st.session_state.meal_plan_draft = None
+if 'show_recipes' not in st.session_state:
+    st.session_state.show_recipes = False
 
 if __name__ == "__main__":
     show_meal_plans()
\ No newline at end of file
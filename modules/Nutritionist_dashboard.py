@@ -6,29 +6,30 @@ import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import json
 import os
+from modules.Charts import cached_figure
+from modules.Appointments import appointments_table, current_nutritionist, load_nutritionists
+from core.aggregates import get_aggregates, UPCOMING_DAYS
+from core.appointments import get_appointment_book
+
+# Consultas exibidas no quadro de próximas consultas
+MAX_UPCOMING_APPOINTMENTS = 10
 
-@st.cache_data
 def load_dashboard_data():
-    """Carrega dados para o dashboard"""
-    # Dados simulados - em produção viriam de banco de dados
-    patients_data = {
-        'total_patients': 45,
-        'active_patients': 38,
-        'new_this_month': 8,
-        'appointments_today': 6,
-        'upcoming_appointments': 12
-    }
+    """Carrega os agregados do dashboard (mantidos a cada escrita)"""
+    aggregates = get_aggregates()
+    patients_data = aggregates.summary()
     
-    # Dados de evolução dos pacientes
-    evolution_data = pd.DataFrame({
-        'date': pd.date_range(start='2024-01-01', end='2024-12-31', freq='M'),
-        'weight_loss': [2.5, 3.1, 2.8, 4.2, 3.5, 2.9, 3.8, 4.1, 3.2, 2.7, 3.6, 4.0],
-        'adherence': [78, 82, 79, 85, 83, 80, 87, 89, 84, 81, 86, 88],
-        'new_patients': [3, 5, 4, 7, 6, 4, 8, 6, 5, 4, 7, 8]
-    })
+    # Evolução mensal dos pacientes (últimos 12 meses)
+    evolution_data = pd.DataFrame(aggregates.monthly_evolution(12))
+    evolution_data['date'] = pd.to_datetime(evolution_data['date'])
+    evolution_data[['weight_loss', 'adherence']] = evolution_data[['weight_loss', 'adherence']].astype(float)
     
     return patients_data, evolution_data
 
+def format_percent(value):
+    """Formata percentual opcional"""
+    return "—" if value is None else f"{value:.0f}%"
+
 def show_key_metrics(patients_data):
     """Exibe métricas principais"""
     col1, col2, col3, col4, col5 = st.columns(5)
@@ -41,106 +42,125 @@ def show_key_metrics(patients_data):
         )
     
     with col2:
+        total = patients_data['total_patients']
         st.metric(
             label="✅ Pacientes Ativos",
             value=patients_data['active_patients'],
-            delta="84% do total"
+            delta=f"{patients_data['active_patients'] / total * 100:.0f}% do total" if total else None,
+            delta_color="off"
         )
     
     with col3:
         st.metric(
             label="📅 Consultas Hoje",
-            value=patients_data['appointments_today'],
-            delta="6 de 8 agendadas"
+            value=patients_data['appointments_today']
         )
     
     with col4:
         st.metric(
             label="⏰ Próximas Consultas",
             value=patients_data['upcoming_appointments'],
-            delta="Esta semana"
+            delta="Próximos 7 dias",
+            delta_color="off"
         )
     
     with col5:
+        adherence, previous = patients_data['adherence'], patients_data['adherence_previous']
         st.metric(
             label="🎯 Taxa de Adesão",
-            value="85%",
-            delta="+3% vs mês anterior"
+            value=format_percent(adherence),
+            delta=f"{adherence - previous:+.0f}% vs mês anterior" if adherence is not None and previous is not None else None,
+            help="Dias com diário alimentar registrado / (pacientes com plano ativo × dias do mês)"
         )
 
+def build_weight_evolution_figure(evolution_data):
+    """Gráfico de linha da perda de peso média"""
+    fig = px.line(
+        evolution_data, 
+        x='date', 
+        y='weight_loss',
+        title='Perda de Peso Média (kg/mês)',
+        color_discrete_sequence=['#4CAF50']
+    )
+    fig.update_layout(
+        xaxis_title="Período",
+        yaxis_title="Perda de Peso (kg)",
+        showlegend=False
+    )
+    return fig
+
+def build_adherence_figure(evolution_data):
+    """Gráfico de barras da adesão mensal"""
+    fig = px.bar(
+        evolution_data, 
+        x='date', 
+        y='adherence',
+        title='Adesão Mensal (%)',
+        color='adherence',
+        color_continuous_scale='Greens'
+    )
+    fig.update_layout(
+        xaxis_title="Período",
+        yaxis_title="Taxa de Adesão (%)",
+        showlegend=False
+    )
+    return fig
+
 def show_evolution_charts(evolution_data):
     """Exibe gráficos de evolução"""
     col1, col2 = st.columns(2)
     
     with col1:
         st.markdown("#### 📈 Evolução Média de Peso dos Pacientes")
-        fig_weight = px.line(
-            evolution_data, 
-            x='date', 
-            y='weight_loss',
-            title='Perda de Peso Média (kg/mês)',
-            color_discrete_sequence=['#4CAF50']
-        )
-        fig_weight.update_layout(
-            xaxis_title="Período",
-            yaxis_title="Perda de Peso (kg)",
-            showlegend=False
-        )
-        st.plotly_chart(fig_weight, use_container_width=True)
+        st.plotly_chart(cached_figure(build_weight_evolution_figure, evolution_data), use_container_width=True)
     
     with col2:
         st.markdown("#### 📊 Taxa de Adesão ao Tratamento")
-        fig_adherence = px.bar(
-            evolution_data, 
-            x='date', 
-            y='adherence',
-            title='Adesão Mensal (%)',
-            color='adherence',
-            color_continuous_scale='Greens'
-        )
-        fig_adherence.update_layout(
-            xaxis_title="Período",
-            yaxis_title="Taxa de Adesão (%)",
-            showlegend=False
-        )
-        st.plotly_chart(fig_adherence, use_container_width=True)
+        st.plotly_chart(cached_figure(build_adherence_figure, evolution_data), use_container_width=True)
+
+def format_activity_time(timestamp):
+    """Horário para hoje, 'Ontem' ou a data"""
+    moment = datetime.fromisoformat(timestamp)
+    days_ago = (datetime.now().date() - moment.date()).days
+    if days_ago == 0:
+        return moment.strftime("%H:%M")
+    if days_ago == 1:
+        return "Ontem"
+    return moment.strftime("%d/%m")
 
 def show_recent_activities():
     """Exibe atividades recentes"""
     st.markdown("#### 🕒 Atividades Recentes")
     
-    activities = [
-        {"time": "10:30", "patient": "Maria Silva", "action": "Consulta realizada", "status": "✅"},
-        {"time": "09:15", "patient": "João Santos", "action": "Plano alimentar atualizado", "status": "📝"},
-        {"time": "08:45", "patient": "Ana Costa", "action": "Mensagem recebida", "status": "💬"},
-        {"time": "Ontem", "patient": "Carlos Lima", "action": "Meta de peso atingida", "status": "🎯"},
-        {"time": "Ontem", "patient": "Lucia Ferreira", "action": "Consulta agendada", "status": "📅"}
-    ]
+    activities = get_aggregates().recent_activities(5)
+    
+    if not activities:
+        st.info("Nenhuma atividade registrada ainda.")
+        return
     
     for activity in activities:
         col1, col2, col3, col4 = st.columns([1, 3, 4, 1])
         with col1:
-            st.text(activity["time"])
+            st.text(format_activity_time(activity["quando"]))
         with col2:
-            st.text(activity["patient"])
+            st.text(activity["paciente"])
         with col3:
-            st.text(activity["action"])
+            st.text(activity["acao"])
         with col4:
-            st.text(activity["status"])
+            st.text(activity["icone"])
 
 def show_upcoming_appointments():
     """Exibe próximas consultas"""
     st.markdown("#### 📅 Próximas Consultas")
     
-    appointments = pd.DataFrame({
-        'Horário': ['14:00', '15:30', '16:00', '17:00'],
-        'Paciente': ['Roberto Alves', 'Fernanda Lima', 'Pedro Costa', 'Julia Santos'],
-        'Tipo': ['Retorno', 'Primeira consulta', 'Reavaliação', 'Acompanhamento'],
-        'Status': ['Confirmado', 'Aguardando', 'Confirmado', 'Confirmado']
-    })
+    upcoming = get_appointment_book().upcoming(current_nutritionist(), days=UPCOMING_DAYS, limit=MAX_UPCOMING_APPOINTMENTS)
+    
+    if not upcoming:
+        st.info(f"📭 Nenhuma consulta nos próximos {UPCOMING_DAYS} dias.")
+        return
     
     st.dataframe(
-        appointments,
+        appointments_table(upcoming, load_nutritionists()),
         use_container_width=True,
         hide_index=True
     )
@@ -175,33 +195,42 @@ def show_patient_alerts():
     """Exibe alertas importantes sobre pacientes"""
     st.markdown("#### ⚠️ Alertas Importantes")
     
+    counts = get_aggregates().alerts()
+    
     alerts = [
-        {"type": "warning", "message": "3 pacientes não registraram alimentação há 2 dias"},
-        {"type": "info", "message": "5 pacientes próximos da meta de peso"},
-        {"type": "success", "message": "8 pacientes atingiram metas esta semana"},
-        {"type": "error", "message": "1 paciente com baixa adesão ao tratamento"}
+        {"type": "warning", "count": counts['sem_diario'], "message": "pacientes com plano não registraram alimentação há 2 dias ou mais"},
+        {"type": "info", "count": counts['perto_da_meta'], "message": "pacientes a até 2 kg da meta de peso"},
+        {"type": "success", "count": counts['perderam_peso_semana'], "message": "pacientes perderam peso na última semana"},
+        {"type": "error", "count": counts['sem_plano'], "message": "pacientes ativos sem plano alimentar"}
     ]
+    alerts = [alert for alert in alerts if alert["count"]]
+    
+    if not alerts:
+        st.success("Nenhum alerta no momento.")
     
     for alert in alerts:
+        message = f"{alert['count']} {alert['message']}"
         if alert["type"] == "warning":
-            st.warning(alert["message"])
+            st.warning(message)
         elif alert["type"] == "info":
-            st.info(alert["message"])
+            st.info(message)
         elif alert["type"] == "success":
-            st.success(alert["message"])
+            st.success(message)
         elif alert["type"] == "error":
-            st.error(alert["message"])
+            st.error(message)
 
-def show_performance_summary():
+def show_performance_summary(evolution_data):
     """Exibe resumo de performance do nutricionista"""
     st.markdown("#### 🎯 Seu Desempenho Este Mês")
     
+    month = evolution_data.iloc[-1]
+    
     performance_data = {
-        'Consultas Realizadas': 32,
-        'Planos Criados': 15,
-        'Metas Atingidas pelos Pacientes': 28,
-        'Taxa de Satisfação': '4.8/5.0',
-        'Receita Gerada': 'R$ 8.400'
+        'Consultas Agendadas': int(month['appointments']),
+        'Planos Criados': int(month['plans_created']),
+        'Novos Pacientes': int(month['new_patients']),
+        'Perda de Peso Média': "—" if pd.isna(month['weight_loss']) else f"{month['weight_loss']:.1f} kg",
+        'Adesão ao Diário': "—" if pd.isna(month['adherence']) else f"{month['adherence']:.0f}%"
     }
     
     col1, col2 = st.columns(2)
@@ -261,7 +290,7 @@ def show_nutritionist_dashboard():
         st.markdown("---")
         
         # Performance
-        show_performance_summary()
+        show_performance_summary(evolution_data)
     
     # Seção de dicas e recursos
     st.markdown("---")
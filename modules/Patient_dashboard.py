@@ -4,8 +4,21 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta, date
-import json
 import os
+import threading
+from modules.Meal_plans import MealPlanManager, NUTRIENT_KEYS, calculate_meal_vectors, get_food_index, nutrient_vector
+from modules.Glycemic import classify_glycemic_load, meal_glycemic_index
+from modules.Progress import record_measurement, load_progress_series, show_progress_chart, show_measurement_form, CHART_WIDTH_PX
+from core.timeseries import get_store, SERIES_COLUMNS
+from core.aggregates import get_aggregates
+from core.appointments import get_appointment_book
+from core.storage import BARRIER, updating
+from core.formats import load_data, save_data
+from modules.Appointments import load_nutritionists
+from modules.Patient_management import rehydrate_patient
+
+# Sessões simultâneas não importam o progresso antigo ao mesmo tempo
+_MIGRATION_LOCK = threading.Lock()
 
 class PatientDashboardManager:
     def __init__(self):
@@ -13,74 +26,96 @@ class PatientDashboardManager:
         self.patient_progress_file = 'data/patient_progress.json'
         self.appointments_file = 'data/appointments.json'
         self.ensure_data_directory()
+        self.migrate_legacy_progress()
     
     def ensure_data_directory(self):
         """Garante que o diretório de dados existe"""
         os.makedirs('data', exist_ok=True)
     
-    @st.cache_data
-    def load_food_diary(_self, patient_id):
+    def migrate_legacy_progress(self):
+        """Move o antigo patient_progress.json para as séries temporais (uma única vez)
+        
+        A importação ignora medidas já presentes, então uma migração
+        interrompida antes de renomear o arquivo pode ser repetida.
+        """
+        if not os.path.exists(self.patient_progress_file):
+            return
+        with _MIGRATION_LOCK:
+            if not os.path.exists(self.patient_progress_file):
+                return
+            get_store().import_progress_json(self.patient_progress_file)
+            with BARRIER.writing(self.patient_progress_file):
+                os.replace(self.patient_progress_file, self.patient_progress_file + '.migrado')
+    
+    def load_food_diary(self, patient_id):
         """Carrega diário alimentar do paciente"""
-        if os.path.exists(_self.food_diary_file):
-            with open(_self.food_diary_file, 'r', encoding='utf-8') as f:
-                all_diaries = json.load(f)
-                return all_diaries.get(patient_id, {})
-        return {}
+        rehydrate_patient(patient_id)
+        return self._load_food_diary(patient_id)
     
     @st.cache_data
-    def load_patient_progress(_self, patient_id):
-        """Carrega progresso do paciente"""
-        if os.path.exists(_self.patient_progress_file):
-            with open(_self.patient_progress_file, 'r', encoding='utf-8') as f:
-                all_progress = json.load(f)
-                return all_progress.get(patient_id, {})
+    def _load_food_diary(_self, patient_id):
+        if os.path.exists(_self.food_diary_file):
+            return load_data(_self.food_diary_file).get(patient_id, {})
         return {}
     
+    def load_patient_progress(self, patient_id, start=None, end=None):
+        """Carrega medidas do paciente (séries temporais em data/timeseries)"""
+        rehydrate_patient(patient_id)
+        return load_progress_series(patient_id, start=start, end=end)
+    
+    def get_latest_measurements(self, patient_id):
+        """Última medida registrada de cada coluna (None se não houver)"""
+        rehydrate_patient(patient_id)
+        return get_store().latest(patient_id)
+    
     def save_food_entry(self, patient_id, date_str, meal_type, food_data):
         """Salva entrada no diário alimentar"""
-        # Carregar dados existentes
-        all_diaries = {}
-        if os.path.exists(self.food_diary_file):
-            with open(self.food_diary_file, 'r', encoding='utf-8') as f:
-                all_diaries = json.load(f)
+        rehydrate_patient(patient_id)
         
-        # Inicializar estrutura se necessário
-        if patient_id not in all_diaries:
-            all_diaries[patient_id] = {}
-        if date_str not in all_diaries[patient_id]:
-            all_diaries[patient_id][date_str] = {}
-        if meal_type not in all_diaries[patient_id][date_str]:
-            all_diaries[patient_id][date_str][meal_type] = []
-        
-        # Adicionar nova entrada
-        all_diaries[patient_id][date_str][meal_type].append({
-            **food_data,
-            'timestamp': datetime.now().isoformat()
-        })
+        with updating(self.food_diary_file):
+            # Carregar dados existentes
+            all_diaries = {}
+            if os.path.exists(self.food_diary_file):
+                all_diaries = load_data(self.food_diary_file)
+            
+            # Inicializar estrutura se necessário
+            if patient_id not in all_diaries:
+                all_diaries[patient_id] = {}
+            if date_str not in all_diaries[patient_id]:
+                all_diaries[patient_id][date_str] = {}
+            if meal_type not in all_diaries[patient_id][date_str]:
+                all_diaries[patient_id][date_str][meal_type] = []
+            
+            # Adicionar nova entrada
+            all_diaries[patient_id][date_str][meal_type].append({
+                **food_data,
+                'timestamp': datetime.now().isoformat()
+            })
+            
+            # Salvar
+            save_data(self.food_diary_file, all_diaries)
         
-        # Salvar
-        with open(self.food_diary_file, 'w', encoding='utf-8') as f:
-            json.dump(all_diaries, f, indent=2, ensure_ascii=False, default=str)
+        PatientDashboardManager._load_food_diary.clear()
+        get_aggregates().diary_entry(patient_id, date_str)
     
     def save_progress_entry(self, patient_id, progress_data):
-        """Salva entrada de progresso"""
-        # Carregar dados existentes
-        all_progress = {}
-        if os.path.exists(self.patient_progress_file):
-            with open(self.patient_progress_file, 'r', encoding='utf-8') as f:
-                all_progress = json.load(f)
-        
-        # Inicializar se necessário
-        if patient_id not in all_progress:
-            all_progress[patient_id] = []
-        
-        # Adicionar nova entrada
-        progress_data['timestamp'] = datetime.now().isoformat()
-        all_progress[patient_id].append(progress_data)
-        
-        # Salvar
-        with open(self.patient_progress_file, 'w', encoding='utf-8') as f:
-            json.dump(all_progress, f, indent=2, ensure_ascii=False, default=str)
+        """Salva entrada de progresso (peso, cintura e/ou gordura corporal)"""
+        rehydrate_patient(patient_id)
+        return record_measurement(
+            patient_id,
+            progress_data.get('data'),
+            **{name: progress_data.get(name) for name in SERIES_COLUMNS}
+        )
+
+def calculate_diary_day_nutrition(diary_day, food_index=None):
+    """Calcula nutrientes e carga glicêmica por refeição de um dia do diário"""
+    meals = {meal_type: {'foods': [entry for entry in entries if entry.get('key')]} for meal_type, entries in diary_day.items()}
+    meal_names, meal_vectors = calculate_meal_vectors(meals, food_index)
+    
+    by_meal = {name: dict(zip(NUTRIENT_KEYS, vector.round(1).tolist())) for name, vector in zip(meal_names, meal_vectors)}
+    total = dict(zip(NUTRIENT_KEYS, meal_vectors.sum(axis=0).round(1).tolist()))
+    
+    return by_meal, total
 
 def get_patient_data():
     """Simula dados do paciente logado"""
@@ -99,8 +134,7 @@ def show_patient_metrics():
     """Exibe métricas principais do paciente"""
     patient_data = get_patient_data()
     
-    # Simular dados de progresso
-    current_weight = 71.2
+    current_weight = PatientDashboardManager().get_latest_measurements(patient_data['id'])['peso'] or patient_data['peso_inicial']
     weight_lost = patient_data['peso_inicial'] - current_weight
     weight_to_goal = current_weight - patient_data['peso_meta']
     current_bmi = current_weight / (patient_data['altura'] ** 2)
@@ -110,7 +144,7 @@ def show_patient_metrics():
     with col1:
         st.metric(
             "Peso Atual",
-            f"{current_weight} kg",
+            f"{current_weight:.1f} kg",
             f"-{weight_lost:.1f} kg"
         )
     
@@ -144,36 +178,13 @@ def show_patient_metrics():
             "dias"
         )
 
-def show_weight_progress_chart():
+def show_weight_progress_chart(patient_id, goal_weight=None):
     """Exibe gráfico de evolução de peso"""
-    # Dados simulados de evolução
-    dates = pd.date_range(start='2024-01-15', end=datetime.now().date(), freq='W')
-    weights = [75.0, 74.5, 74.0, 73.2, 72.8, 72.1, 71.8, 71.2][:len(dates)]
-    
-    progress_df = pd.DataFrame({
-        'Data': dates,
-        'Peso': weights
-    })
-    
-    fig = px.line(
-        progress_df,
-        x='Data',
-        y='Peso',
-        title='📈 Evolução do Peso',
-        color_discrete_sequence=['#4CAF50']
-    )
-    
-    # Adicionar linha da meta
-    fig.add_hline(y=65.0, line_dash="dash", line_color="red", 
-                  annotation_text="Meta: 65kg", annotation_position="bottom right")
+    # O gráfico ocupa a coluna de 2/3 da página
+    show_progress_chart(patient_id, 'peso', goal=goal_weight, title='📈 Evolução do Peso', width_px=CHART_WIDTH_PX * 2 // 3)
     
-    fig.update_layout(
-        xaxis_title="Data",
-        yaxis_title="Peso (kg)",
-        showlegend=False
-    )
-    
-    st.plotly_chart(fig, use_container_width=True)
+    with st.expander("⚖️ Registrar peso"):
+        show_measurement_form(patient_id, key_prefix="weigh_in", columns=('peso',))
 
 def show_todays_plan():
     """Exibe plano alimentar do dia"""
@@ -255,6 +266,9 @@ def show_food_diary_quick_add():
     """Formulário rápido para adicionar ao diário"""
     st.markdown("### 📝 Adicionar ao Diário Alimentar")
     
+    patient_data = get_patient_data()
+    food_index = get_food_index(MealPlanManager().load_foods_database())
+    
     with st.form("quick_food_entry"):
         col1, col2, col3 = st.columns(3)
         
@@ -265,40 +279,76 @@ def show_food_diary_quick_add():
             )
         
         with col2:
-            food_item = st.text_input("Alimento")
+            food_key = st.selectbox(
+                "Alimento",
+                options=list(food_index.keys()),
+                format_func=lambda x: food_index[x]['nome']
+            )
         
         with col3:
-            quantity = st.text_input("Quantidade", placeholder="ex: 100g, 1 unidade")
+            quantity = st.number_input("Quantidade (g)", min_value=0, max_value=2000, value=100, step=10)
         
         observations = st.text_area("Observações (opcional)", placeholder="Como se sentiu, local, etc.")
         
         if st.form_submit_button("➕ Adicionar", use_container_width=True):
-            if food_item:
-                # Simular salvamento
-                st.success(f"✅ {food_item} adicionado ao {meal_type}!")
+            if food_key and quantity > 0:
+                food_data = food_index[food_key]
+                PatientDashboardManager().save_food_entry(
+                    patient_data['id'],
+                    date.today().isoformat(),
+                    meal_type,
+                    {
+                        'name': food_data['nome'],
+                        'key': food_key,
+                        'quantity': quantity,
+                        'nutrition': dict(zip(NUTRIENT_KEYS, nutrient_vector(food_data).tolist())),
+                        'observacoes': observations
+                    }
+                )
+                st.success(f"✅ {food_data['nome']} adicionado ao {meal_type}!")
             else:
-                st.error("Por favor, informe o alimento.")
+                st.error("Por favor, informe o alimento e a quantidade.")
+    
+    show_diary_glycemic_summary(patient_data['id'], food_index)
+
+def show_diary_glycemic_summary(patient_id, food_index):
+    """Exibe carga glicêmica do dia registrada no diário"""
+    diary_day = PatientDashboardManager().load_food_diary(patient_id).get(date.today().isoformat(), {})
+    
+    if not diary_day:
+        return
+    
+    by_meal, total = calculate_diary_day_nutrition(diary_day, food_index)
+    category, color = classify_glycemic_load(total['carga_glicemica'], daily=True)
+    
+    st.markdown(f"**🩸 Carga glicêmica de hoje:** <span style='color: {color}'>{total['carga_glicemica']:.0f} ({category})</span> | IG médio: {meal_glycemic_index(total):.0f}", unsafe_allow_html=True)
+    
+    for meal_type, values in by_meal.items():
+        st.caption(f"{meal_type}: CG {values['carga_glicemica']:.1f} ({classify_glycemic_load(values['carga_glicemica'])[0]})")
 
-def show_next_appointment():
+def show_next_appointment(patient_id):
     """Exibe próxima consulta"""
     st.markdown("### 📅 Próxima Consulta")
     
-    # Dados simulados
-    next_appointment = {
-        'date': '2024-09-10',
-        'time': '14:30',
-        'type': 'Consulta de retorno',
-        'nutritionist': 'Dra. Ana Nutricionista',
-        'location': 'Consultório - Sala 2'
-    }
+    next_appointment = get_appointment_book().next_for_patient(patient_id)
+    
+    if next_appointment is None:
+        st.info("📭 Nenhuma consulta agendada.")
+        if st.button("📅 Ver minhas consultas", use_container_width=True):
+            st.session_state.current_page = 'my_appointments'
+            st.rerun()
+        return
+    
+    nutritionists = load_nutritionists()
+    start = datetime.fromisoformat(next_appointment['inicio'])
     
     col1, col2 = st.columns([2, 1])
     
     with col1:
-        st.markdown(f"**📅 {next_appointment['date']} às {next_appointment['time']}**")
-        st.write(f"**Tipo:** {next_appointment['type']}")
-        st.write(f"**Nutricionista:** {next_appointment['nutritionist']}")
-        st.write(f"**Local:** {next_appointment['location']}")
+        st.markdown(f"**📅 {start:%d/%m/%Y} às {start:%H:%M}**")
+        st.write(f"**Tipo:** {next_appointment['tipo']}")
+        st.write(f"**Nutricionista:** {nutritionists.get(next_appointment['nutricionista'], next_appointment['nutricionista'])}")
+        st.write(f"**Local:** {next_appointment.get('local') or '-'}")
     
     with col2:
         if st.button("💬 Enviar Mensagem", use_container_width=True):
@@ -306,7 +356,8 @@ def show_next_appointment():
             st.rerun()
         
         if st.button("📅 Reagendar", use_container_width=True):
-            st.info("Funcionalidade de reagendamento em desenvolvimento")
+            st.session_state.current_page = 'my_appointments'
+            st.rerun()
 
 def show_achievements_and_tips():
     """Exibe conquistas e dicas"""
@@ -459,7 +510,7 @@ def show_patient_dashboard():
     
     with col1:
         # Gráfico de evolução
-        show_weight_progress_chart()
+        show_weight_progress_chart(patient_data['id'], patient_data['peso_meta'])
         
         st.markdown("---")
         
@@ -468,7 +519,7 @@ def show_patient_dashboard():
     
     with col2:
         # Próxima consulta
-        show_next_appointment()
+        show_next_appointment(patient_data['id'])
         
         st.markdown("---")
         
@@ -1,11 +1,34 @@
 # modules/patient_management.py
 import streamlit as st
 import pandas as pd
-import json
 import os
 from datetime import datetime, date
 import plotly.express as px
 import plotly.graph_objects as go
+from modules.Calculators import (
+    calculate_patient_equations_batch, calculate_patient_growth_batch,
+    show_equation_comparison, show_growth_reference_notice, classify_bmi
+)
+from modules.Tasks import build_equation_report, build_growth_report
+from modules.Jobs import submit_job, current_job, forget_job, show_job_result
+from core.jobs import FINISHED_STATUSES
+from modules.Progress import record_measurement, show_patient_evolution
+from core.growth import GROWTH_INDICATORS, DAYS_PER_MONTH
+from core.aggregates import get_aggregates
+from core.storage import file_version, updating
+from core.formats import load_data, save_data
+from core.archive import get_archive, next_id
+
+# Grupos maiores que isto têm os relatórios gerados em segundo plano
+REPORT_INLINE_LIMIT = 500
+
+def rehydrate_patient(patient_id):
+    """Devolve aos arquivos em uso um paciente arquivado; False se ele não estiver no arquivo"""
+    if patient_id is None or patient_id not in get_archive():
+        return False
+    get_archive().rehydrate(patient_id)
+    st.cache_data.clear()
+    return True
 
 class PatientManager:
     def __init__(self):
@@ -16,54 +39,78 @@ class PatientManager:
         """Garante que o diretório de dados existe"""
         os.makedirs('data', exist_ok=True)
     
+    def load_patients(self):
+        """Carrega dados dos pacientes (pacientes arquivados não entram; ver core/archive.py)"""
+        return self._load_patients(file_version(self.data_file))
+    
     @st.cache_data
-    def load_patients(_self):
-        """Carrega dados dos pacientes"""
+    def _load_patients(_self, version):
         if os.path.exists(_self.data_file):
-            with open(_self.data_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return load_data(_self.data_file)
         return {}
     
     def save_patients(self, patients_data):
         """Salva dados dos pacientes"""
-        with open(self.data_file, 'w', encoding='utf-8') as f:
-            json.dump(patients_data, f, indent=2, ensure_ascii=False, default=str)
+        save_data(self.data_file, patients_data)
     
     def add_patient(self, patient_data):
         """Adiciona novo paciente"""
-        patients = self.load_patients()
-        patient_id = f"PAC_{len(patients) + 1:04d}"
-        patient_data['id'] = patient_id
-        patient_data['created_at'] = datetime.now().isoformat()
-        patient_data['updated_at'] = datetime.now().isoformat()
-        patients[patient_id] = patient_data
-        self.save_patients(patients)
+        with updating(self.data_file):
+            patients = self.load_patients()
+            patient_id = next_id('PAC', patients, get_archive().reserved_ids())
+            patient_data['id'] = patient_id
+            patient_data['created_at'] = datetime.now().isoformat()
+            patient_data['updated_at'] = datetime.now().isoformat()
+            patients[patient_id] = patient_data
+            self.save_patients(patients)
+        get_aggregates().patient_saved(patient_id, patient_data)
+        self.record_measurements(patient_id, patient_data)
         return patient_id
     
     def update_patient(self, patient_id, patient_data):
         """Atualiza dados do paciente"""
-        patients = self.load_patients()
-        if patient_id in patients:
+        with updating(self.data_file):
+            patients = self.load_patients()
+            if patient_id not in patients:
+                return False
             patient_data['updated_at'] = datetime.now().isoformat()
-            patients[patient_id] = {**patients[patient_id], **patient_data}
+            previous = patients[patient_id]
+            patients[patient_id] = {**previous, **patient_data}
             self.save_patients(patients)
-            return True
-        return False
+        
+        get_aggregates().patient_saved(patient_id, patients[patient_id], previous)
+        self.record_measurements(patient_id, patient_data, previous)
+        return True
+    
+    def record_measurements(self, patient_id, patient_data, previous=None):
+        """Registra na evolução as medidas do cadastro que mudaram"""
+        previous = previous or {}
+        record_measurement(patient_id, **{
+            name: patient_data.get(name)
+            for name in ('peso', 'gordura_corporal')
+            if patient_data.get(name) != previous.get(name)
+        })
     
     def get_patient(self, patient_id):
-        """Obtém dados de um paciente específico"""
+        """Obtém dados de um paciente específico (trazendo-o de volta do arquivo, se preciso)"""
         patients = self.load_patients()
+        if patient_id not in patients and rehydrate_patient(patient_id):
+            patients = self.load_patients()
         return patients.get(patient_id)
     
     def delete_patient(self, patient_id):
         """Remove paciente (soft delete)"""
-        patients = self.load_patients()
-        if patient_id in patients:
+        with updating(self.data_file):
+            patients = self.load_patients()
+            if patient_id not in patients:
+                return False
+            previous = dict(patients[patient_id])
             patients[patient_id]['status'] = 'inativo'
-            patients[patient_id]['updated_at'] = datetime.now().isoformat()
+            patients[patient_id]['updated_at'] = patients[patient_id]['inativado_em'] = datetime.now().isoformat()
             self.save_patients(patients)
-            return True
-        return False
+        
+        get_aggregates().patient_saved(patient_id, patients[patient_id], previous)
+        return True
 
 def show_patient_form(patient_data=None):
     """Formulário para cadastro/edição de paciente"""
@@ -124,7 +171,7 @@ def show_patient_form(patient_data=None):
             )
         
         st.markdown("#### 📊 Dados Antropométricos")
-        col3, col4, col5 = st.columns(3)
+        col3, col4, col5, col_bf = st.columns(4)
         
         with col3:
             peso = st.number_input(
@@ -149,6 +196,16 @@ def show_patient_form(patient_data=None):
             imc = peso / (altura ** 2) if altura > 0 else 0
             st.metric("IMC Calculado", f"{imc:.1f}")
         
+        with col_bf:
+            gordura_corporal = st.number_input(
+                "Gordura Corporal (%)",
+                min_value=0.0,
+                max_value=70.0,
+                step=0.1,
+                value=float(patient_data.get('gordura_corporal') or 0.0) if is_edit else 0.0,
+                help="Opcional. Usado nas equações de TMB por massa magra."
+            )
+        
         st.markdown("#### 🏥 Informações Médicas")
         col6, col7 = st.columns(2)
         
@@ -211,6 +268,7 @@ def show_patient_form(patient_data=None):
                     'peso': peso,
                     'altura': altura,
                     'imc': round(imc, 1),
+                    'gordura_corporal': gordura_corporal or None,
                     'condicoes_medicas': condicoes_medicas,
                     'medicamentos': medicamentos,
                     'alergias_alimentares': alergias_alimentares,
@@ -262,10 +320,16 @@ def show_patient_list():
             st.session_state.edit_patient = None
             st.rerun()
     
+    # Pacientes arquivados (lidos do índice do arquivo) entram quando o filtro inclui os inativos
+    listed = patients
+    if filter_status != 'ativo':
+        archived = {patient_id: entry['paciente'] for patient_id, entry in get_archive().index().items() if patient_id not in patients}
+        listed = {**patients, **archived} if archived else patients
+    
     # Processar dados para exibição
-    if patients:
+    if listed:
         patients_list = []
-        for patient_id, patient_data in patients.items():
+        for patient_id, patient_data in listed.items():
             # Aplicar filtros
             if search_name and search_name.lower() not in patient_data.get('nome', '').lower():
                 continue
@@ -289,6 +353,7 @@ def show_patient_list():
                 'IMC': patient_data.get('imc', 0),
                 'Telefone': patient_data.get('telefone', ''),
                 'Status': patient_data.get('status', 'ativo'),
+                'Arquivado': patient_id not in patients,
                 'Última Atualização': patient_data.get('updated_at', '')[:10] if patient_data.get('updated_at') else ''
             })
         
@@ -313,6 +378,8 @@ def show_patient_list():
                     with col3:
                         status_color = "🟢" if patient['Status'] == 'ativo' else "🔴"
                         st.markdown(f"{status_color} {patient['Status'].title()}")
+                        if patient['Arquivado']:
+                            st.caption("📦 Arquivado")
                     
                     with col4:
                         if st.button("👁️", key=f"view_{patient['ID']}", help="Visualizar"):
@@ -328,17 +395,109 @@ def show_patient_list():
                                 st.rerun()
                         
                         with col_delete:
-                            if st.button("🗑️", key=f"delete_{patient['ID']}", help="Inativar"):
+                            if not patient['Arquivado'] and st.button("🗑️", key=f"delete_{patient['ID']}", help="Inativar"):
                                 if manager.delete_patient(patient['ID']):
                                     st.success("Paciente inativado!")
                                     st.rerun()
                     
                     st.divider()
+            
+            filtered_patients = {patient['ID']: listed[patient['ID']] for patient in patients_list}
+            show_cohort_equation_report(filtered_patients)
+            show_cohort_growth_report(filtered_patients)
         else:
             st.info("Nenhum paciente encontrado com os filtros aplicados.")
     else:
         st.info("Nenhum paciente cadastrado ainda.")
 
+def show_growth_indicators(growth_row):
+    """Exibe escores-z e percentis das curvas de crescimento de um paciente"""
+    st.markdown("#### 📈 Curvas de Crescimento (OMS)")
+    
+    columns = st.columns(len(GROWTH_INDICATORS))
+    
+    for column, (indicator, info) in zip(columns, GROWTH_INDICATORS.items()):
+        with column:
+            z = growth_row[f'z_{indicator}']
+            if pd.isna(z):
+                st.metric(info['nome'], "—", "Sem referência", delta_color="off")
+            else:
+                st.metric(info['nome'], f"z = {z:+.2f}", f"Percentil {growth_row[f'percentil_{indicator}']:.0f}", delta_color="off")
+    
+    st.caption(f"Classificação IMC/idade: {growth_row['classificacao_imc']}")
+    show_growth_reference_notice()
+
+def background_report(key, kind, patients):
+    """Relatório de um grupo grande gerado em segundo plano (None enquanto não estiver pronto)"""
+    job = current_job(key)
+    if job is not None and job['parametros']['pacientes'] != list(patients):
+        forget_job(key)
+    
+    job = show_job_result(key)
+    if job is not None:
+        return pd.read_csv(job['resultado']['arquivo'], index_col=0)
+    job = current_job(key)
+    if job is None or job['status'] in FINISHED_STATUSES:
+        st.caption(f"Grupo grande ({len(patients)} pacientes): o relatório é gerado em segundo plano.")
+        if st.button("⚙️ Gerar relatório", key=f"{key}_submit"):
+            submit_job(key, kind, {'pacientes': list(patients)})
+            st.rerun()
+    return None
+
+def show_cohort_growth_report(patients):
+    """Relatório das curvas de crescimento dos pacientes pediátricos"""
+    report = None
+    if len(patients) <= REPORT_INLINE_LIMIT:
+        report = build_growth_report(pd.DataFrame.from_dict(patients, orient='index'))
+        if report.empty:
+            return
+    
+    title = f"({len(report)} pacientes com menos de 19 anos)" if report is not None else "(pacientes com menos de 19 anos)"
+    with st.expander(f"👶 Curvas de Crescimento {title}"):
+        if report is None:
+            report = background_report('cohort_growth', 'relatorio_crescimento', patients)
+            if report is None:
+                return
+            st.caption(f"{len(report)} pacientes com menos de 19 anos")
+        
+        show_growth_reference_notice()
+        st.dataframe(report, use_container_width=True)
+        
+        st.download_button(
+            "📥 Baixar relatório (CSV)",
+            data=report.to_csv().encode('utf-8'),
+            file_name="relatorio_curvas_crescimento.csv",
+            mime="text/csv",
+            key="cohort_growth_download"
+        )
+
+def show_cohort_equation_report(patients):
+    """Relatório comparando as equações de TMB para um grupo de pacientes"""
+    with st.expander(f"🔥 Relatório de TMB por Equação ({len(patients)} pacientes)"):
+        if len(patients) <= REPORT_INLINE_LIMIT:
+            report = build_equation_report(pd.DataFrame.from_dict(patients, orient='index'))
+        else:
+            report = background_report('cohort_equations', 'relatorio_tmb', patients)
+            if report is None:
+                return
+        
+        st.dataframe(report, use_container_width=True)
+        
+        # Resumo da coorte por equação
+        equations = report.drop(columns=['Nome', 'Amplitude (kcal)'], errors='ignore')
+        summary = equations.agg(['mean', 'std', 'min', 'max']).T.round(1)
+        summary.columns = ['Média', 'Desvio padrão', 'Mínimo', 'Máximo']
+        st.markdown("**Resumo por equação (kcal/dia)**")
+        st.dataframe(summary, use_container_width=True)
+        
+        st.download_button(
+            "📥 Baixar relatório (CSV)",
+            data=report.to_csv().encode('utf-8'),
+            file_name="relatorio_tmb_equacoes.csv",
+            mime="text/csv",
+            key="cohort_equations_download"
+        )
+
 def show_patient_detail(patient_id):
     """Exibe detalhes de um paciente específico"""
     manager = PatientManager()
@@ -399,20 +558,24 @@ def show_patient_detail(patient_id):
         
         with col3:
             imc = patient.get('imc', 0)
-            if imc < 18.5:
-                imc_status = "Abaixo do peso"
-                imc_color = "blue"
-            elif imc < 25:
-                imc_status = "Peso normal"
-                imc_color = "green"
-            elif imc < 30:
-                imc_status = "Sobrepeso"
-                imc_color = "orange"
-            else:
-                imc_status = "Obesidade"
-                imc_color = "red"
+            nascimento = datetime.fromisoformat(patient.get('data_nascimento', '1990-01-01'))
+            idade_meses = (datetime.now() - nascimento).days / DAYS_PER_MONTH
+            
+            # Menores de 19 anos são classificados pelas curvas da OMS
+            imc_status = classify_bmi(imc, idade_meses, patient.get('sexo'))['categoria']
             
             st.metric("IMC", f"{imc}", delta=imc_status)
+        
+        growth = calculate_patient_growth_batch(pd.DataFrame([patient]))
+        if not growth.empty:
+            show_growth_indicators(growth.iloc[0])
+        
+        st.markdown("#### 🔥 Taxa Metabólica Basal por Equação")
+        equations = calculate_patient_equations_batch(pd.DataFrame([patient]))
+        show_equation_comparison(equations.iloc[0].to_dict(), key_prefix=f"patient_{patient_id}_equations")
+        
+        if not patient.get('gordura_corporal'):
+            st.caption("Registre o percentual de gordura corporal para as equações de Katch-McArdle e Cunningham.")
     
     with tab3:
         st.markdown("#### 🏥 Informações Médicas")
@@ -435,7 +598,7 @@ def show_patient_detail(patient_id):
     
     with tab4:
         st.markdown("#### 📈 Evolução do Paciente")
-        st.info("Em desenvolvimento: Gráficos de evolução de peso, medidas e adesão ao tratamento.")
+        show_patient_evolution(patient_id, patient)
 
 def show_patient_management():
     """Função principal da gestão de pacientes"""
@@ -0,0 +1,155 @@
+# modules/progress.py
+import streamlit as st
+import pandas as pd
+import plotly.graph_objects as go
+from datetime import date, datetime
+from core.timeseries import get_store, SERIES_COLUMNS, RESAMPLE_FREQUENCIES
+from core.downsample import downsample_series, point_budget
+from core.cache import memoize
+from core.aggregates import get_aggregates
+from modules.Charts import cached_figure
+
+# Rótulos e unidades das medidas acompanhadas
+SERIES_LABELS = {
+    'peso': "Peso (kg)",
+    'cintura': "Cintura (cm)",
+    'gordura_corporal': "Gordura corporal (%)"
+}
+
+# Largura aproximada (pixels) de um gráfico em largura total da página
+CHART_WIDTH_PX = 900
+
+# Séries reduzidas guardadas em memória (por paciente, medida e versão)
+DOWNSAMPLE_CACHE_SIZE = 128
+
+def record_measurement(patient_id, timestamp=None, **values):
+    """Registra uma medida do paciente; valores vazios ou zero são ignorados"""
+    values = {name: value for name, value in values.items() if value}
+    if values:
+        get_store().append(patient_id, timestamp, **values)
+        get_aggregates().measurement(patient_id, timestamp, values)
+    return bool(values)
+
+def load_progress_series(patient_id, freq=None, start=None, end=None):
+    """Série de medidas do paciente, opcionalmente reamostrada ('D', 'W' ou 'M')"""
+    store = get_store()
+    if freq:
+        return store.resample(patient_id, freq, start, end)
+    return store.query(patient_id, start, end)
+
+@memoize(maxsize=DOWNSAMPLE_CACHE_SIZE)
+def downsample_progress(patient_id, column, freq, max_points, version):
+    """Série de uma medida reduzida a max_points pontos (LTTB + envelope mín/máx)
+    
+    version (tamanho e modificação do arquivo) faz parte da chave do cache,
+    então uma nova medida invalida a série reduzida.
+    """
+    series = load_progress_series(patient_id, freq)
+    return downsample_series(series['timestamp'], series[column], max_points)
+
+def get_chart_points(patient_id, column, freq=None, width_px=CHART_WIDTH_PX):
+    """Pontos do gráfico de uma medida, de acordo com a largura disponível"""
+    return downsample_progress(patient_id, column, freq, point_budget(width_px), get_store().version(patient_id))
+
+def build_progress_figure(points, column, goal=None, title=None):
+    """Gráfico de linha de uma medida (pontos de get_chart_points), com linha opcional da meta"""
+    fig = go.Figure()
+    envelope = points['envelope']
+    
+    if envelope is not None:
+        # Faixa mínimo/máximo mantém visíveis os picos removidos da linha
+        fig.add_trace(go.Scatter(x=envelope['x'], y=envelope['max'], mode='lines', line=dict(width=0), hoverinfo='skip'))
+        fig.add_trace(go.Scatter(x=envelope['x'], y=envelope['min'], mode='lines', line=dict(width=0), fill='tonexty',
+                                 fillcolor='rgba(76, 175, 80, 0.2)', hoverinfo='skip'))
+    
+    fig.add_trace(go.Scatter(
+        x=points['x'],
+        y=points['y'],
+        mode='lines' if envelope is not None else 'lines+markers',
+        line=dict(color='#4CAF50'),
+        name=SERIES_LABELS[column]
+    ))
+    
+    if goal:
+        fig.add_hline(y=goal, line_dash="dash", line_color="red",
+                      annotation_text=f"Meta: {goal:g}", annotation_position="bottom right")
+    
+    fig.update_layout(
+        title=title or f"📈 Evolução - {SERIES_LABELS[column]}",
+        xaxis_title="Data",
+        yaxis_title=SERIES_LABELS[column],
+        showlegend=False
+    )
+    return fig
+
+def show_progress_chart(patient_id, column='peso', goal=None, freq=None, title=None, width_px=CHART_WIDTH_PX):
+    """Exibe o gráfico de evolução de uma medida (ou aviso se não houver dados)"""
+    points = get_chart_points(patient_id, column, freq, width_px)
+    
+    if points['pontos_originais'] == 0:
+        st.info(f"Nenhum registro de {SERIES_LABELS[column].lower()} ainda.")
+        return False
+    
+    st.plotly_chart(cached_figure(build_progress_figure, points, column, goal, title), use_container_width=True)
+    show_downsample_caption(points)
+    return True
+
+def show_downsample_caption(points):
+    """Informa quando o gráfico exibe uma amostra da série"""
+    if points['envelope'] is not None:
+        st.caption(f"Exibindo {len(points['x'])} de {points['pontos_originais']} medidas; a faixa sombreada mostra o mínimo e o máximo de cada período.")
+
+def show_measurement_form(patient_id, key_prefix="measurement", columns=SERIES_COLUMNS):
+    """Formulário para registrar uma nova medida"""
+    with st.form(f"{key_prefix}_form", clear_on_submit=True):
+        form_columns = st.columns(len(columns) + 1)
+        
+        with form_columns[0]:
+            measured_on = st.date_input("Data", value=date.today(), max_value=date.today(), key=f"{key_prefix}_date")
+        
+        values = {}
+        for form_column, name in zip(form_columns[1:], columns):
+            with form_column:
+                values[name] = st.number_input(SERIES_LABELS[name], min_value=0.0, max_value=500.0, value=0.0, step=0.1, key=f"{key_prefix}_{name}")
+        
+        if st.form_submit_button("➕ Registrar medida", use_container_width=True):
+            timestamp = datetime.combine(measured_on, datetime.now().time()) if measured_on == date.today() else measured_on
+            if record_measurement(patient_id, timestamp, **values):
+                st.success("✅ Medida registrada!")
+            else:
+                st.error("Informe ao menos uma medida.")
+
+def show_patient_evolution(patient_id, patient=None):
+    """Evolução de peso, cintura e gordura corporal de um paciente"""
+    show_measurement_form(patient_id, key_prefix=f"evolution_{patient_id}")
+    
+    freq = st.radio(
+        "Agrupamento",
+        options=[None, *RESAMPLE_FREQUENCIES],
+        format_func=lambda option: "Todas as medidas" if option is None else RESAMPLE_FREQUENCIES[option],
+        horizontal=True,
+        key=f"evolution_{patient_id}_freq"
+    )
+    
+    series = load_progress_series(patient_id, freq)
+    recorded = [name for name in SERIES_COLUMNS if pd.notna(series[name]).any()]
+    
+    if not recorded:
+        st.info("Nenhuma medida registrada ainda. Use o formulário acima para registrar a primeira.")
+        return
+    
+    metric_columns = st.columns(len(recorded))
+    for metric_column, name in zip(metric_columns, recorded):
+        values = series[name][pd.notna(series[name])]
+        with metric_column:
+            st.metric(SERIES_LABELS[name], f"{values[-1]:.1f}", f"{values[-1] - values[0]:+.1f} desde o início", delta_color="off")
+    
+    for name in recorded:
+        goal = (patient or {}).get('peso_meta') if name == 'peso' else None
+        points = get_chart_points(patient_id, name, freq)
+        st.plotly_chart(cached_figure(build_progress_figure, points, name, goal), use_container_width=True)
+        show_downsample_caption(points)
+    
+    with st.expander("📋 Histórico de medidas"):
+        history = pd.DataFrame({'Data': series['timestamp'], **{SERIES_LABELS[name]: series[name] for name in recorded}})
+        st.dataframe(history.iloc[::-1].round(1), use_container_width=True, hide_index=True)
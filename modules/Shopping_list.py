@@ -0,0 +1,194 @@
+# modules/shopping_list.py
+import streamlit as st
+import pandas as pd
+import numpy as np
+
+# Dias cobertos por cada duração de plano
+PLAN_DURATION_DAYS = {
+    "1 semana": 7,
+    "2 semanas": 14,
+    "1 mês": 30,
+    "2 meses": 60,
+    "3 meses": 90
+}
+
+# Unidades de compra específicas (gramas por unidade de compra)
+PURCHASE_UNITS = {
+    "ovo": {"unidade": "dúzia", "gramas": 600, "fracionavel": False},
+    "banana": {"unidade": "unidade", "gramas": 120, "fracionavel": False},
+    "maca": {"unidade": "unidade", "gramas": 150, "fracionavel": False},
+    "laranja": {"unidade": "unidade", "gramas": 180, "fracionavel": False},
+    "abacate": {"unidade": "unidade", "gramas": 400, "fracionavel": False},
+    "tofu": {"unidade": "pacote (400g)", "gramas": 400, "fracionavel": False},
+    "aveia": {"unidade": "pacote (500g)", "gramas": 500, "fracionavel": False},
+    "quinoa": {"unidade": "pacote (500g)", "gramas": 500, "fracionavel": False}
+}
+
+# Unidade padrão para alimentos sem unidade específica
+DEFAULT_PURCHASE_UNIT = {"unidade": "kg", "gramas": 1000, "fracionavel": True}
+
+SHOPPING_LIST_COLUMNS = ['categoria', 'key', 'nome', 'gramas', 'quantidade', 'unidade']
+
+# Dias cobertos pela lista de compras (semanal)
+SHOPPING_LIST_DAYS = 7
+
+def get_plan_days(plan_data, default_days=7):
+    """Retorna o número de dias cobertos por um plano"""
+    return PLAN_DURATION_DAYS.get(plan_data.get('duration'), default_days)
+
+def build_food_table(foods_db):
+    """Monta tabela de alimentos (key, nome, categoria e unidade de compra)"""
+    rows = []
+    for category, foods in foods_db.items():
+        for food_key, food_data in foods.items():
+            unit = PURCHASE_UNITS.get(food_key, DEFAULT_PURCHASE_UNIT)
+            rows.append({
+                'key': food_key,
+                'nome': food_data.get('nome', food_key),
+                'categoria': category,
+                'unidade': unit['unidade'],
+                'gramas_unidade': unit['gramas'],
+                'fracionavel': unit['fracionavel']
+            })
+
+    return pd.DataFrame(rows, columns=['key', 'nome', 'categoria', 'unidade', 'gramas_unidade', 'fracionavel']).set_index('key')
+
+def build_recipe_table(recipes):
+    """Monta tabela de ingredientes das receitas (recipe_id, key, fração do peso total)"""
+    rows = []
+    for recipe_id, recipe in recipes.items():
+        ingredients = recipe.get('ingredientes', [])
+        total_weight = sum(item.get('quantity', 0) for item in ingredients)
+
+        if total_weight > 0:
+            rows.extend(
+                {'recipe_id': recipe_id, 'key': item.get('key'), 'fracao': item.get('quantity', 0) / total_weight}
+                for item in ingredients
+            )
+
+    return pd.DataFrame(rows, columns=['recipe_id', 'key', 'fracao'])
+
+def extract_plan_items(plans, days=SHOPPING_LIST_DAYS, recipes=None):
+    """Agrega os itens de vários planos em gramas totais por alimento (Series indexada por key)
+
+    Com days=None cada plano contribui pelos dias da sua duração.
+    """
+    recipes = recipes or {}
+    items = pd.DataFrame(
+        [
+            (plan_index, food.get('key'), food.get('quantity', 0), food.get('recipe_id'))
+            for plan_index, plan_data in enumerate(plans)
+            for meal_data in plan_data.get('meals', {}).values()
+            for food in meal_data.get('foods', [])
+        ],
+        columns=['plano', 'key', 'gramas', 'recipe_id']
+    )
+
+    if items.empty:
+        return pd.Series(dtype=float)
+
+    plan_days = np.array([get_plan_days(plan_data) if days is None else days for plan_data in plans], dtype=float)
+    items['gramas'] = items['gramas'].astype(float).to_numpy() * plan_days[items['plano'].to_numpy()]
+
+    # Receitas viram seus ingredientes, proporcionais ao peso de cada um
+    is_recipe = items['recipe_id'].isin(list(recipes))
+    ingredients = items.loc[is_recipe, ['recipe_id', 'gramas']].merge(build_recipe_table(recipes), on='recipe_id')
+    ingredients['gramas'] *= ingredients['fracao']
+
+    flat = pd.concat([items.loc[~is_recipe, ['key', 'gramas']], ingredients[['key', 'gramas']]], ignore_index=True)
+    return flat.groupby('key')['gramas'].sum().astype(float)
+
+class ShoppingListGenerator:
+    def __init__(self, foods_db, recipes=None):
+        self.food_table = build_food_table(foods_db)
+        self.recipes = recipes or {}
+
+    def generate(self, plans, days=SHOPPING_LIST_DAYS):
+        """Gera lista de compras agregada para um ou mais planos
+
+        Por padrão cobre uma semana; com days=None cada plano contribui
+        pelos dias da sua duração.
+        """
+        totals = extract_plan_items(plans, days, self.recipes)
+        totals = totals[totals > 0]
+
+        if totals.empty:
+            return pd.DataFrame(columns=SHOPPING_LIST_COLUMNS)
+
+        table = self.food_table.reindex(totals.index)
+
+        # Alimentos fora do banco de dados usam a unidade padrão
+        table['nome'] = table['nome'].fillna(pd.Series(totals.index, index=totals.index))
+        table['categoria'] = table['categoria'].fillna('outros')
+        table['unidade'] = table['unidade'].fillna(DEFAULT_PURCHASE_UNIT['unidade'])
+        table['gramas_unidade'] = table['gramas_unidade'].fillna(DEFAULT_PURCHASE_UNIT['gramas'])
+        table['fracionavel'] = table['fracionavel'].fillna(DEFAULT_PURCHASE_UNIT['fracionavel']).astype(bool)
+
+        # Conversão para unidades de compra
+        units = totals.to_numpy() / table['gramas_unidade'].to_numpy(dtype=float)
+        fractional = table['fracionavel'].to_numpy()
+        quantities = np.where(fractional, np.round(units, 2), np.ceil(units))
+
+        result = pd.DataFrame({
+            'categoria': table['categoria'].to_numpy(),
+            'key': totals.index.to_numpy(),
+            'nome': table['nome'].to_numpy(),
+            'gramas': np.round(totals.to_numpy(), 1),
+            'quantidade': quantities,
+            'unidade': table['unidade'].to_numpy()
+        }, columns=SHOPPING_LIST_COLUMNS)
+
+        return result.sort_values(['categoria', 'nome']).reset_index(drop=True)
+
+    def generate_by_category(self, plans, days=SHOPPING_LIST_DAYS):
+        """Gera lista de compras agrupada por categoria"""
+        shopping_list = self.generate(plans, days)
+        return {category: group.reset_index(drop=True) for category, group in shopping_list.groupby('categoria', sort=True)}
+
+def format_quantity(quantity, unit):
+    """Formata quantidade de compra para exibição"""
+    if float(quantity).is_integer():
+        return f"{quantity:.0f} {unit}"
+    return f"{quantity:.2f} {unit}"
+
+def show_shopping_list(plans, foods_db, key_prefix="shopping", recipes=None):
+    """Exibe lista de compras para os planos informados"""
+    duration_label = "Duração completa do plano" if len(plans) == 1 else "Usar a duração de cada plano"
+    full_duration = st.checkbox(duration_label, value=False, key=f"{key_prefix}_plan_duration")
+    days = None if full_duration else st.number_input(
+        "Dias de compra",
+        min_value=1,
+        max_value=90,
+        value=SHOPPING_LIST_DAYS,
+        key=f"{key_prefix}_days"
+    )
+
+    generator = ShoppingListGenerator(foods_db, recipes)
+    shopping_list = generator.generate(plans, days=days)
+
+    if shopping_list.empty:
+        st.info("Nenhum alimento encontrado nos planos selecionados.")
+        return
+
+    for category, items in shopping_list.groupby('categoria', sort=True):
+        st.markdown(f"**{category.title()}:**")
+
+        for _, item in items.iterrows():
+            col_name, col_qty, col_grams = st.columns([3, 2, 1])
+
+            with col_name:
+                st.write(f"• {item['nome']}")
+
+            with col_qty:
+                st.write(format_quantity(item['quantidade'], item['unidade']))
+
+            with col_grams:
+                st.caption(f"{item['gramas']:.0f}g")
+
+    st.download_button(
+        "📥 Baixar lista (CSV)",
+        data=shopping_list.to_csv(index=False).encode('utf-8'),
+        file_name="lista_de_compras.csv",
+        mime="text/csv",
+        key=f"{key_prefix}_download"
+    )
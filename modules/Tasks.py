@@ -0,0 +1,70 @@
+# modules/tasks.py
+"""Tarefas dos módulos executadas pela fila em segundo plano (core/jobs.py)
+
+Rodam em processos trabalhadores, fora de uma execução do Streamlit: leem
+os arquivos de dados diretamente e gravam os resultados em data/reports/.
+"""
+import os
+from datetime import datetime
+
+import pandas as pd
+
+from core.archive import get_archive
+from core.formats import load_data
+from modules.Calculators import calculate_patient_equations_batch, calculate_patient_growth_batch
+
+PATIENTS_FILE = 'data/patients.json'
+REPORTS_DIR = 'data/reports'
+
+# Pacientes processados por vez (um passo de progresso por lote)
+REPORT_CHUNK_SIZE = 2000
+
+def load_patients_df(patient_ids=None, path=PATIENTS_FILE, archive=None):
+    """Tabela de pacientes (todos ou só os ids indicados), incluindo os arquivados
+    
+    Os cadastros dos arquivados vêm do índice do arquivo, como na lista de
+    pacientes; o cadastro quente prevalece se o paciente estiver nos dois.
+    """
+    archive = get_archive() if archive is None else archive
+    patients = {patient_id: entry['paciente'] for patient_id, entry in archive.index().items()}
+    if os.path.exists(path):
+        patients.update(load_data(path))
+    if patient_ids is not None:
+        patients = {patient_id: patients[patient_id] for patient_id in patient_ids if patient_id in patients}
+    return pd.DataFrame.from_dict(patients, orient='index')
+
+def build_equation_report(patients_df):
+    """Nome, TMB por equação e amplitude entre as equações"""
+    equations = calculate_patient_equations_batch(patients_df)
+    report = pd.concat([patients_df.reindex(columns=['nome']).rename(columns={'nome': 'Nome'}), equations], axis=1)
+    report['Amplitude (kcal)'] = (equations.max(axis=1) - equations.min(axis=1)).round(1)
+    return report
+
+def build_growth_report(patients_df):
+    """Nome, escores-z e percentis dos pacientes com menos de 19 anos"""
+    growth = calculate_patient_growth_batch(patients_df)
+    return pd.concat([patients_df.loc[growth.index].reindex(columns=['nome']).rename(columns={'nome': 'Nome'}), growth], axis=1)
+
+def _chunked_report(build, params, progress, prefix):
+    progress(0.0, "Carregando pacientes", force=True)
+    patients_df = load_patients_df(params.get('pacientes'))
+    
+    parts = []
+    for start in range(0, len(patients_df), REPORT_CHUNK_SIZE):
+        progress(start / max(len(patients_df), 1), f"Calculando {start}/{len(patients_df)} pacientes")
+        parts.append(build(patients_df.iloc[start:start + REPORT_CHUNK_SIZE]))
+    report = pd.concat(parts) if parts else pd.DataFrame()
+    
+    progress(0.95, "Gravando relatório", force=True)
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    path = os.path.join(REPORTS_DIR, f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.csv")
+    report.to_csv(path)
+    return {'arquivo': path, 'linhas': len(report)}
+
+def equation_report_job(params, progress):
+    """Relatório de TMB por equação para um grupo de pacientes"""
+    return _chunked_report(build_equation_report, params, progress, 'relatorio_tmb_equacoes')
+
+def growth_report_job(params, progress):
+    """Relatório das curvas de crescimento dos pacientes pediátricos"""
+    return _chunked_report(build_growth_report, params, progress, 'relatorio_curvas_crescimento')